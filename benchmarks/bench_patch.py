@@ -0,0 +1,85 @@
+"""Micro-benchmark: per-field patch engine vs. the previous whole-model merge.
+
+Run with: uv run python benchmarks/bench_patch.py
+"""
+from __future__ import annotations
+
+import timeit
+
+from conversation_agent.models import (
+    DEFAULT_FLOW,
+    AssistantState,
+    FlowStep,
+    _STEP_ANSWERS_MAP,
+    field_to_step,
+    normalize_enum_value,
+)
+
+patch_engine = DEFAULT_FLOW.patch_engine
+
+CASES = {
+    "single field": {"display_name": "Hugo"},
+    "enum label (normalize)": {"age_range": "25-34"},
+    "cross-step": {"display_name": "Hugo", "diet": "vegan", "allergies": ["Dairy", "Nuts"]},
+    "invalid value": {"age_range": "not_a_real_value"},
+}
+
+
+def legacy_apply(state: AssistantState, patch: dict) -> None:
+    """The merge logic previously duplicated in update_state / apply_state_updates."""
+    by_step: dict[FlowStep, dict] = {}
+    for key, value in patch.items():
+        step = field_to_step(key)
+        if step is None:
+            continue
+        by_step.setdefault(step, {})[key] = value
+
+    for step, fields in by_step.items():
+        answers = state._answers_for_step(step)
+        model_cls = _STEP_ANSWERS_MAP[step]
+        current = answers.model_dump()
+        for key, value in fields.items():
+            if key in current:
+                current[key] = value
+        try:
+            updated = model_cls.model_validate(current)
+        except Exception:
+            current = answers.model_dump()
+            for key, value in fields.items():
+                if key in current:
+                    if isinstance(value, str):
+                        current[key] = normalize_enum_value(value)
+                    elif isinstance(value, list):
+                        current[key] = [
+                            normalize_enum_value(v) if isinstance(v, str) else v
+                            for v in value
+                        ]
+                    else:
+                        current[key] = value
+            try:
+                updated = model_cls.model_validate(current)
+            except Exception:
+                continue
+        setattr(state, step.value, updated)
+
+
+def engine_apply(state: AssistantState, patch: dict) -> None:
+    patch_engine.apply(state, patch)
+
+
+def bench(fn, patch: dict, number: int) -> float:
+    state = AssistantState()
+    timer = timeit.Timer(lambda: fn(state, patch))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def main(number: int = 20_000) -> None:
+    print(f"{'case':<26}{'legacy µs':>12}{'engine µs':>12}{'speedup':>10}")
+    for name, patch in CASES.items():
+        legacy = bench(legacy_apply, patch, number)
+        engine = bench(engine_apply, patch, number)
+        print(f"{name:<26}{legacy:>12.2f}{engine:>12.2f}{legacy / engine:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
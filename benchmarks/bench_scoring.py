@@ -0,0 +1,132 @@
+"""Micro-benchmark: VectorStore scoring inline vs. in a thread or process pool.
+
+For each corpus size this measures the latency of one scoring call made
+inline, through a thread pool and through a process pool. It also measures
+the worst event-loop stall seen by a ticker task while ``--concurrency``
+searches run at once. Inline scoring blocks the loop for its whole
+duration. Offloading adds a fixed dispatch cost instead, so small corpora
+are better scored inline. The crossover is the first size whose inline
+time exceeds the thread pool's dispatch overhead; it is the suggested
+AGENT_RAG_INLINE_MAX_DOCS.
+
+Run with: uv run python benchmarks/bench_scoring.py [--sizes 100,1000,10000] [--dim 1536]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import Executor
+
+import numpy as np
+
+from conversation_agent import scoring
+
+DEFAULT_SIZES = (100, 300, 1_000, 3_000, 10_000, 30_000, 100_000)
+
+
+def _corpus(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    matrix = rng.standard_normal((n, dim), dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+async def _call(matrix, path, query, executor: Executor | None, kind: str):
+    if executor is None:
+        return scoring.top_k(matrix, query, 3)
+    if kind == "process":
+        job = (scoring.top_k_mapped, path, query, 3)
+    else:
+        job = (scoring.top_k, matrix, query, 3)
+    return await asyncio.get_running_loop().run_in_executor(executor, *job)
+
+
+async def _latency(matrix, path, query, executor, kind, rounds: int) -> float:
+    await _call(matrix, path, query, executor, kind)  # Warm up workers and mappings
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await _call(matrix, path, query, executor, kind)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+async def _worst_stall(matrix, path, query, executor, kind, concurrency: int) -> float:
+    """Longest gap between ticks of a 1 ms ticker while searches run concurrently."""
+    stop = False
+    worst = 0.0
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while not stop:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last - 0.001)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    for _ in range(3):
+        await asyncio.gather(*(
+            _call(matrix, path, query, executor, kind) for _ in range(concurrency)
+        ))
+    stop = True
+    await tick
+    return worst
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1234)
+    executors = {
+        "inline": None,
+        "thread": scoring.make_executor("thread", args.workers),
+        "process": scoring.make_executor("process", args.workers),
+    }
+    print(f"{'docs':>8} | {'latency ms: inline':>18}{'thread':>9}{'process':>9}"
+          f" | {'worst loop stall ms: inline':>27}{'thread':>9}{'process':>9}")
+    overhead = None
+    crossover = None
+    try:
+        for n in (int(s) for s in args.sizes.split(",") if s):
+            matrix = _corpus(n, args.dim, rng)
+            query = matrix[0]
+            path = scoring.save_matrix(matrix)
+            latency, stall = {}, {}
+            for kind, executor in executors.items():
+                latency[kind] = await _latency(matrix, path, query, executor, kind, args.rounds)
+                stall[kind] = await _worst_stall(
+                    matrix, path, query, executor, kind, args.concurrency
+                )
+            if overhead is None:
+                overhead = max(0.0, latency["thread"] - latency["inline"])
+            if crossover is None and latency["inline"] > overhead:
+                crossover = n
+            print(
+                f"{n:>8} | {latency['inline'] * 1e3:>18.3f}{latency['thread'] * 1e3:>9.3f}"
+                f"{latency['process'] * 1e3:>9.3f} | {stall['inline'] * 1e3:>27.3f}"
+                f"{stall['thread'] * 1e3:>9.3f}{stall['process'] * 1e3:>9.3f}"
+            )
+            os.unlink(path)
+    finally:
+        for executor in executors.values():
+            if executor is not None:
+                executor.shutdown()
+
+    print(f"\nThread dispatch overhead: {overhead * 1e3:.3f} ms")
+    if crossover is not None:
+        print(f"Inline scoring costs more than dispatch from {crossover} docs on; "
+              f"set AGENT_RAG_INLINE_MAX_DOCS below that.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""Micro-benchmark: FastAPI's response_model path vs. ModelJSONResponse.
+
+Both sides produce the response body bytes for the /chat and /state routes:
+the default path validates the returned model against response_model and
+encodes it through JSONResponse; the fast path renders it once with
+pydantic-core.
+
+Run with: uv run python benchmarks/bench_serialization.py
+"""
+from __future__ import annotations
+
+import asyncio
+import timeit
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from conversation_agent.app import ChatResponse, StateUpdateResponse, app
+from conversation_agent.models import (
+    AnimeAnswers,
+    AssistantResponse,
+    AssistantState,
+    FoodAnswers,
+    ProfileAnswers,
+    QuestionSpec,
+    RagSource,
+    ResponseMode,
+)
+from conversation_agent.responses import ModelJSONResponse
+
+
+def _filled_state() -> AssistantState:
+    state = AssistantState(
+        profile=ProfileAnswers(display_name="Hugo", age_range="25_34", country="Portugal"),
+        food=FoodAnswers(diet="vegetarian", allergies=["nuts", "dairy"], spice_ok=True),
+        anime=AnimeAnswers(favorite_genres=["shonen", "slice_of_life"], sub_or_dub="sub"),
+    )
+    state.advance_step()
+    return state
+
+
+def _question() -> QuestionSpec:
+    return QuestionSpec(
+        field_name="favorite_genres",
+        question_text="Which anime genres do you enjoy most?",
+        options=["action", "comedy", "drama", "romance", "sci_fi", "slice_of_life"],
+        option_labels=["Action", "Comedy", "Drama", "Romance", "Sci-Fi", "Slice of Life"],
+        multi_select=True,
+    )
+
+
+CASES = {
+    "chat (flow question)": ChatResponse(
+        session_id="abc123def456",
+        response=AssistantResponse(
+            message="Great, noted! Which anime genres do you enjoy most?",
+            mode=ResponseMode.FLOW_QUESTION,
+            next_question=_question(),
+        ),
+        state_version=7,
+        state=_filled_state(),
+    ),
+    "chat (answer + 3 sources)": ChatResponse(
+        session_id="abc123def456",
+        response=AssistantResponse(
+            message="Sub keeps the original voice acting; dub is easier to follow. " * 4,
+            mode=ResponseMode.ANSWER,
+            sources=[
+                RagSource(title=f"Doc {i}", content="Lorem ipsum dolor sit amet. " * 20, score=0.9)
+                for i in range(3)
+            ],
+        ),
+        state_version=7,
+        state=_filled_state(),
+    ),
+    "state": StateUpdateResponse(
+        state_version=7, state=_filled_state(), next_question=_question(),
+    ),
+}
+
+
+def _route(path: str, method: str) -> APIRoute:
+    return next(
+        r for r in app.routes
+        if isinstance(r, APIRoute) and r.path == path and method in r.methods
+    )
+
+
+async def default_path(route: APIRoute, content) -> bytes:
+    encoded = await serialize_response(field=route.response_field, response_content=content)
+    return JSONResponse(encoded).body
+
+
+async def fast_path(content) -> bytes:
+    return ModelJSONResponse(content).body
+
+
+def bench(fn, number: int) -> float:
+    """Best-of-5 µs per call of the coroutine function ``fn``, inside one event loop."""
+
+    async def batch() -> float:
+        start = timeit.default_timer()
+        for _ in range(number):
+            await fn()
+        return timeit.default_timer() - start
+
+    return min(asyncio.run(batch()) for _ in range(5)) / number * 1e6
+
+
+def main(number: int = 2_000) -> None:
+    routes = {
+        ChatResponse: _route("/chat", "POST"),
+        StateUpdateResponse: _route("/state", "PATCH"),
+    }
+    print(f"{'case':<28}{'bytes':>8}{'default µs':>13}{'fast µs':>10}{'speedup':>10}")
+    for name, content in CASES.items():
+        route = routes[type(content)]
+        body = asyncio.run(fast_path(content))
+        assert body == content.model_dump_json().encode()
+        size = len(body)
+        default = bench(lambda: default_path(route, content), number)
+        fast = bench(lambda: fast_path(content), number)
+        print(f"{name:<28}{size:>8}{default:>13.2f}{fast:>10.2f}{default / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Load test: many concurrent simulated users against the real app, offline.
+
+Every session walks the whole onboarding flow: greeting, profile answers,
+a knowledge-base question, a form patch, an auto-triggered turn, food
+answers, a state fetch, another question and the anime answers. The model
+is a scripted pydantic-ai FunctionModel that calls the same tools a real
+model would, after a synthetic latency; embeddings come from a hashing
+embedder with its own latency. Requests go through the full FastAPI stack
+in-process (httpx ASGITransport), including admission control.
+
+Run with:
+    uv run python benchmarks/loadtest.py --sessions 200 --concurrency 50
+    uv run python benchmarks/loadtest.py --model-latency 0.8 --jitter 0.3 --json load.json
+
+Admission limits come from the usual AGENT_* settings, e.g.
+AGENT_MAX_CONCURRENT_RUNS=32.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+
+import httpx
+import numpy as np
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent import session as session_module
+from conversation_agent.agent import agent
+from conversation_agent.app import app
+from conversation_agent.config import settings
+from conversation_agent.rag import VectorStore
+
+# ── Scripted model ───────────────────────────────────────────────────
+
+_NAME = re.compile(r"My name is (.+)")
+
+# What the scripted model "extracts" from each answer in the walk
+_ANSWERS: dict[str, dict[str, Any]] = {
+    "I'm vegetarian, allergic to nuts, and spicy food is fine": {
+        "diet": "vegetarian", "allergies": ["nuts"], "spice_ok": True,
+    },
+    "I love shonen and comedy, subbed. Top 3: Naruto, Bleach, One Piece": {
+        "favorite_genres": ["shonen", "comedy"],
+        "sub_or_dub": "sub",
+        "top_3_anime": ["Naruto", "Bleach", "One Piece"],
+    },
+}
+
+
+def _extract(message: str) -> dict[str, Any] | None:
+    if m := _NAME.fullmatch(message):
+        return {"display_name": m[1]}
+    return _ANSWERS.get(message)
+
+
+def _last_user_text(messages: list[ModelMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                    return part.content
+    return ""
+
+
+def _output(info: AgentInfo, output: dict[str, Any]) -> ModelResponse:
+    tool = info.output_tools[0]
+    args = {tool.outer_typed_dict_key: output} if tool.outer_typed_dict_key else output
+    return ModelResponse(parts=[ToolCallPart(tool_name=tool.name, args=args)])
+
+
+def scripted_model(latency: float, jitter: float, rng: random.Random) -> FunctionModel:
+    """A model that answers like the real one would, after a synthetic delay.
+
+    Answers get an update_state call and questions a rag_search call; once
+    the tool results come back it emits the structured output.
+    """
+
+    async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(max(0.0, rng.gauss(latency, jitter)))
+        user = _last_user_text(messages)
+        patch = _extract(user)
+        tool_done = any(isinstance(p, ToolReturnPart) for p in messages[-1].parts)
+        if not tool_done:
+            if patch is not None:
+                return ModelResponse(parts=[
+                    ToolCallPart(tool_name="update_state", args={"patch": patch}),
+                ])
+            if user.endswith("?"):
+                return ModelResponse(parts=[
+                    ToolCallPart(tool_name="rag_search", args={"query": user}),
+                ])
+            return _output(info, {"message": "Let's stay on track.", "mode": "guardrail"})
+        if patch is not None:
+            return _output(info, {
+                "message": "Got it!", "mode": "flow_question", "state_patch": patch,
+            })
+        return _output(info, {"message": "Here's what I found.", "mode": "answer"})
+
+    return FunctionModel(respond)
+
+
+class HashingEmbedder:
+    """Bag-of-words hashing embedder with a synthetic latency; no API calls."""
+
+    def __init__(self, latency: float, dim: int = 256) -> None:
+        self.latency = latency
+        self.dim = dim
+
+    def _vector(self, text: str) -> list[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"[a-z]+", text.lower()):
+            v[int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest()) % self.dim] += 1
+        return v.tolist()
+
+    async def embed_documents(self, docs: list[str]):
+        return SimpleNamespace(embeddings=[self._vector(d) for d in docs])
+
+    async def embed_query(self, query: str):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(embeddings=[self._vector(query)])
+
+
+# ── Simulated users ──────────────────────────────────────────────────
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    statuses: Counter = field(default_factory=Counter)
+    completed: int = 0
+
+    def record(self, endpoint: str, seconds: float, status: int) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        self.statuses[(endpoint, status)] += 1
+
+
+async def _call(stats: Stats, client: httpx.AsyncClient, endpoint: str,
+                method: str, url: str, **kwargs) -> httpx.Response:
+    start = time.perf_counter()
+    resp = await client.request(method, url, **kwargs)
+    stats.record(endpoint, time.perf_counter() - start, resp.status_code)
+    return resp
+
+
+async def walk(client: httpx.AsyncClient, stats: Stats, n: int, think: float) -> None:
+    """One user going through the whole onboarding flow."""
+
+    async def chat(message: str, auto: bool = False) -> httpx.Response:
+        await asyncio.sleep(think)
+        body = {"session_id": sid, "message": message, "auto": auto}
+        return await _call(stats, client, "POST /chat", "POST", "/chat", json=body)
+
+    resp = await _call(stats, client, "POST /chat", "POST", "/chat", json={"message": "hi"})
+    if resp.status_code != 200:
+        return
+    sid = resp.json()["session_id"]
+
+    await chat(f"My name is Sim {n}")
+    await chat("What is a pescatarian diet?")
+    await asyncio.sleep(think)
+    await _call(stats, client, "PATCH /state", "PATCH", "/state", json={
+        "session_id": sid, "updates": {"age_range": "25_34", "country": "Portugal"},
+    })
+    await chat("continue", auto=True)
+    await chat("I'm vegetarian, allergic to nuts, and spicy food is fine")
+    await asyncio.sleep(think)
+    await _call(stats, client, "GET /state", "GET", f"/state/{sid}")
+    await chat("What is the difference between sub and dub?")
+    resp = await chat("I love shonen and comedy, subbed. Top 3: Naruto, Bleach, One Piece")
+    if resp.status_code == 200 and resp.json()["state"]["current_step"] == "done":
+        stats.completed += 1
+
+
+async def _sample_loop_lag(interval: float, lags: list[float], stop: asyncio.Event) -> None:
+    """How late the loop wakes a sleeper: a proxy for time spent blocked."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+def _memory_bytes(use_tracemalloc: bool) -> int:
+    gc.collect()
+    if use_tracemalloc:
+        return tracemalloc.get_traced_memory()[0]
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# ── Reporting ────────────────────────────────────────────────────────
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    """Nearest-rank percentiles, in milliseconds."""
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000
+
+    return {"p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99), "max_ms": ordered[-1] * 1000}
+
+
+def report(stats: Stats, elapsed: float, lags: list[float], memory_delta: int,
+           sessions: int) -> dict[str, Any]:
+    requests = sum(len(v) for v in stats.latencies.values())
+    return {
+        "sessions": sessions,
+        "completed_walks": stats.completed,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed,
+        "endpoints": {
+            endpoint: {
+                "requests": len(values),
+                **_percentiles(values),
+                "statuses": {
+                    str(status): count for (ep, status), count in sorted(stats.statuses.items())
+                    if ep == endpoint
+                },
+            }
+            for endpoint, values in stats.latencies.items()
+        },
+        "loop_lag": _percentiles(lags) if lags else {},
+        "memory_per_session_bytes": memory_delta / sessions,
+    }
+
+
+def _print(result: dict[str, Any]) -> None:
+    print(f"sessions {result['sessions']}, completed walks {result['completed_walks']}, "
+          f"{result['elapsed_s']:.1f}s, {result['throughput_rps']:.1f} req/s")
+    print(f"\n{'endpoint':<14}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}  statuses")
+    for endpoint, r in result["endpoints"].items():
+        statuses = " ".join(f"{s}x{n}" for s, n in r["statuses"].items())
+        print(f"{endpoint:<14}{r['requests']:>9}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}  {statuses}")
+    lag = result["loop_lag"]
+    if lag:
+        print(f"\nevent-loop lag  p50 {lag['p50_ms']:.2f} ms, p99 {lag['p99_ms']:.2f} ms, "
+              f"max {lag['max_ms']:.2f} ms")
+    print(f"memory per session  {result['memory_per_session_bytes'] / 1024:.1f} KiB")
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    store = VectorStore(HashingEmbedder(args.embed_latency), admission=app_module._embed_admission)
+    await store.load_corpus(app_module.CORPUS_PATH)
+    app_module._vector_store = store
+    session_module._store.clear()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    stats = Stats()
+    lags: list[float] = []
+    stop = asyncio.Event()
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def limited(n: int) -> None:
+        async with limit:
+            await walk(client, stats, n, args.think)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        with agent.override(model=scripted_model(args.model_latency, args.jitter, rng)):
+            memory_before = _memory_bytes(args.tracemalloc)
+            sampler = asyncio.create_task(_sample_loop_lag(args.lag_interval, lags, stop))
+            start = time.perf_counter()
+            await asyncio.gather(*(limited(n) for n in range(args.sessions)))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await sampler
+            memory_delta = _memory_bytes(args.tracemalloc) - memory_before
+    return report(stats, elapsed, lags, memory_delta, args.sessions)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20,
+                        help="sessions walking the flow at the same time")
+    parser.add_argument("--model-latency", type=float, default=0.3,
+                        help="mean seconds per model request")
+    parser.add_argument("--jitter", type=float, default=0.1,
+                        help="standard deviation of the model latency")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="seconds a user waits between requests")
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="measure memory with tracemalloc instead of RSS (slower)")
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    print(f"admission: {settings.max_concurrent_runs} runs, "
+          f"{settings.max_queued_runs} queued (AGENT_MAX_CONCURRENT_RUNS / AGENT_MAX_QUEUED_RUNS)")
+    result = asyncio.run(run(args))
+    _print(result)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
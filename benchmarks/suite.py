@@ -0,0 +1,340 @@
+"""Micro-benchmark suite for the request hot paths.
+
+Runs offline (synthetic vectors, no model or embedding calls) with fixed
+seeds, so two runs on the same machine are comparable. Each case is timed
+in rounds of auto-calibrated batches; the median per-call time is the
+headline number.
+
+Run with:
+    uv run python benchmarks/suite.py                      # table
+    uv run python benchmarks/suite.py --json results.json  # and save results
+    uv run python benchmarks/suite.py --baseline results.json  # compare
+
+With ``--baseline``, cases whose median is more than ``--threshold``
+slower than the baseline are reported as regressions and the exit status
+is 1.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import numpy as np
+
+from conversation_agent.agent import AgentDeps, build_system_prompt, update_state
+from conversation_agent.app import ChatResponse, apply_state_updates
+from conversation_agent.models import (
+    DEFAULT_FLOW,
+    AgeRange,
+    AnimeAnswers,
+    AnimeGenre,
+    AssistantResponse,
+    AssistantState,
+    DietType,
+    FoodAnswers,
+    ProfileAnswers,
+    QuestionSpec,
+    RagSource,
+    ResponseMode,
+)
+from conversation_agent.rag import VectorStore
+
+SEED = 1234
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# 1M x 256 float32 is 1 GB; pass --dim 1536 to match text-embedding-3-small
+DEFAULT_DIM = 256
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable[[], object] | Callable[[], Awaitable[object]]
+    is_async: bool = False
+
+
+@dataclass
+class Result:
+    name: str
+    median_us: float
+    min_us: float
+    mean_us: float
+    rounds: int
+    number: int
+
+
+# ── Fixtures ─────────────────────────────────────────────────────────
+
+
+class _FixedEmbedder:
+    """Returns the same query vector every time, without any I/O."""
+
+    def __init__(self, vector: list[float]) -> None:
+        self._result = SimpleNamespace(embeddings=[vector])
+
+    async def embed_query(self, query: str):
+        return self._result
+
+
+def _synthetic_store(n: int, dim: int, rng: np.random.Generator) -> VectorStore:
+    matrix = rng.standard_normal((n, dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    query = matrix[0] + 0.1 * rng.standard_normal(dim, dtype=np.float32)
+    store = VectorStore(_FixedEmbedder(query.tolist()))
+    store._titles = [f"Doc {i}" for i in range(n)]
+    store._contents = [f"Content of document {i}." for i in range(n)]
+    store._matrix = matrix
+    return store
+
+
+def _partial_state() -> AssistantState:
+    return AssistantState(profile=ProfileAnswers(display_name="Hugo"))
+
+
+def _anime_state() -> AssistantState:
+    """Profile and food answered, anime half done."""
+    state = AssistantState(
+        profile=ProfileAnswers(display_name="Hugo", age_range="25_34", country="Portugal"),
+        food=FoodAnswers(diet="vegetarian", allergies=["nuts", "dairy"], spice_ok=True),
+        anime=AnimeAnswers(favorite_genres=["shonen"]),
+    )
+    for _ in state.flow.steps:
+        state.advance_step()
+    return state
+
+
+def _ctx(state: AssistantState):
+    """Just enough of a RunContext for the tool and prompt functions."""
+    return SimpleNamespace(deps=AgentDeps(state=state, vector_store=None))
+
+
+def _chat_response() -> ChatResponse:
+    return ChatResponse(
+        session_id="abc123def456",
+        response=AssistantResponse(
+            message="Sub keeps the original voice acting; dub is easier to follow.",
+            mode=ResponseMode.ANSWER,
+            next_question=QuestionSpec(
+                field_name="sub_or_dub",
+                question_text="Subtitles or dubbed?",
+                options=["sub", "dub", "either"],
+                option_labels=["Sub", "Dub", "Either"],
+            ),
+            sources=[
+                RagSource(title=f"Doc {i}", content="Lorem ipsum dolor sit amet. " * 20, score=0.9)
+                for i in range(3)
+            ],
+        ),
+        state_version=7,
+        state=_anime_state(),
+    )
+
+
+# ── Cases ────────────────────────────────────────────────────────────
+
+
+def build_cases(sizes: tuple[int, ...], dim: int) -> list[Case]:
+    rng = np.random.default_rng(SEED)
+    cases: list[Case] = []
+
+    for n in sizes:
+        store = _synthetic_store(n, dim, rng)
+        cases.append(Case(
+            f"vector_store.search[n={n},dim={dim}]",
+            lambda store=store: store.search("query", top_k=3),
+            is_async=True,
+        ))
+
+    patches = {
+        "single field": {"display_name": "Hugo"},
+        "enum label": {"age_range": "25-34"},
+        "cross-step": {"display_name": "Hugo", "diet": "vegan", "allergies": ["Dairy", "Nuts"]},
+        "invalid value": {"age_range": "not_a_real_value"},
+    }
+    for label, patch in patches.items():
+        state = AssistantState()
+        cases.append(Case(
+            f"apply_state_updates[{label}]",
+            lambda state=state, patch=patch: apply_state_updates(state, patch),
+        ))
+    for label in ("single field", "enum label", "invalid value"):
+        ctx = _ctx(AssistantState())
+        cases.append(Case(
+            f"update_state[{label}]",
+            lambda ctx=ctx, patch=patches[label]: update_state(ctx, patch),
+            is_async=True,
+        ))
+
+    for label, make_state in (("empty", AssistantState), ("partial", _partial_state),
+                              ("anime step", _anime_state)):
+        state = make_state()
+        cases.append(Case(
+            f"compute_missing_fields[{label}]", state.compute_missing_fields
+        ))
+        ctx = _ctx(state)
+        cases.append(Case(
+            f"build_system_prompt[{label}]",
+            lambda ctx=ctx: build_system_prompt(ctx),
+            is_async=True,
+        ))
+
+    # resolve is memoized; _resolve is the matching work a cache miss pays for
+    for label, enum_cls, text in (
+        ("exact", AnimeGenre, "Slice of Life"),
+        ("filler", DietType, "I'm vegetarian"),
+        ("range", AgeRange, "I'm 30"),
+        ("typo", DietType, "vegitarian"),
+        ("unknown", AnimeGenre, "Something Else"),
+    ):
+        index = DEFAULT_FLOW.enum_indexes[enum_cls]
+        cases.append(Case(
+            f"EnumIndex.resolve[{label}]", lambda index=index, text=text: index.resolve(text)
+        ))
+        cases.append(Case(
+            f"EnumIndex.resolve[{label}, uncached]",
+            lambda index=index, text=text: index._resolve(text),
+        ))
+
+    response = _chat_response()
+    cases.append(Case(
+        "ChatResponse.to_json",
+        lambda: response.__pydantic_serializer__.to_json(response),
+    ))
+    return cases
+
+
+# ── Timing ───────────────────────────────────────────────────────────
+
+
+def _batch_timer(case: Case, loop: asyncio.AbstractEventLoop) -> Callable[[int], float]:
+    """A function timing ``number`` back-to-back calls of the case, in seconds."""
+    if case.is_async:
+        async def batch(number: int) -> float:
+            start = time.perf_counter()
+            for _ in range(number):
+                await case.fn()
+            return time.perf_counter() - start
+
+        return lambda number: loop.run_until_complete(batch(number))
+
+    def run(number: int) -> float:
+        fn = case.fn
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+
+    return run
+
+
+def measure(case: Case, loop: asyncio.AbstractEventLoop, rounds: int,
+            round_time: float) -> Result:
+    timer = _batch_timer(case, loop)
+    # Calibrate: grow the batch until one round takes at least round_time
+    number = 1
+    while (elapsed := timer(number)) < round_time and number < 10_000_000:
+        number *= 10 if elapsed < round_time / 10 else 2
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        per_call = [timer(number) / number * 1e6 for _ in range(rounds)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return Result(
+        name=case.name,
+        median_us=statistics.median(per_call),
+        min_us=min(per_call),
+        mean_us=statistics.fmean(per_call),
+        rounds=rounds,
+        number=number,
+    )
+
+
+# ── Reporting ────────────────────────────────────────────────────────
+
+
+def _environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: list[Result], baseline: dict, threshold: float) -> list[str]:
+    """Names of cases whose median regressed by more than ``threshold``."""
+    base = baseline["results"]
+    regressions = []
+    print(f"\n{'case':<48}{'baseline µs':>13}{'now µs':>11}{'change':>10}")
+    for r in results:
+        if r.name not in base:
+            continue
+        before = base[r.name]["median_us"]
+        change = r.median_us / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(r.name)
+        print(f"{r.name:<48}{before:>13.2f}{r.median_us:>11.2f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated corpus sizes for VectorStore.search")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM,
+                        help="embedding dimension of the synthetic corpus")
+    parser.add_argument("-k", "--filter", default="",
+                        help="only run cases whose name contains this text")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--round-time", type=float, default=0.1,
+                        help="target seconds per timed round")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="median slowdown counted as a regression (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    sizes = tuple(int(s) for s in args.sizes.split(",") if s)
+    cases = [c for c in build_cases(sizes, args.dim) if args.filter in c.name]
+
+    loop = asyncio.new_event_loop()
+    results = []
+    print(f"{'case':<48}{'median µs':>11}{'min µs':>10}{'calls':>10}")
+    try:
+        for case in cases:
+            r = measure(case, loop, args.rounds, args.round_time)
+            results.append(r)
+            print(f"{r.name:<48}{r.median_us:>11.2f}{r.min_us:>10.2f}{r.number:>10}")
+    finally:
+        loop.close()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "environment": _environment(),
+                "results": {r.name: vars(r) for r in results},
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+
+from .metrics import REGISTRY
+
+_QUEUE_DEPTH = REGISTRY.gauge(
+    "conversation_agent_admission_queue_depth",
+    "Requests waiting for an admission slot.",
+    ("pool",),
+)
+_IN_FLIGHT = REGISTRY.gauge(
+    "conversation_agent_admission_in_flight",
+    "Requests currently holding an admission slot.",
+    ("pool",),
+)
+_WAIT_SECONDS = REGISTRY.histogram(
+    "conversation_agent_admission_wait_seconds",
+    "Time spent queued before being admitted.",
+    ("pool",),
+)
+_REJECTED = REGISTRY.counter(
+    "conversation_agent_admission_rejected_total",
+    "Requests rejected by admission control.",
+    ("pool", "reason"),
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to a 409/429/503 response."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float | None) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+
+    INTERACTIVE = 0  # Messages the user typed
+    AUTO = 1  # Background nudges (ChatRequest.auto)
+
+
+@dataclass(eq=False)
+class _Waiter:
+    future: asyncio.Future[None]
+    priority: Priority
+    key: str | None
+
+
+class AdmissionController:
+    """Priority-aware semaphore with a bounded wait queue and a queue-time budget.
+
+    Up to ``max_concurrency`` callers hold a slot at once. Further callers wait
+    in a queue of at most ``max_queue`` entries, served by priority and then in
+    arrival order. A full queue is rejected with 429 immediately, and a caller
+    that waits longer than its queue budget is rejected with 503.
+
+    AUTO waiters yield to interactive traffic: a full queue evicts the newest
+    AUTO waiter to make room for an interactive one, AUTO waiters get the
+    shorter ``auto_queue_timeout`` budget, and any new request carrying the
+    same ``key`` (session id) supersedes AUTO waiters already queued for it
+    with a 409.
+    """
+
+    def __init__(
+        self,
+        pool: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: float = 1.0,
+        auto_queue_timeout: float | None = None,
+    ) -> None:
+        self.pool = pool
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.auto_queue_timeout = (
+            queue_timeout if auto_queue_timeout is None else auto_queue_timeout
+        )
+        self.retry_after = retry_after
+        self._active = 0
+        self._waiters: dict[Priority, deque[_Waiter]] = {p: deque() for p in Priority}
+
+    @property
+    def in_flight(self) -> int:
+        return self._active
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._waiters.values())
+
+    def _update_gauges(self) -> None:
+        _QUEUE_DEPTH.set(self.queue_depth, pool=self.pool)
+        _IN_FLIGHT.set(self._active, pool=self.pool)
+
+    def _reject(
+        self, status_code: int, reason: str, detail: str, retry: bool = True
+    ) -> AdmissionRejected:
+        _REJECTED.inc(pool=self.pool, reason=reason)
+        return AdmissionRejected(status_code, detail, self.retry_after if retry else None)
+
+    def _drop(self, waiter: _Waiter, exc: AdmissionRejected) -> None:
+        self._waiters[waiter.priority].remove(waiter)
+        waiter.future.set_exception(exc)
+
+    def _supersede(self, key: str) -> None:
+        for waiter in [w for w in self._waiters[Priority.AUTO] if w.key == key]:
+            self._drop(waiter, self._reject(
+                409, "superseded", "Superseded by a newer message for this session",
+                retry=False,
+            ))
+
+    async def acquire(
+        self, priority: Priority = Priority.INTERACTIVE, key: str | None = None
+    ) -> None:
+        if key is not None:
+            self._supersede(key)
+        if self.try_acquire():
+            _WAIT_SECONDS.observe(0.0, pool=self.pool)
+            return
+        if self.queue_depth >= self.max_queue:
+            auto = self._waiters[Priority.AUTO]
+            if priority == Priority.AUTO or not auto:
+                raise self._reject(429, "queue_full", f"Too many concurrent {self.pool} requests")
+            self._drop(auto[-1], self._reject(
+                503, "evicted", f"Evicted from the {self.pool} queue by interactive traffic"
+            ))
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), priority, key)
+        self._waiters[priority].append(waiter)
+        self._update_gauges()
+        timeout = self.auto_queue_timeout if priority == Priority.AUTO else self.queue_timeout
+        fut = waiter.future
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                await fut
+        except BaseException as exc:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                # The slot was handed over just as we gave up — pass it on
+                self.release()
+            elif waiter in self._waiters[priority]:
+                self._waiters[priority].remove(waiter)
+            self._update_gauges()
+            if isinstance(exc, TimeoutError):
+                raise self._reject(
+                    503, "queue_timeout", f"Timed out waiting for a {self.pool} slot"
+                ) from None
+            raise
+        _WAIT_SECONDS.observe(time.perf_counter() - start, pool=self.pool)
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free and nobody is queued for it; never waits."""
+        if self._active >= self.max_concurrency or self.queue_depth:
+            return False
+        self._active += 1
+        self._update_gauges()
+        return True
+
+    def release(self) -> None:
+        for queue in self._waiters.values():
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.future.done():
+                    # Hand the slot directly to the next waiter; _active is unchanged
+                    waiter.future.set_result(None)
+                    self._update_gauges()
+                    return
+        self._active -= 1
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority = Priority.INTERACTIVE, key: str | None = None
+    ) -> AsyncIterator[None]:
+        await self.acquire(priority, key)
+        try:
+            yield
+        finally:
+            self.release()
@@ -1,27 +1,42 @@
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 
-from pydantic_ai import Agent, ModelRetry, RunContext
+from pydantic_ai import Agent, AgentRunResult, ModelRetry, RunContext
+from pydantic_ai.messages import ModelMessage, ModelResponse, SystemPromptPart
+from pydantic_ai.models import Model, ModelRequestParameters
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings, merge_model_settings
 
+from .admission import AdmissionRejected
+from .deadline import Deadline
+from .metrics import REGISTRY
 from .models import (
-    AgeRange,
-    Allergen,
-    AnimeAnswers,
-    AnimeGenre,
     AssistantResponse,
     AssistantState,
-    DietType,
     FlowStep,
-    FoodAnswers,
-    ProfileAnswers,
     ResponseMode,
-    SubDubPref,
-    _STEP_ANSWERS_MAP,
-    enum_label,
-    normalize_enum_value,
 )
+from .phases import phase, tally
+from .providers import chat_model
 from .rag import VectorStore
+from .tracing import tracer
+
+_OUTPUT_RETRIES = REGISTRY.counter(
+    "conversation_agent_output_retries_total",
+    "Model responses sent back for a retry because update_state was not called.",
+)
+_MODEL_REQUESTS = REGISTRY.counter(
+    "conversation_agent_model_requests_total",
+    "Requests made to the model, including tool-call round trips and retries.",
+)
+_TOKENS = REGISTRY.counter(
+    "conversation_agent_tokens_total",
+    "Model tokens used, by direction.",
+    ("kind",),
+)
 
 
 _QUESTION_STARTERS = (
@@ -46,24 +61,10 @@ class AgentDeps:
     missing_before: list[str] = field(default_factory=list)
     user_message: str = ""
     is_auto_trigger: bool = False
+    deadline: Deadline | None = None
 
 
-agent = Agent(
-    "openai:gpt-4o-mini",
-    output_type=AssistantResponse,
-    deps_type=AgentDeps,
-    retries=2,
-)
-
-
-def _enum_labels(enum_cls: type) -> str:
-    """Human-readable labels for use in conversation."""
-    return ", ".join(enum_label(e.value) for e in enum_cls)
-
-
-def _enum_raw_values(enum_cls: type) -> str:
-    """Raw enum values for use in update_state tool calls."""
-    return ", ".join(e.value for e in enum_cls)
+DEFAULT_MODEL = "openai:gpt-4o-mini"
 
 
 def _format_answers(answers) -> str:
@@ -75,93 +76,97 @@ def _format_answers(answers) -> str:
     return "\n".join(lines) if lines else "  (none yet)"
 
 
-_STEP_FIELDS: dict[FlowStep, dict[str, str]] = {
-    FlowStep.PROFILE: {
-        "display_name": "a free-text string (the user's preferred name)",
-        "age_range": f"one of: {_enum_labels(AgeRange)} (raw values for update_state: {_enum_raw_values(AgeRange)})",
-        "country": "a free-text string (country of residence)",
-    },
-    FlowStep.FOOD: {
-        "diet": f"one of: {_enum_labels(DietType)} (raw values for update_state: {_enum_raw_values(DietType)})",
-        "allergies": f"a list from: {_enum_labels(Allergen)} (raw values for update_state: {_enum_raw_values(Allergen)})",
-        "spice_ok": f"Yes or No (raw values for update_state: true, false)",
-    },
-    FlowStep.ANIME: {
-        "favorite_genres": f"a list from: {_enum_labels(AnimeGenre)} (raw values for update_state: {_enum_raw_values(AnimeGenre)})",
-        "sub_or_dub": f"one of: {_enum_labels(SubDubPref)} (raw values for update_state: {_enum_raw_values(SubDubPref)})",
-        "top_3_anime": "a list of up to 3 anime titles (free-text strings)",
-    },
-}
-
-
-@agent.system_prompt(dynamic=True)
+_BEHAVIOR_RULES = "\n".join([
+    "",
+    "## Behavior rules",
+    "",
+    "1. INTENT CLASSIFICATION: For each user message, determine the intent:",
+    "   - FLOW: The user is answering onboarding questions. Extract answers and call update_state.",
+    "   - QUESTION: The user is asking a question about the app, the process, diet types, anime genres, etc. Use rag_search to find relevant info, then answer.",
+    "   - OUT_OF_SCOPE: The user is asking about something completely unrelated (e.g. politics, math homework). Politely redirect them back to the onboarding.",
+    "",
+    "2. For FLOW intent:",
+    "   - Extract ALL answers the user provided in their message (they may answer multiple fields at once).",
+    "   - You MUST do BOTH of these steps — never skip either one:",
+    "     a) Call update_state tool with {field_name: value} for every extracted answer.",
+    "     b) Set state_patch in your response to the SAME dict, e.g. {\"display_name\": \"Alex\"}.",
+    "   - state_patch is REQUIRED whenever the user provides an answer. A null state_patch with mode='flow_question' is a bug.",
+    "   - After updating, ask the next missing field. If the step is complete, acknowledge it and introduce the next step.",
+    "   - Set mode='flow_question' in your response. Include next_question if there are still missing fields.",
+    "",
+    "3. For QUESTION intent:",
+    "   - Call rag_search with the user's question to find relevant information.",
+    "   - Answer based on the RAG results. Include the sources in your response.",
+    "   - Set mode='answer' in your response.",
+    "   - After answering, gently remind them where they are in the flow.",
+    "",
+    "4. For OUT_OF_SCOPE intent:",
+    "   - Set mode='guardrail' in your response.",
+    "   - Politely explain you can only help with onboarding and related questions.",
+    "",
+    "5. When all steps are DONE, set mode='done' and give a friendly summary.",
+    "",
+    "6. For the FIRST message of the conversation:",
+    "   - If the message is a greeting (hi, hello, etc.), welcome the user and ask the first question.",
+    "   - If the message contains actual information (e.g. a name like 'Hugo'), treat it as an answer: call update_state AND set state_patch.",
+    "",
+    "7. CRITICAL: When the user answers a question, you MUST call update_state AND set state_patch. Never produce a flow_question response with state_patch=null after the user gave an answer.",
+])
+
+
 async def build_system_prompt(ctx: RunContext[AgentDeps]) -> str:
-    state = ctx.deps.state
-    step = state.current_step
-    missing = state.compute_missing_fields()
-
-    prompt_parts = [
-        "You are a friendly onboarding assistant guiding the user through a 3-step profile setup.",
-        "The steps are: Profile → Food → Anime.",
-        "",
-        f"Current step: {step.value}",
-    ]
-
-    if step != FlowStep.DONE:
-        answers = state._answers_for_step(step)
-        prompt_parts.append(f"Filled fields:\n{_format_answers(answers)}")
-        prompt_parts.append(f"Missing fields: {', '.join(missing) if missing else 'none'}")
-        prompt_parts.append("")
-        prompt_parts.append("Valid values for current step fields:")
-        for field_name, desc in _STEP_FIELDS[step].items():
-            prompt_parts.append(f"  - {field_name}: {desc}")
-    else:
-        prompt_parts.append("All steps are complete! Summarize the user's profile.")
-
-    prompt_parts.extend([
-        "",
-        "## Behavior rules",
-        "",
-        "1. INTENT CLASSIFICATION: For each user message, determine the intent:",
-        "   - FLOW: The user is answering onboarding questions. Extract answers and call update_state.",
-        "   - QUESTION: The user is asking a question about the app, the process, diet types, anime genres, etc. Use rag_search to find relevant info, then answer.",
-        "   - OUT_OF_SCOPE: The user is asking about something completely unrelated (e.g. politics, math homework). Politely redirect them back to the onboarding.",
-        "",
-        "2. For FLOW intent:",
-        "   - Extract ALL answers the user provided in their message (they may answer multiple fields at once).",
-        "   - You MUST do BOTH of these steps — never skip either one:",
-        "     a) Call update_state tool with {field_name: value} for every extracted answer.",
-        "     b) Set state_patch in your response to the SAME dict, e.g. {\"display_name\": \"Alex\"}.",
-        "   - state_patch is REQUIRED whenever the user provides an answer. A null state_patch with mode='flow_question' is a bug.",
-        "   - After updating, ask the next missing field. If the step is complete, acknowledge it and introduce the next step.",
-        "   - Set mode='flow_question' in your response. Include next_question if there are still missing fields.",
-        "",
-        "3. For QUESTION intent:",
-        "   - Call rag_search with the user's question to find relevant information.",
-        "   - Answer based on the RAG results. Include the sources in your response.",
-        "   - Set mode='answer' in your response.",
-        "   - After answering, gently remind them where they are in the flow.",
-        "",
-        "4. For OUT_OF_SCOPE intent:",
-        "   - Set mode='guardrail' in your response.",
-        "   - Politely explain you can only help with onboarding and related questions.",
-        "",
-        "5. When all steps are DONE, set mode='done' and give a friendly summary.",
-        "",
-        "6. For the FIRST message of the conversation:",
-        "   - If the message is a greeting (hi, hello, etc.), welcome the user and ask the first question.",
-        "   - If the message contains actual information (e.g. a name like 'Hugo'), treat it as an answer: call update_state AND set state_patch.",
-        "",
-        "7. CRITICAL: When the user answers a question, you MUST call update_state AND set state_patch. Never produce a flow_question response with state_patch=null after the user gave an answer.",
-    ])
-
-    return "\n".join(prompt_parts)
-
-
-@agent.tool
+    return render_system_prompt(ctx.deps.state)
+
+
+def render_system_prompt(state: AssistantState) -> str:
+    with phase("prompt_build"):
+        flow = state.flow
+        step = state.current_step
+        missing = state.compute_missing_fields()
+
+        prompt_parts = [
+            flow.intro_prompt,
+            "",
+            f"Current step: {step.value}",
+        ]
+
+        if step != FlowStep.DONE:
+            answers = state._answers_for_step(step)
+            prompt_parts.append(f"Filled fields:\n{_format_answers(answers)}")
+            prompt_parts.append(f"Missing fields: {', '.join(missing) if missing else 'none'}")
+            prompt_parts.append("")
+            prompt_parts.append(flow.step_prompts[step])
+        else:
+            prompt_parts.append(flow.done_prompt)
+
+        prompt_parts.append(_BEHAVIOR_RULES)
+
+        return "\n".join(prompt_parts)
+
+
+def system_prompt_part(state: AssistantState) -> SystemPromptPart:
+    """The system prompt as an agent run puts it at the start of a new history.
+
+    agent.run only adds system prompts when the history is empty; a history
+    started without one sends every later run to the model without it. The
+    ``dynamic_ref`` makes later runs re-render this part for their state.
+    """
+    return SystemPromptPart(
+        render_system_prompt(state), dynamic_ref=build_system_prompt.__qualname__
+    )
+
+
 async def rag_search(ctx: RunContext[AgentDeps], query: str, top_k: int = 3) -> str:
     """Search the knowledge base for information about the app, onboarding process, diet types, or anime genres."""
-    sources = await ctx.deps.vector_store.search(query, top_k=top_k)
+    deadline = ctx.deps.deadline
+    try:
+        async with asyncio.timeout(deadline.remaining() if deadline else None):
+            with tracer.span("rag_search", {"rag.top_k": top_k}), phase("rag_search"):
+                sources = await ctx.deps.vector_store.search(query, top_k=top_k)
+    except TimeoutError:
+        return "The knowledge base did not respond in time. Answer briefly from what you know."
+    except AdmissionRejected:
+        return "The knowledge base is busy right now. Answer briefly from what you know."
     if not sources:
         return "No relevant information found."
     parts = []
@@ -170,7 +175,6 @@ async def rag_search(ctx: RunContext[AgentDeps], query: str, top_k: int = 3) ->
     return "\n\n---\n\n".join(parts)
 
 
-@agent.tool
 async def update_state(ctx: RunContext[AgentDeps], patch: dict[str, object]) -> str:
     """Update the current step's answers with extracted values from the user's message.
 
@@ -181,79 +185,145 @@ async def update_state(ctx: RunContext[AgentDeps], patch: dict[str, object]) ->
     """
     state = ctx.deps.state
     step = state.current_step
+    with (
+        tracer.span("update_state", {
+            "conversation.step": step.value, "update_state.fields": len(patch),
+        }) as span,
+        phase("update_state"),
+    ):
+        if step == FlowStep.DONE:
+            return "All steps already complete. No update needed."
+
+        result = state.flow.patch_engine.apply(state, patch, step=step)
+        span.set_attribute("update_state.rejected", len(result.errors))
+        if result.errors and not result.updates:
+            errors = "; ".join(f"{k}: {msg}" for k, msg in result.errors.items())
+            return f"Validation error: {errors}. Please check the values and try again."
+
+        # Recompute missing fields and advance if complete
+        missing = state.compute_missing_fields()
+        if not missing:
+            state.advance_step()
+            if state.current_step == FlowStep.DONE:
+                return "Step complete! All steps are now done."
+            return f"Step '{step.value}' complete! Moving to '{state.current_step.value}' step."
+
+        reply = f"Updated. Still missing: {', '.join(missing)}"
+        if result.errors:
+            errors = "; ".join(f"{k}: {msg}" for k, msg in result.errors.items())
+            reply += f". Rejected (fix and retry): {errors}"
+        return reply
 
-    if step == FlowStep.DONE:
-        return "All steps already complete. No update needed."
-
-    answers = state._answers_for_step(step)
-    model_cls = _STEP_ANSWERS_MAP[step]
-
-    # Merge the patch into existing answers
-    current = answers.model_dump()
-    for key, value in patch.items():
-        if key in current:
-            current[key] = value
-
-    # Validate via Pydantic — retry with normalized labels if first attempt fails
-    try:
-        updated = model_cls.model_validate(current)
-    except Exception:
-        current = answers.model_dump()
-        for key, value in patch.items():
-            if key in current:
-                if isinstance(value, str):
-                    current[key] = normalize_enum_value(value)
-                elif isinstance(value, list):
-                    current[key] = [
-                        normalize_enum_value(v) if isinstance(v, str) else v
-                        for v in value
-                    ]
-                else:
-                    current[key] = value
-        try:
-            updated = model_cls.model_validate(current)
-        except Exception as e:
-            return f"Validation error: {e}. Please check the values and try again."
-
-    # Apply back to state
-    setattr(state, step.value, updated)
-
-    # Recompute missing fields and advance if complete
-    missing = state.compute_missing_fields()
-    if not missing:
-        state.advance_step()
-        if state.current_step == FlowStep.DONE:
-            return "Step complete! All steps are now done."
-        return f"Step '{step.value}' complete! Moving to '{state.current_step.value}' step."
-
-    return f"Updated. Still missing: {', '.join(missing)}"
 
-
-@agent.output_validator
 async def ensure_state_updated(
     ctx: RunContext[AgentDeps], result: AssistantResponse
 ) -> AssistantResponse:
     """Force a retry when the LLM produces a flow_question without calling update_state."""
-    if result.mode != ResponseMode.FLOW_QUESTION:
-        return result
-    if not ctx.deps.has_prior_turns:
-        return result  # First message — may be a greeting, nothing to extract
-    if ctx.deps.is_auto_trigger:
-        return result  # Auto-triggered message (e.g. form return), nothing to extract
-    if _looks_like_question(ctx.deps.user_message):
-        return result  # User asked a question, not providing an answer
-    state = ctx.deps.state
-    if state.current_step == FlowStep.DONE:
-        return result
-    # If missing fields changed, the tool was called successfully
-    missing_now = list(state.compute_missing_fields())
-    if missing_now != ctx.deps.missing_before:
-        return result
-    # state_patch fallback will handle this case in app.py
-    if result.state_patch:
-        return result
+    with phase("output_validation"):
+        if result.mode != ResponseMode.FLOW_QUESTION:
+            return result
+        if not ctx.deps.has_prior_turns:
+            return result  # First message — may be a greeting, nothing to extract
+        if ctx.deps.is_auto_trigger:
+            return result  # Auto-triggered message (e.g. form return), nothing to extract
+        if _looks_like_question(ctx.deps.user_message):
+            return result  # User asked a question, not providing an answer
+        state = ctx.deps.state
+        if state.current_step == FlowStep.DONE:
+            return result
+        # If missing fields changed, the tool was called successfully
+        missing_now = list(state.compute_missing_fields())
+        if missing_now != ctx.deps.missing_before:
+            return result
+        # state_patch fallback will handle this case in app.py
+        if result.state_patch:
+            return result
+    _OUTPUT_RETRIES.inc()
+    tally("retry")
     raise ModelRetry(
         "You MUST call the update_state tool when the user provides an answer. "
         "Re-read the user's message, extract their answer, and call update_state "
         "with the correct field names and values."
     )
+
+
+def create_agent(model: Model | str | None = None) -> Agent[AgentDeps, AssistantResponse]:
+    """Build an onboarding agent; prompt and tools read the flow from the state."""
+    if not isinstance(model, Model):
+        model = chat_model(model or DEFAULT_MODEL)
+    new_agent = Agent(
+        model,
+        output_type=AssistantResponse,
+        deps_type=AgentDeps,
+        retries=2,
+    )
+    new_agent.system_prompt(dynamic=True)(build_system_prompt)
+    new_agent.tool(rag_search)
+    new_agent.tool(update_state)
+    new_agent.output_validator(ensure_state_updated)
+    return new_agent
+
+
+agent = create_agent()
+
+
+class DeadlineModel(WrapperModel):
+    """Gives each request to the wrapped model the time left before ``deadline``.
+
+    Run-level model settings are fixed when the run starts, so a timeout set
+    there would hand every later tool-call round trip the whole budget again.
+    """
+
+    def __init__(self, wrapped: Model | str, deadline: Deadline) -> None:
+        super().__init__(wrapped)
+        self.deadline = deadline
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        model_settings = merge_model_settings(
+            model_settings, ModelSettings(timeout=self.deadline.remaining())
+        )
+        return await super().request(messages, model_settings, model_request_parameters)
+
+
+async def run_agent(
+    onboarding_agent: Agent[AgentDeps, AssistantResponse],
+    message: str,
+    *,
+    deps: AgentDeps,
+    message_history: Sequence[ModelMessage],
+    **kwargs,
+) -> AgentRunResult[AssistantResponse]:
+    """``onboarding_agent.run(...)``, timing each model request and counting its tokens.
+
+    Driving the run node by node measures the model round trips whichever
+    model ends up serving them, including ``agent.override`` in tests. With
+    a ``deps.deadline``, each model request times out when the deadline does.
+    """
+    if deps.deadline is not None:
+        model = kwargs.get("model") or onboarding_agent.model
+        kwargs["model"] = DeadlineModel(model, deps.deadline)
+    async with onboarding_agent.iter(
+        message, deps=deps, message_history=message_history, **kwargs
+    ) as agent_run:
+        node = agent_run.next_node
+        while not Agent.is_end_node(node):
+            if not Agent.is_model_request_node(node):
+                node = await agent_run.next(node)
+                continue
+            with tracer.span("model_request") as span, phase("model_request"):
+                node = await agent_run.next(node)
+                _MODEL_REQUESTS.inc()
+                if Agent.is_call_tools_node(node):
+                    response = node.model_response
+                    _TOKENS.inc(response.usage.input_tokens, kind="input")
+                    _TOKENS.inc(response.usage.output_tokens, kind="output")
+                    span.set_attribute("gen_ai.response.model", response.model_name)
+                    span.set_attribute("gen_ai.usage.input_tokens", response.usage.input_tokens)
+                    span.set_attribute("gen_ai.usage.output_tokens", response.usage.output_tokens)
+    assert agent_run.result is not None
+    return agent_run.result
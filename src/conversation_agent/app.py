@@ -1,171 +1,294 @@
+import asyncio
+import math
+import secrets
+import time
+from concurrent.futures import Executor
 from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
+from typing import Annotated
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from pydantic_ai import Embedder
+from pydantic import BaseModel, SerializeAsAny
 from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
 
-from .agent import AgentDeps, agent
+from .admission import AdmissionController, AdmissionRejected, Priority
+from .agent import AgentDeps, agent, create_agent, run_agent, system_prompt_part
+from .cancellation import ClientDisconnected, RunCostTracker, cancel_on_disconnect
+from .config import settings
+from .deadline import Deadline
+from .flow import FLOWS_DIR, CompiledFlow, FlowState
+from .hedging import Hedger
+from .idempotency import IdempotencyConflict, IdempotencyStore
+from .loop_monitor import LoopMonitor
+from .metrics import REGISTRY
 from .models import (
-    AgeRange,
-    Allergen,
-    AnimeGenre,
+    DEFAULT_FLOW,
     AssistantResponse,
     AssistantState,
-    DietType,
     FlowStep,
     QuestionSpec,
     ResponseMode,
-    SubDubPref,
-    _STEP_ANSWERS_MAP,
-    enum_label,
-    field_to_step,
-    normalize_enum_value,
 )
+from .phases import RequestTimer, RequestTrace, phase, request_timer
+from .profiling import ProfileRequest, ProfileStatus, profiler
+from .providers import chat_model, embedder
 from .rag import VectorStore
+from .responses import ModelJSONResponse
+from .scoring import make_executor
 from .session import get_or_create_session, get_session
+from .tenancy import FlowRegistry, FlowRuntime, UnknownFlow
+from .tracing import tracer
+from .turn_cache import TurnCache, classify_turn, fallback_response
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 STATIC_DIR = PROJECT_ROOT / "static"
-CORPUS_PATH = PROJECT_ROOT / "data" / "rag_corpus.json"
+DATA_DIR = PROJECT_ROOT / "data"
+CORPUS_PATH = DATA_DIR / "rag_corpus.json"
+EMBEDDING_MODEL = "openai:text-embedding-3-small"
 
 _vector_store: VectorStore | None = None
+_turn_cache: TurnCache | None = TurnCache()
+
+_run_admission = AdmissionController(
+    "model",
+    max_concurrency=settings.max_concurrent_runs,
+    max_queue=settings.max_queued_runs,
+    queue_timeout=settings.run_queue_timeout,
+    retry_after=settings.retry_after,
+    auto_queue_timeout=settings.auto_queue_timeout,
+)
+_hedger: Hedger | None = (
+    Hedger(
+        percentile=settings.hedge_percentile,
+        min_delay=settings.hedge_min_delay,
+        initial_delay=settings.hedge_initial_delay,
+    )
+    if settings.hedge_enabled else None
+)
+# Empty hedge_model: hedge with the primary model
+_hedge_model = chat_model(settings.hedge_model) if settings.hedge_model else None
+_idempotency: IdempotencyStore | None = IdempotencyStore(
+    ttl=settings.idempotency_ttl, max_entries=settings.idempotency_max_entries
+)
+_run_costs = RunCostTracker()
+_DEADLINES_EXCEEDED = REGISTRY.counter(
+    "conversation_agent_deadlines_exceeded_total",
+    "/chat requests answered with a fallback because their deadline expired.",
+)
+_embed_admission = AdmissionController(
+    "embed",
+    max_concurrency=settings.max_concurrent_embeds,
+    max_queue=settings.max_queued_embeds,
+    queue_timeout=settings.embed_queue_timeout,
+    retry_after=settings.retry_after,
+)
+
+# Created at startup and shut down at exit, along with the stores that use it
+_score_executor: Executor | None = None
+
+
+def _new_vector_store() -> VectorStore:
+    return VectorStore(
+        embedder(EMBEDDING_MODEL),
+        admission=_embed_admission,
+        executor=_score_executor,
+        inline_max_docs=settings.rag_inline_max_docs,
+    )
+
+
+async def _build_runtime(flow: CompiledFlow) -> FlowRuntime:
+    """Agent and vector store for a flow other than the default one."""
+    vector_store = _new_vector_store()
+    if flow.corpus:
+        await vector_store.load_corpus(DATA_DIR / flow.corpus)
+    return FlowRuntime(flow, create_agent(flow.model), vector_store)
+
+
+_flows = FlowRegistry(
+    FLOWS_DIR, _build_runtime, settings.max_loaded_flows, preloaded=(DEFAULT_FLOW,)
+)
+
+
+async def _runtime_for(flow: CompiledFlow) -> FlowRuntime:
+    if flow is DEFAULT_FLOW:
+        # The default flow is loaded at startup and never evicted
+        assert _vector_store is not None
+        return FlowRuntime(flow, agent, _vector_store)
+    return await _flows.runtime(flow.id)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _vector_store
-    embedder = Embedder("openai:text-embedding-3-small")
-    _vector_store = VectorStore(embedder)
-    await _vector_store.load_corpus(CORPUS_PATH)
-    yield
+    global _vector_store, _score_executor
+    monitor = None
+    if settings.loop_monitor_enabled:
+        monitor = LoopMonitor(settings.loop_monitor_interval, settings.loop_block_threshold)
+        monitor.start()
+    _score_executor = make_executor(settings.rag_executor, settings.rag_executor_workers)
+    _vector_store = _new_vector_store()
+    try:
+        await _vector_store.load_corpus(CORPUS_PATH)
+        yield
+    finally:
+        if monitor is not None:
+            await monitor.stop()
+        # Remove the shared corpus file before the workers mapping it go away
+        _vector_store.close()
+        if _score_executor is not None:
+            _score_executor.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 
-# (options, default_value, multi_select) for each structured field
-_FIELD_OPTIONS: dict[str, tuple[list[str], str | None, bool]] = {
-    "age_range":       ([e.value for e in AgeRange], None, False),
-    "diet":            ([e.value for e in DietType], None, False),
-    "allergies":       ([e.value for e in Allergen], "none", True),
-    "spice_ok":        (["yes", "no"], None, False),
-    "favorite_genres": ([e.value for e in AnimeGenre], None, True),
-    "sub_or_dub":      ([e.value for e in SubDubPref], None, False),
-}
+def _with_server_timing(request: Request, response: Response) -> Response:
+    """Add the Server-Timing header of a timed request that ended in an error.
+
+    Handlers run after the endpoint's request_timer has exited, so the
+    endpoint leaves its timer on ``request.state``.
+    """
+    timer = getattr(request.state, "timer", None)
+    if timer is not None:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    headers = {}
+    if exc.retry_after is not None:
+        headers["Retry-After"] = str(math.ceil(exc.retry_after))
+    return _with_server_timing(request, JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=headers,
+    ))
+
+
+@app.exception_handler(IdempotencyConflict)
+async def idempotency_conflict(request: Request, exc: IdempotencyConflict):
+    return _with_server_timing(
+        request, JSONResponse(status_code=422, content={"detail": str(exc)})
+    )
+
+
+@app.exception_handler(UnknownFlow)
+async def unknown_flow(request: Request, exc: UnknownFlow):
+    return _with_server_timing(
+        request, JSONResponse(status_code=404, content={"detail": str(exc)})
+    )
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected(request: Request, exc: ClientDisconnected):
+    # Nobody is listening; 499 mirrors nginx's "client closed request"
+    return _with_server_timing(request, Response(status_code=499))
 
 
-def apply_state_updates(state: AssistantState, patch: dict) -> None:
-    """Apply a field-name → value patch to the state, validating via Pydantic.
+@app.exception_handler(HTTPException)
+async def http_exception(request: Request, exc: HTTPException):
+    return _with_server_timing(request, await http_exception_handler(request, exc))
+
+
+def apply_state_updates(state: FlowState, patch: dict) -> None:
+    """Apply a field-name → value patch to the state, validating each field.
 
     Works across steps: each field is routed to the step that owns it.
+    Invalid fields are skipped; the valid ones are still applied.
     After merging, missing fields are recomputed and the step advances if complete.
     """
-    # Group fields by step
-    by_step: dict[FlowStep, dict] = {}
-    for key, value in patch.items():
-        step = field_to_step(key)
-        if step is None:
-            continue
-        by_step.setdefault(step, {})[key] = value
-
-    for step, fields in by_step.items():
-        answers = state._answers_for_step(step)
-        model_cls = _STEP_ANSWERS_MAP[step]
-        current = answers.model_dump()
-        for key, value in fields.items():
-            if key in current:
-                current[key] = value
-        try:
-            updated = model_cls.model_validate(current)
-        except Exception:
-            # Retry with normalized enum values
-            current = answers.model_dump()
-            for key, value in fields.items():
-                if key in current:
-                    if isinstance(value, str):
-                        current[key] = normalize_enum_value(value)
-                    elif isinstance(value, list):
-                        current[key] = [
-                            normalize_enum_value(v) if isinstance(v, str) else v
-                            for v in value
-                        ]
-                    else:
-                        current[key] = value
-            try:
-                updated = model_cls.model_validate(current)
-            except Exception:
-                continue
-        setattr(state, step.value, updated)
+    result = state.flow.patch_engine.apply(state, patch)
 
     # Recompute missing fields for all touched steps and advance
-    for step in by_step:
+    for step in result.updates:
         state.compute_missing_fields(step)
     # Advance from current step if complete
     state.advance_step()
 
 
-def _apply_state_patch(patch: dict, state: AssistantState) -> None:
+def _apply_state_patch(patch: dict, state: FlowState) -> None:
     """Apply state_patch from the LLM response as a fallback when update_state tool wasn't called."""
     if state.current_step == FlowStep.DONE:
         return
-    # Only apply fields that are still None (fallback behavior)
-    step = state.current_step
-    answers = state._answers_for_step(step)
-    filtered = {
-        k: v for k, v in patch.items()
-        if hasattr(answers, k) and getattr(answers, k) is None and v is not None
-    }
-    if filtered:
-        apply_state_updates(state, filtered)
+    with phase("state_patch"):
+        # Only apply fields that are still None (fallback behavior)
+        step = state.current_step
+        answers = state._answers_for_step(step)
+        filtered = {
+            k: v for k, v in patch.items()
+            if hasattr(answers, k) and getattr(answers, k) is None and v is not None
+        }
+        if filtered:
+            apply_state_updates(state, filtered)
 
 
 def _attach_next_question(
-    response: AssistantResponse, state: AssistantState
+    response: AssistantResponse, state: FlowState
 ) -> None:
     """Deterministically attach options to flow_question responses."""
     if response.mode != ResponseMode.FLOW_QUESTION:
         return
-    missing = state.compute_missing_fields()
-    if not missing:
+    with phase("next_question"):
+        missing = state.compute_missing_fields()
+        if not missing:
+            return
+        spec = state.flow.fields[missing[0]]
+        question_text = (
+            response.next_question.question_text
+            if response.next_question
+            else ""
+        )
+        response.next_question = QuestionSpec(
+            field_name=spec.name,
+            question_text=question_text,
+            options=list(spec.options) if spec.options else None,
+            option_labels=list(spec.option_labels) if spec.option_labels else None,
+            default_value=spec.default,
+            multi_select=spec.multi_select,
+        )
+
+
+def _commit_state(session, base: FlowState, working: FlowState) -> None:
+    """Publish the state an agent run worked on.
+
+    If the session state changed while the run was in flight (e.g. a form
+    edit via PATCH /state), only the fields the run changed are merged in.
+    """
+    if session.state == base:
+        session.state = working
         return
-    field = missing[0]
-    question_text = (
-        response.next_question.question_text
-        if response.next_question
-        else ""
-    )
-    options, default, multi = _FIELD_OPTIONS.get(field, (None, None, False))
-    option_labels = [enum_label(o) for o in options] if options else None
-    response.next_question = QuestionSpec(
-        field_name=field,
-        question_text=question_text,
-        options=options,
-        option_labels=option_labels,
-        default_value=default,
-        multi_select=multi,
-    )
-
-
-def _display_value(v: object) -> str:
+    changed = {}
+    for step in base.flow.steps:
+        before = base._answers_for_step(step)
+        after = working._answers_for_step(step)
+        for name in type(after).model_fields:
+            if getattr(after, name) != getattr(before, name):
+                changed[name] = getattr(after, name)
+    if changed:
+        apply_state_updates(session.state, changed)
+
+
+def _display_value(v: object, flow: CompiledFlow) -> str:
     if isinstance(v, list):
-        return ", ".join(enum_label(str(i)) for i in v)
+        return ", ".join(flow.label(str(i)) for i in v)
     if isinstance(v, bool):
         return "yes" if v else "no"
-    return enum_label(str(v))
+    return flow.label(str(v))
 
 
 def _inject_form_history(session, updates: dict) -> None:
     """Append synthetic messages recording form-filled values into session history."""
-    parts = [f"{k} = {_display_value(v)}" for k, v in updates.items()]
+    flow = session.state.flow
+    parts = [f"{k} = {_display_value(v, flow)}" for k, v in updates.items()]
     summary = ", ".join(parts)
     session.history.append(
         ModelRequest(parts=[
@@ -181,26 +304,97 @@ def _inject_form_history(session, updates: dict) -> None:
     )
 
 
+def _request_deadline(timeout_header: float | None) -> Deadline:
+    """End-to-end deadline from the X-Request-Timeout header, capped by config."""
+    timeout = settings.request_timeout
+    if timeout_header is not None and timeout_header > 0:
+        timeout = min(timeout_header, settings.max_request_timeout)
+    return Deadline.after(timeout)
+
+
+def _record_cached_turn(session, message: str, response: AssistantResponse) -> None:
+    """Append a synthetic user/assistant exchange for a turn answered without the LLM."""
+    parts = [UserPromptPart(content=message)]
+    if not session.history:
+        # Start the history the way agent.run would, with the system prompt
+        parts.insert(0, system_prompt_part(session.state))
+    session.history.append(ModelRequest(parts=parts))
+    session.history.append(
+        ModelResponse(parts=[TextPart(content=response.message)])
+    )
+
+
+# Sessions of other flows serialize as their own state model
+SessionState = AssistantState | SerializeAsAny[FlowState]
+
+
+def _state_fields(session, since: int | None) -> dict:
+    """The current state_version plus a delta from ``since``, or the full state."""
+    version = session.versions.observe(session.state)
+    if since is not None:
+        delta = session.versions.delta(since)
+        if delta is not None:
+            return {"state_version": version, "state_delta": delta}
+    return {"state_version": version, "state": session.state}
+
+
 class ChatRequest(BaseModel):
     session_id: str | None = None
     message: str
     auto: bool = False
+    # Flow for a new session (default: onboarding); must match an existing one
+    flow_id: str | None = None
+    # Last state_version the client has; the reply then carries a delta
+    state_version: int | None = None
 
 
 class ChatResponse(BaseModel):
     session_id: str
     response: AssistantResponse
-    state: AssistantState
+    state_version: int
+    # Exactly one of these is set: the full state, or JSON-Patch operations
+    # from the client's state_version to this one
+    state: SessionState | None = None
+    state_delta: list[dict] | None = None
+    # Set when the request asked for ?debug=true
+    trace: RequestTrace | None = None
 
 
 class StateUpdateRequest(BaseModel):
     session_id: str
     updates: dict
+    state_version: int | None = None
 
 
 class StateUpdateResponse(BaseModel):
-    state: AssistantState
+    state_version: int
+    state: SessionState | None = None
+    state_delta: list[dict] | None = None
     next_question: QuestionSpec | None = None
+    trace: RequestTrace | None = None
+
+
+async def _idempotent(scope: str, key: str | None, req: BaseModel, fn):
+    """Run ``fn`` once per Idempotency-Key; retries get the stored response."""
+    if key is None or _idempotency is None:
+        return await fn()
+
+    async def run_and_snapshot():
+        # Responses hold live session state; store a copy frozen at this point
+        return (await fn()).model_copy(deep=True)
+
+    return await _idempotency.run(scope, key, req.model_dump_json(), run_and_snapshot)
+
+
+def _timed_response(
+    body: BaseModel, timer: RequestTimer, debug: bool, headers: dict | None = None
+) -> ModelJSONResponse:
+    """Render ``body`` with a Server-Timing header, adding the trace if asked to."""
+    if debug:
+        body = body.model_copy(update={"trace": timer.trace()})
+    response = ModelJSONResponse(body, headers=headers)
+    response.headers["Server-Timing"] = timer.server_timing()
+    return response
 
 
 @app.get("/")
@@ -208,10 +402,95 @@ async def index():
     return FileResponse(STATIC_DIR / "index.html")
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+def _check_admin(token: str | None) -> None:
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not secrets.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/admin/profile", response_model=ProfileStatus)
+async def start_profile(
+    req: ProfileRequest, x_admin_token: Annotated[str | None, Header()] = None
+):
+    """Profile the next ``requests`` /chat and /state requests, or a ``fraction`` of them."""
+    _check_admin(x_admin_token)
+    profiler.start(req)
+    return profiler.status()
+
+
+@app.get("/admin/profile", response_model=ProfileStatus)
+async def profile_status(x_admin_token: Annotated[str | None, Header()] = None):
+    _check_admin(x_admin_token)
+    return profiler.status()
+
+
+@app.delete("/admin/profile", response_model=ProfileStatus)
+async def stop_profile(x_admin_token: Annotated[str | None, Header()] = None):
+    _check_admin(x_admin_token)
+    profiler.stop()
+    return profiler.status()
+
+
+@app.get("/admin/profile/collapsed", response_class=PlainTextResponse)
+async def profile_collapsed(
+    phase: str | None = None, x_admin_token: Annotated[str | None, Header()] = None
+):
+    """Folded stacks for flamegraph.pl, speedscope or inferno."""
+    _check_admin(x_admin_token)
+    return PlainTextResponse(profiler.collapsed(phase))
+
+
+@app.get("/admin/profile/pstats")
+async def profile_pstats(
+    phase: str | None = None, x_admin_token: Annotated[str | None, Header()] = None
+):
+    """Stats file for ``pstats.Stats``, snakeviz or gprof2dot."""
+    _check_admin(x_admin_token)
+    return Response(
+        profiler.pstats(phase),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="profile.pstats"'},
+    )
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
-    session_id, session = get_or_create_session(req.session_id)
-    assert _vector_store is not None
+async def chat(
+    req: ChatRequest,
+    request: Request,
+    x_request_timeout: Annotated[float | None, Header()] = None,
+    idempotency_key: Annotated[str | None, Header()] = None,
+    debug: bool = False,
+):
+    with request_timer() as timer, profiler.request("chat"), tracer.span("chat") as span:
+        request.state.timer = timer
+        deadline = _request_deadline(x_request_timeout)
+        response = await _idempotent(
+            "chat", idempotency_key, req, lambda: _chat(req, request, deadline)
+        )
+        span.set_attribute("session.id", response.session_id)
+        span.set_attribute("response.mode", response.response.mode.value)
+        return _timed_response(response, timer, debug)
+
+
+async def _chat(req: ChatRequest, request: Request, deadline: Deadline) -> ChatResponse:
+    flow = _flows.flow(req.flow_id) if req.flow_id else DEFAULT_FLOW
+    with phase("session_lookup"):
+        session_id, session = get_or_create_session(req.session_id, flow)
+    if req.flow_id and session.state.flow is not flow:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Session belongs to flow '{session.state.flow.id}'",
+        )
+    flow = session.state.flow
+    tracer.current().set_attribute("conversation.step", session.state.current_step.value)
 
     # Snapshot state before agent run so we can detect if the LLM updated it
     missing_before = (
@@ -220,20 +499,95 @@ async def chat(req: ChatRequest):
     )
     has_prior_turns = len(session.history) > 0
 
-    deps = AgentDeps(
-        state=session.state,
-        vector_store=_vector_store,
-        has_prior_turns=has_prior_turns,
-        missing_before=missing_before,
-        user_message=req.message,
-        is_auto_trigger=req.auto,
-    )
+    # Greetings and auto-triggers only depend on the state shape — skip the LLM
+    kind = classify_turn(req.message, has_prior_turns, req.auto)
+    if kind is not None and _turn_cache is not None:
+        cached = _turn_cache.lookup(session.state, kind)
+        if cached is not None:
+            _record_cached_turn(session, req.message, cached)
+            _attach_next_question(cached, session.state)
+            return ChatResponse(
+                session_id=session_id,
+                response=cached,
+                **_state_fields(session, req.state_version),
+            )
 
-    result = await agent.run(
-        req.message,
-        deps=deps,
-        message_history=session.history,
-    )
+    # Each attempt works on its own copy of the state; only the winning
+    # attempt's tool side effects are committed back to the session.
+    base_state = session.state.model_copy(deep=True)
+
+    async def attempt(runtime: FlowRuntime, n: int):
+        deps = AgentDeps(
+            state=base_state.model_copy(deep=True),
+            vector_store=runtime.vector_store,
+            has_prior_turns=has_prior_turns,
+            missing_before=missing_before,
+            user_message=req.message,
+            is_auto_trigger=req.auto,
+            deadline=deadline,
+        )
+        attributes = {
+            "session.id": session_id,
+            "flow.id": flow.id,
+            "conversation.step": base_state.current_step.value,
+            "hedge.attempt": n,
+        }
+        with tracer.span("agent.run", attributes) as span:
+            try:
+                result = await run_agent(
+                    runtime.agent,
+                    req.message,
+                    deps=deps,
+                    message_history=session.history,
+                    model=_hedge_model if n else None,
+                )
+            except Exception as e:
+                # A provider-side timeout at the deadline counts as running out of time
+                if deadline.expired:
+                    raise TimeoutError from e
+                raise
+            usage = result.usage()
+            span.set_attribute("gen_ai.usage.input_tokens", usage.input_tokens)
+            span.set_attribute("gen_ai.usage.output_tokens", usage.output_tokens)
+            span.set_attribute("conversation.step.after", deps.state.current_step.value)
+        return deps, result
+
+    def hedge_slot():
+        # The hedge is a second concurrent run: it needs its own slot, and is
+        # not worth queueing for
+        return _run_admission.release if _run_admission.try_acquire() else None
+
+    async def run():
+        priority = Priority.AUTO if req.auto else Priority.INTERACTIVE
+        async with asyncio.timeout(deadline.remaining()):
+            runtime = await _runtime_for(flow)
+            async with _run_admission.slot(priority, key=session_id):
+                start = time.perf_counter()
+                if _hedger is not None:
+                    deps, result = await _hedger.run(partial(attempt, runtime), hedge_slot)
+                else:
+                    deps, result = await attempt(runtime, 0)
+                _run_costs.record(result.usage().total_tokens, time.perf_counter() - start)
+                return deps, result
+
+    # If the client goes away the run is cancelled; since it only touched a
+    # working copy, the session state and history are left as they were.
+    try:
+        deps, result = await cancel_on_disconnect(
+            request, run(), settings.disconnect_poll_interval, _run_costs
+        )
+    except TimeoutError:
+        _DEADLINES_EXCEEDED.inc()
+        fallback = fallback_response(session.state)
+        _record_cached_turn(session, req.message, fallback)
+        _attach_next_question(fallback, session.state)
+        return ChatResponse(
+            session_id=session_id,
+            response=fallback,
+            **_state_fields(session, req.state_version),
+        )
+
+    _commit_state(session, base_state, deps.state)
 
     # Append new messages to session history
     session.history.extend(result.new_messages())
@@ -247,13 +601,77 @@ async def chat(req: ChatRequest):
     return ChatResponse(
         session_id=session_id,
         response=result.output,
-        state=session.state,
+        **_state_fields(session, req.state_version),
+    )
+
+
+def _state_etag(version: int) -> str:
+    return f'"v{version}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
     )
 
 
+@app.get("/state/{session_id}", response_model=StateUpdateResponse)
+async def get_state(
+    session_id: str,
+    request: Request,
+    if_none_match: Annotated[str | None, Header()] = None,
+    debug: bool = False,
+):
+    with request_timer() as timer, profiler.request("get_state"):
+        request.state.timer = timer
+        with phase("session_lookup"):
+            session = get_session(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        # Missing-field bookkeeping is part of the state, so settle it before
+        # taking the version the ETag is built from. For an unchanged state
+        # both are a few compares, so a 304 never serializes the state.
+        session.state.compute_missing_fields()
+        version = session.versions.observe(session.state)
+        etag = _state_etag(version)
+        if if_none_match is not None and _etag_matches(if_none_match, etag):
+            return Response(
+                status_code=304,
+                headers={"ETag": etag, "Server-Timing": timer.server_timing()},
+            )
+
+        stub = AssistantResponse(mode=ResponseMode.FLOW_QUESTION, message="")
+        _attach_next_question(stub, session.state)
+        body = StateUpdateResponse(
+            state_version=version,
+            state=session.state,
+            next_question=stub.next_question,
+        )
+        return _timed_response(body, timer, debug, headers={"ETag": etag})
+
+
 @app.patch("/state", response_model=StateUpdateResponse)
-async def patch_state(req: StateUpdateRequest):
-    session = get_session(req.session_id)
+async def patch_state(
+    req: StateUpdateRequest,
+    request: Request,
+    idempotency_key: Annotated[str | None, Header()] = None,
+    debug: bool = False,
+):
+    with request_timer() as timer, profiler.request("patch_state"):
+        request.state.timer = timer
+        response = await _idempotent(
+            "state", idempotency_key, req, lambda: _patch_state(req)
+        )
+        return _timed_response(response, timer, debug)
+
+
+async def _patch_state(req: StateUpdateRequest) -> StateUpdateResponse:
+    with phase("session_lookup"):
+        session = get_session(req.session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -268,6 +686,6 @@ async def patch_state(req: StateUpdateRequest):
     _attach_next_question(stub, session.state)
 
     return StateUpdateResponse(
-        state=session.state,
         next_question=stub.next_question,
+        **_state_fields(session, req.state_version),
     )
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable
+from typing import TypeVar
+
+from starlette.requests import Request
+
+from .metrics import REGISTRY
+
+T = TypeVar("T")
+
+_CANCELLED_RUNS = REGISTRY.counter(
+    "conversation_agent_runs_cancelled_total",
+    "Agent runs cancelled before completion.",
+    ("reason",),
+)
+_TOKENS_SAVED = REGISTRY.counter(
+    "conversation_agent_tokens_saved_estimate_total",
+    "Estimated tokens not spent thanks to cancelled agent runs.",
+)
+
+
+class ClientDisconnected(Exception):
+    """The client went away while its request was being processed."""
+
+
+class RunCostTracker:
+    """Exponentially weighted average of tokens and wall time per completed run."""
+
+    def __init__(self, alpha: float = 0.1) -> None:
+        self.alpha = alpha
+        self.tokens: float | None = None
+        self.seconds: float | None = None
+
+    def record(self, tokens: int, seconds: float) -> None:
+        if self.tokens is None or self.seconds is None:
+            self.tokens, self.seconds = float(tokens), seconds
+            return
+        self.tokens += self.alpha * (tokens - self.tokens)
+        self.seconds += self.alpha * (seconds - self.seconds)
+
+    def estimate_remaining(self, elapsed: float) -> float:
+        """Tokens a run cancelled after ``elapsed`` seconds would still have used."""
+        if self.tokens is None or not self.seconds:
+            return 0.0
+        return self.tokens * max(0.0, 1.0 - elapsed / self.seconds)
+
+
+async def cancel_on_disconnect(
+    request: Request,
+    aw: Awaitable[T],
+    poll_interval: float,
+    costs: RunCostTracker | None = None,
+) -> T:
+    """Await ``aw``, cancelling it if the client disconnects first.
+
+    Raises ClientDisconnected once the cancelled work has unwound.
+    """
+    task = asyncio.ensure_future(aw)
+    start = time.perf_counter()
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                _CANCELLED_RUNS.inc(reason="disconnect")
+                if costs is not None:
+                    _TOKENS_SAVED.inc(costs.estimate_remaining(time.perf_counter() - start))
+                raise ClientDisconnected
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+
+ENV_PREFIX = "AGENT_"
+
+
+def _parse(raw: str, default: object) -> object:
+    if isinstance(default, bool):
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(raw)
+    if isinstance(default, float):
+        return float(raw)
+    return raw
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Runtime tuning knobs, overridable via AGENT_<FIELD_NAME> environment variables."""
+
+    # Admission control around agent.run
+    max_concurrent_runs: int = 8
+    max_queued_runs: int = 32
+    run_queue_timeout: float = 15.0
+    # Auto-triggered turns are dropped sooner than typed messages
+    auto_queue_timeout: float = 5.0
+
+    # Hedged agent.run: race a second attempt once the first is slower than
+    # the given latency percentile (initial_delay until enough samples exist)
+    hedge_enabled: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_delay: float = 1.0
+    hedge_initial_delay: float = 8.0
+    hedge_model: str = ""  # Empty: hedge with the primary model
+
+    # End-to-end /chat budget; clients may ask for less (or up to the max)
+    # with an X-Request-Timeout header, in seconds
+    request_timeout: float = 30.0
+    max_request_timeout: float = 120.0
+
+    # How often an in-flight /chat checks whether its client disconnected
+    disconnect_poll_interval: float = 0.25
+
+    # Idempotency-Key replay cache for /chat and /state
+    idempotency_ttl: float = 600.0
+    idempotency_max_entries: int = 10_000
+
+    # Admission control around embed_query
+    max_concurrent_embeds: int = 16
+    max_queued_embeds: int = 64
+    embed_queue_timeout: float = 5.0
+
+    # Where VectorStore.search scores a query against the corpus: "inline" (on
+    # the event loop), "thread" or "process". Corpora of up to
+    # rag_inline_max_docs documents are scored inline regardless; see
+    # benchmarks/bench_scoring.py for the crossover on a given machine
+    rag_executor: str = "thread"
+    rag_executor_workers: int = 4
+    rag_inline_max_docs: int = 500
+
+    # Flows other than the default whose agent and RAG corpus stay loaded
+    max_loaded_flows: int = 4
+
+    # State snapshots kept per session for delta responses; clients further
+    # behind than this get the full state
+    state_versions_kept: int = 8
+
+    # Append tracing spans (OTLP/JSON, one per line) to this file; empty: off
+    trace_file: str = ""
+
+    # Record model and embedding traffic to this JSONL file (gzipped if it
+    # ends in .gz), or answer from such a recording instead of the providers.
+    # Replayed latencies are scaled by replay_latency; 0 answers instantly.
+    record_file: str = ""
+    replay_file: str = ""
+    replay_latency: float = 1.0
+
+    # Sample event-loop lag every loop_monitor_interval seconds, and log the
+    # stack of any callback that blocks the loop for over loop_block_threshold
+    loop_monitor_enabled: bool = False
+    loop_monitor_interval: float = 0.05
+    loop_block_threshold: float = 0.1
+
+    # Token expected in X-Admin-Token by the /admin endpoints; empty: disabled
+    admin_token: str = ""
+
+    # Suggested client back-off for 429/503 responses, in seconds
+    retry_after: float = 2.0
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> Settings:
+        overrides = {}
+        for f in fields(cls):
+            raw = environ.get(ENV_PREFIX + f.name.upper())
+            if raw is not None:
+                overrides[f.name] = _parse(raw, f.default)
+        return cls(**overrides)
+
+
+settings = Settings.from_env()
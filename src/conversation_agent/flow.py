@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+import itertools
+from collections.abc import Mapping
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, ClassVar, Literal
+
+from pydantic import BaseModel, Field, PrivateAttr, create_model, model_validator
+
+from .normalization import EnumIndex
+from .patching import PatchEngine
+
+FLOWS_DIR = Path(__file__).resolve().parent / "flows"
+
+# Value of the terminal step every flow ends in
+DONE = "done"
+
+# The missing-field table has 2**n entries per step
+MAX_FIELDS_PER_STEP = 12
+
+# Process-wide change clock. Answer and state models stamp every change
+# with its next reading, so "has this state changed since" is one compare.
+_CLOCK = itertools.count(1)
+
+
+def default_label(value: str) -> str:
+    return value.replace("_", " ").title()
+
+
+# ── Flow definition (the JSON schema) ──────────────────────────────────
+
+class EnumDef(BaseModel):
+    members: dict[str, str]  # member name → raw value
+    labels: dict[str, str] = Field(default_factory=dict)  # where title-casing is wrong
+    synonyms: dict[str, str] = Field(default_factory=dict)  # free text → raw value
+
+
+class FieldDef(BaseModel):
+    name: str
+    type: Literal["text", "bool", "enum"] = "text"
+    enum: str | None = None
+    multi: bool = False
+    question: str
+    prompt: str | None = None  # Generated for enum fields
+    options: list[str] | None = None  # Generated for enum fields
+    default: str | None = None
+
+
+class StepDef(BaseModel):
+    id: str
+    title: str
+    model: str
+    fields: list[FieldDef]
+
+
+class FlowDef(BaseModel):
+    id: str
+    subject: str
+    greeting: str
+    model: str | None = None  # Defaults to the agent's default model
+    corpus: str | None = None  # RAG corpus file name under data/
+    enums: dict[str, EnumDef] = Field(default_factory=dict)
+    steps: list[StepDef]
+
+    @model_validator(mode="after")
+    def _check(self) -> FlowDef:
+        if not self.steps:
+            raise ValueError("a flow needs at least one step")
+        reserved = set(FlowState.model_fields) | {"flow", DONE}
+        seen: set[str] = set()
+        for step in self.steps:
+            if not step.id.isidentifier() or step.id in reserved:
+                raise ValueError(f"invalid step id {step.id!r}")
+            if not 0 < len(step.fields) <= MAX_FIELDS_PER_STEP:
+                raise ValueError(
+                    f"step {step.id!r} needs 1 to {MAX_FIELDS_PER_STEP} fields"
+                )
+            for f in step.fields:
+                if f.name in seen:
+                    raise ValueError(f"field {f.name!r} is defined twice")
+                seen.add(f.name)
+                if (f.type == "enum") != (f.enum is not None):
+                    raise ValueError(f"field {f.name!r}: enum is required for (only) enum fields")
+                if f.enum is not None and f.enum not in self.enums:
+                    raise ValueError(f"field {f.name!r}: unknown enum {f.enum!r}")
+        for name, enum_def in self.enums.items():
+            values = set(enum_def.members.values())
+            unknown = (set(enum_def.labels) | set(enum_def.synonyms.values())) - values
+            if unknown:
+                raise ValueError(f"enum {name!r}: unknown values {sorted(unknown)}")
+        return self
+
+
+# ── Answer and state base classes ──────────────────────────────────────
+
+class StepAnswers(BaseModel):
+    """Base for step answer models.
+
+    Keeps a bitmask of unset (None) fields, updated on every field
+    assignment, so missing-field lookups never have to walk the model.
+    Every assignment also stamps ``_revision`` from the change clock.
+    """
+
+    _field_bits: ClassVar[dict[str, int]] = {}
+    _missing_by_mask: ClassVar[tuple[tuple[str, ...], ...]] = ((),)
+    _missing_mask: int = PrivateAttr(default=0)
+    _revision: int = PrivateAttr(default=0)
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        super().__pydantic_init_subclass__(**kwargs)
+        names = list(cls.model_fields)
+        cls._field_bits = {name: 1 << i for i, name in enumerate(names)}
+        # mask → missing field names, in declaration order
+        cls._missing_by_mask = tuple(
+            tuple(n for i, n in enumerate(names) if mask & (1 << i))
+            for mask in range(1 << len(names))
+        )
+
+    def model_post_init(self, context: Any) -> None:
+        mask = 0
+        for name, bit in self._field_bits.items():
+            if getattr(self, name) is None:
+                mask |= bit
+        self._missing_mask = mask
+        self._revision = next(_CLOCK)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        bit = self._field_bits.get(name)
+        if bit is not None:
+            # Private attrs are read straight from their dict: going through
+            # pydantic's __getattr__ would cost more than the whole lookup
+            private = self.__pydantic_private__
+            if value is None:
+                private["_missing_mask"] |= bit
+            else:
+                private["_missing_mask"] &= ~bit
+            private["_revision"] = next(_CLOCK)
+
+    def model_copy(self, *, update: Mapping[str, Any] | None = None, deep: bool = False):
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            # update= writes the fields directly, bypassing __setattr__
+            copied.model_post_init(None)
+        return copied
+
+    @property
+    def missing_mask(self) -> int:
+        return self.__pydantic_private__["_missing_mask"]
+
+    @property
+    def missing_fields(self) -> tuple[str, ...]:
+        return self._missing_by_mask[self.__pydantic_private__["_missing_mask"]]
+
+
+class StepStatus(BaseModel):
+    is_complete: bool = False
+    missing_fields: list[str] = Field(default_factory=list)
+    last_question_asked: str | None = None
+
+
+class FlowState(BaseModel):
+    """Base for a flow's state model.
+
+    compile_flow subclasses it with the flow's step enum as ``current_step``
+    and one answers field plus one ``<step>_status`` field per step.
+    """
+
+    flow: ClassVar[CompiledFlow]
+    current_step: str
+
+    # step → (status object, mask) last written to it by compute_missing_fields
+    _synced: dict[Enum, tuple[StepStatus, int]] = PrivateAttr(default_factory=dict)
+    # Change clock reading of the last assignment to a state field
+    _revision: int = PrivateAttr(default=0)
+
+    def model_post_init(self, context: Any) -> None:
+        self._revision = next(_CLOCK)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self.__pydantic_private__["_revision"] = next(_CLOCK)
+
+    def model_copy(self, *, update: Mapping[str, Any] | None = None, deep: bool = False):
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            # update= writes the fields directly, bypassing __setattr__
+            copied.__pydantic_private__["_revision"] = next(_CLOCK)
+        return copied
+
+    @property
+    def revision(self) -> int:
+        """Change clock reading of the last change to this state or its answers.
+
+        A state that reads the same revision twice has not changed in between,
+        as long as answers are only changed by assignment (lists are replaced,
+        never edited in place).
+        """
+        return max(
+            self.__pydantic_private__["_revision"],
+            *(self._answers_for_step(s).__pydantic_private__["_revision"]
+              for s in self.flow.steps),
+        )
+
+    def _answers_for_step(self, step: Enum) -> StepAnswers:
+        return getattr(self, step.value)
+
+    def _status_for_step(self, step: Enum) -> StepStatus:
+        return getattr(self, self.flow.status_fields[step])
+
+    def compute_missing_fields(self, step: Enum | None = None) -> list[str]:
+        step = step or self.current_step
+        if step == DONE:
+            return []
+        answers = self._answers_for_step(step)
+        mask = answers.missing_mask
+        missing = answers._missing_by_mask[mask]
+        status = self._status_for_step(step)
+        synced_by_step = self.__pydantic_private__["_synced"]
+        synced = synced_by_step.get(step)
+        if synced is None or synced[0] is not status or synced[1] != mask:
+            status.missing_fields = list(missing)
+            status.is_complete = mask == 0
+            synced_by_step[step] = (status, mask)
+            self.__pydantic_private__["_revision"] = next(_CLOCK)
+        return list(missing)
+
+    def advance_step(self) -> None:
+        if self.current_step == DONE:
+            return
+        self.compute_missing_fields()
+        if self._answers_for_step(self.current_step).missing_mask:
+            return
+        self.current_step = self.flow.next_step[self.current_step]
+
+
+# ── Compiled flow ──────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    step: Enum
+    question: str
+    prompt: str  # "- name: description" line of the system prompt
+    enum: type[Enum] | None
+    multi_select: bool
+    options: tuple[str, ...] | None
+    option_labels: tuple[str, ...] | None
+    default: str | None
+
+
+@dataclass(frozen=True)
+class CompiledFlow:
+    """Immutable lookup tables compiled from one flow definition.
+
+    Everything the request path needs (answer models, field → step routing,
+    option and label arrays, prompt fragments) is built once here, so hot
+    paths only ever index into these tables.
+    """
+
+    id: str
+    greeting: str
+    model: str | None
+    corpus: str | None
+    step_enum: type[Enum]
+    steps: tuple[Enum, ...]  # In order, without DONE
+    next_step: Mapping[Enum, Enum]
+    enums: Mapping[str, type[Enum]]
+    enum_indexes: Mapping[type[Enum], EnumIndex]
+    answer_models: Mapping[Enum, type[StepAnswers]]
+    state_model: type[FlowState]
+    status_fields: Mapping[Enum, str]
+    fields: Mapping[str, FieldSpec]
+    field_to_step: Mapping[str, Enum]
+    labels: Mapping[str, str]  # raw value → label, for every enum value and option
+    values_by_label: Mapping[str, str]  # lowercased label → raw value
+    intro_prompt: str
+    step_prompts: Mapping[Enum, str]
+    done_prompt: str
+    patch_engine: PatchEngine
+
+    @property
+    def done(self) -> Enum:
+        return self.step_enum(DONE)
+
+    def label(self, value: str) -> str:
+        """Human-readable label for a raw value."""
+        label = self.labels.get(value)
+        return label if label is not None else default_label(value)
+
+
+def _annotation(field: FieldDef, enums: Mapping[str, type[Enum]]) -> Any:
+    base: Any = {"text": str, "bool": bool}.get(field.type) or enums[field.enum]
+    if field.multi:
+        base = list[base]
+    return base | None
+
+
+def _enum_prompt(field: FieldDef, enum_cls: type[Enum], labels: Mapping[str, str]) -> str:
+    kind = "a list from" if field.multi else "one of"
+    shown = ", ".join(labels[m.value] for m in enum_cls)
+    raw = ", ".join(m.value for m in enum_cls)
+    return f"{kind}: {shown} (raw values for update_state: {raw})"
+
+
+def compile_flow(definition: FlowDef) -> CompiledFlow:
+    """Build the models and lookup tables for ``definition``."""
+    enums: dict[str, type[Enum]] = {}
+    labels: dict[str, str] = {}
+    enum_indexes: dict[type[Enum], EnumIndex] = {}
+    for name, enum_def in definition.enums.items():
+        enum_cls = Enum(name, list(enum_def.members.items()), type=str)
+        enums[name] = enum_cls
+        enum_labels = {
+            value: enum_def.labels.get(value, default_label(value))
+            for value in enum_def.members.values()
+        }
+        labels.update(enum_labels)
+        enum_indexes[enum_cls] = EnumIndex(enum_cls, enum_def.synonyms, enum_labels)
+
+    step_enum = Enum(
+        "FlowStep",
+        [(s.id.upper(), s.id) for s in definition.steps] + [(DONE.upper(), DONE)],
+        type=str,
+    )
+    steps = tuple(step_enum(s.id) for s in definition.steps)
+
+    answer_models: dict[Enum, type[StepAnswers]] = {}
+    fields: dict[str, FieldSpec] = {}
+    step_prompts: dict[Enum, str] = {}
+    for step, step_def in zip(steps, definition.steps):
+        answer_models[step] = create_model(
+            step_def.model,
+            __base__=StepAnswers,
+            **{f.name: (_annotation(f, enums), None) for f in step_def.fields},
+        )
+        lines = ["Valid values for current step fields:"]
+        for f in step_def.fields:
+            enum_cls = enums[f.enum] if f.enum is not None else None
+            options = (
+                tuple(m.value for m in enum_cls) if enum_cls is not None
+                else tuple(f.options) if f.options else None
+            )
+            if options:
+                for option in options:
+                    labels.setdefault(option, default_label(option))
+            prompt = f.prompt or _enum_prompt(f, enum_cls, labels)
+            fields[f.name] = FieldSpec(
+                name=f.name,
+                step=step,
+                question=f.question,
+                prompt=prompt,
+                enum=enum_cls,
+                # A pick-list flag: free-text lists are typed in as text
+                multi_select=f.multi and options is not None,
+                options=options,
+                option_labels=tuple(labels[o] for o in options) if options else None,
+                default=f.default,
+            )
+            lines.append(f"  - {f.name}: {prompt}")
+        step_prompts[step] = "\n".join(lines)
+
+    status_fields = {step: f"{step.value}_status" for step in steps}
+    state_model = create_model(
+        "AssistantState",
+        __base__=FlowState,
+        current_step=(step_enum, steps[0]),
+        **{
+            step.value: (model, Field(default_factory=model))
+            for step, model in answer_models.items()
+        },
+        **{
+            status_fields[step]: (StepStatus, Field(default_factory=StepStatus))
+            for step in steps
+        },
+    )
+
+    values_by_label = {label.lower(): value for value, label in labels.items()}
+    titles = [s.title for s in definition.steps]
+    compiled = CompiledFlow(
+        id=definition.id,
+        greeting=definition.greeting,
+        model=definition.model,
+        corpus=definition.corpus,
+        step_enum=step_enum,
+        steps=steps,
+        next_step=MappingProxyType(
+            dict(zip(steps, (*steps[1:], step_enum(DONE))))
+        ),
+        enums=MappingProxyType(enums),
+        enum_indexes=MappingProxyType(enum_indexes),
+        answer_models=MappingProxyType(answer_models),
+        state_model=state_model,
+        status_fields=MappingProxyType(status_fields),
+        fields=MappingProxyType(fields),
+        field_to_step=MappingProxyType({name: spec.step for name, spec in fields.items()}),
+        labels=MappingProxyType(labels),
+        values_by_label=MappingProxyType(values_by_label),
+        intro_prompt="\n".join([
+            "You are a friendly onboarding assistant guiding the user through "
+            f"a {len(steps)}-step {definition.subject} setup.",
+            f"The steps are: {' → '.join(titles)}.",
+        ]),
+        step_prompts=MappingProxyType(step_prompts),
+        done_prompt=f"All steps are complete! Summarize the user's {definition.subject}.",
+        patch_engine=PatchEngine(answer_models, enum_indexes, values_by_label),
+    )
+    state_model.flow = compiled
+    return compiled
+
+
+def load_flow(path: Path) -> CompiledFlow:
+    """Read a JSON flow definition and compile it."""
+    return compile_flow(FlowDef.model_validate_json(path.read_text(encoding="utf-8")))
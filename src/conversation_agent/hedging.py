@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from .metrics import REGISTRY
+
+T = TypeVar("T")
+
+_HEDGES_LAUNCHED = REGISTRY.counter(
+    "conversation_agent_hedges_launched_total",
+    "Second agent.run attempts launched because the first was slow.",
+)
+_HEDGES_SKIPPED = REGISTRY.counter(
+    "conversation_agent_hedges_skipped_total",
+    "Hedges not launched because no admission slot was free.",
+)
+_HEDGE_WINS = REGISTRY.counter(
+    "conversation_agent_hedge_wins_total",
+    "Hedged agent.run attempts that finished before the original.",
+)
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies, used to pick the hedge deadline."""
+
+    def __init__(self, window: int = 256) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[idx]
+
+
+class Hedger:
+    """Runs an attempt and, if it is slower than the ``percentile`` latency seen
+    so far, races a second attempt against it. The first success wins and the
+    other attempt is cancelled.
+
+    Attempts must be side-effect free until their result is committed by the
+    caller — only the winner's result is returned.
+
+    ``admit``, if given, is called before launching the hedge. It returns a
+    callback that releases the capacity it reserved once the hedge finishes,
+    or None to skip the hedge.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        min_delay: float,
+        initial_delay: float,
+        min_samples: int = 20,
+        window: int = 256,
+    ) -> None:
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker(window)
+
+    def delay(self) -> float:
+        if len(self.tracker) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.tracker.percentile(self.percentile))
+
+    async def _timed(self, attempt: Callable[[int], Awaitable[T]], n: int) -> T:
+        start = time.perf_counter()
+        try:
+            result = await attempt(n)
+        except asyncio.CancelledError:
+            # The original attempt is cancelled when it is slow enough to lose to
+            # the hedge. Leaving it out would drop exactly the slow tail and pull
+            # the percentile down, so record how long it ran as a lower bound.
+            if n == 0:
+                self.tracker.record(time.perf_counter() - start)
+            raise
+        self.tracker.record(time.perf_counter() - start)
+        return result
+
+    async def run(
+        self,
+        attempt: Callable[[int], Awaitable[T]],
+        admit: Callable[[], Callable[[], None] | None] | None = None,
+    ) -> T:
+        """Call ``attempt(0)``, hedging with ``attempt(1)`` past the deadline."""
+        tasks = [asyncio.create_task(self._timed(attempt, 0))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay())
+            if not done:
+                release = admit() if admit is not None else None
+                if admit is not None and release is None:
+                    _HEDGES_SKIPPED.inc()
+                else:
+                    _HEDGES_LAUNCHED.inc()
+                    hedge = asyncio.create_task(self._timed(attempt, 1))
+                    if release is not None:
+                        # A done callback runs even if the task is cancelled before it starts
+                        hedge.add_done_callback(lambda _: release())
+                    tasks.append(hedge)
+
+            pending = set(tasks)
+            errors: list[BaseException] = []
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in sorted(done, key=tasks.index):
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            _HEDGE_WINS.inc()
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            losers = [t for t in tasks if not t.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused with a different request body."""
+
+
+@dataclass(eq=False)
+class _Entry:
+    fingerprint: str
+    future: asyncio.Future[Any]
+    expires_at: float | None = None  # None while the first request is running
+
+
+class IdempotencyStore:
+    """Deduplicates retried requests that carry the same Idempotency-Key.
+
+    The first request runs normally. Retries that arrive while it is running
+    wait for its result; retries that arrive afterwards get the stored result
+    until it expires after ``ttl`` seconds. At most ``max_entries`` finished
+    results are kept, oldest evicted first. A failed or cancelled request
+    stores nothing, so its retries run again from scratch.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._running: dict[tuple[str, str], _Entry] = {}
+        # Finished entries in completion order, which with a fixed ttl is
+        # also expiry order
+        self._finished: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._running) + len(self._finished)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        finished = self._finished
+        while finished:
+            entry = next(iter(finished.values()))
+            if entry.expires_at > now and len(finished) <= self.max_entries:
+                break
+            finished.popitem(last=False)
+
+    def _get(self, k: tuple[str, str]) -> _Entry | None:
+        entry = self._running.get(k)
+        return entry if entry is not None else self._finished.get(k)
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        fn: Callable[[], Awaitable[T]],
+    ) -> T:
+        k = (scope, key)
+        while True:
+            self._evict()
+            entry = self._get(k)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflict(
+                    "Idempotency-Key was already used with a different request"
+                )
+            try:
+                return await asyncio.shield(entry.future)
+            except asyncio.CancelledError:
+                if not entry.future.cancelled():
+                    raise  # We were cancelled ourselves
+            except Exception:
+                pass
+            # The original request failed; its entry is gone, so run it ourselves
+
+        entry = _Entry(fingerprint, asyncio.get_running_loop().create_future())
+        self._running[k] = entry
+        try:
+            result = await fn()
+        except BaseException as exc:
+            del self._running[k]
+            if isinstance(exc, Exception):
+                entry.future.set_exception(exc)
+                entry.future.exception()  # Mark retrieved; waiters re-run instead
+            else:
+                entry.future.cancel()
+            raise
+        entry.future.set_result(result)
+        entry.expires_at = time.monotonic() + self.ttl
+        del self._running[k]
+        self._finished[k] = entry
+        self._evict()
+        return result
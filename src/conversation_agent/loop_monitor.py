@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from .metrics import REGISTRY
+from .phases import current_phase
+
+logger = logging.getLogger(__name__)
+
+_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOOP_LAG = REGISTRY.histogram(
+    "conversation_agent_event_loop_lag_seconds",
+    "How late the event loop ran a timer that was due, sampled continuously.",
+    buckets=_LAG_BUCKETS,
+)
+LOOP_BLOCKS = REGISTRY.counter(
+    "conversation_agent_event_loop_blocks_total",
+    "Times the event loop was blocked for longer than the threshold, by phase.",
+    ("phase",),
+)
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports what blocks the loop.
+
+    A task on the loop wakes every ``interval`` seconds and records how late
+    it woke. A watchdog thread watches that heartbeat. When the heartbeat is
+    ``threshold`` seconds overdue, the loop is stuck in one callback or
+    coroutine step. The watchdog then logs the loop thread's stack at that
+    moment, along with the running task and its phase, so the log points at
+    the blocking call itself rather than at whatever ran next.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._heartbeat = time.monotonic()
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start monitoring the running loop; call from the loop thread."""
+        loop = asyncio.get_running_loop()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = loop.create_task(self._beat(), name="loop-monitor")
+        self._watchdog = threading.Thread(
+            target=self._watch,
+            args=(loop, threading.get_ident()),
+            name="loop-watchdog",
+            daemon=True,
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _beat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - due))
+            self._heartbeat = time.monotonic()
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, thread_id: int) -> None:
+        reported = None  # Heartbeat of the stall already reported
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            overdue = time.monotonic() - heartbeat - self.interval
+            if overdue < self.threshold or heartbeat == reported:
+                continue
+            reported = heartbeat
+            self._report(loop, thread_id, overdue)
+
+    def _report(self, loop: asyncio.AbstractEventLoop, thread_id: int, overdue: float) -> None:
+        frame = sys._current_frames().get(thread_id)
+        task = asyncio.current_task(loop)
+        phase_name = task.get_context().get(current_phase) if task is not None else None
+        # Safe from this thread: the loop thread is stuck and cannot touch the counter
+        LOOP_BLOCKS.inc(phase=phase_name or "none")
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        logger.warning(
+            "Event loop blocked for over %.0f ms (phase %s, task %s)\n%s",
+            overdue * 1000,
+            phase_name or "none",
+            task.get_name() if task is not None else "none",
+            stack.rstrip(),
+        )
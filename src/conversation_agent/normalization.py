@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+
+# Words that carry no meaning for matching ("slice-of-life anime" → "slice of life")
+_FILLER = frozenset({
+    "a", "an", "the", "i", "im", "am", "my", "is", "it", "prefer", "like", "mostly",
+    "anime", "genre", "genres", "food", "diet", "allergy", "allergic", "to", "years",
+    "year", "old", "yo", "aged", "please",
+})
+
+# Negated answers ("neither", "not vegan") must not fuzzy-match the value they negate
+_NEGATIONS = frozenset({"no", "not", "neither", "nor", "never", "dont", "doesnt", "none"})
+
+# Numbers outside this span are not ages: birth years ("1990"), counts or
+# option numbers ("2"), scores ("100")
+_MIN_AGE = 10
+_MAX_AGE = 99
+
+_NON_ALNUM = re.compile(r"[^a-z0-9+]+")
+_INT = re.compile(r"\d+")
+_LIST_SPLIT = re.compile(r"\s*(?:,|/|;|&|\band\b)\s*")
+
+_EXACT = 1.0
+_FILLER_STRIPPED = 0.95
+_RANGE_CONTAINED = 0.9
+_MIN_FUZZY_SIMILARITY = 0.6
+# One edit in a short word is as likely a different word as a typo
+# ("mother" → other, "pegan" → vegan), so short keys are not fuzzy-matched.
+_MIN_FUZZY_KEY_LENGTH = 7
+# Share of the key's trigrams a candidate must also have
+_MIN_TRIGRAM_OVERLAP = 0.5
+
+
+@dataclass(frozen=True)
+class EnumMatch:
+    value: str
+    confidence: float  # 1.0 for exact labels/synonyms, lower for fuzzy matches
+
+
+def _canonical(text: str) -> str:
+    return " ".join(_NON_ALNUM.sub(" ", text.lower().replace("'", "")).split())
+
+
+def _trigrams(text: str) -> frozenset[str]:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _similarity(a: str, b: str) -> float:
+    """1 - normalized Levenshtein distance."""
+    if a == b:
+        return 1.0
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return 1.0 - prev[-1] / max(len(a), len(b))
+
+
+def _parse_range(value: str) -> tuple[int, float] | None:
+    """Bounds of a range-like enum value such as '18_24', 'under_18' or '45_plus'."""
+    if m := re.fullmatch(r"(\d+)_(\d+)", value):
+        return int(m[1]), int(m[2])
+    if m := re.fullmatch(r"under_(\d+)", value):
+        return 0, int(m[1]) - 1
+    if m := re.fullmatch(r"(\d+)_plus", value):
+        return int(m[1]), float("inf")
+    return None
+
+
+class EnumIndex:
+    """Precomputed lookup from free text to the values of one enum.
+
+    Resolution order: exact label / value / synonym, the same after dropping
+    filler words, numeric range parsing (for range-valued enums such as
+    AgeRange), then a trigram-filtered edit-distance match. Results are
+    memoized, so repeated inputs resolve with a single dict lookup.
+    """
+
+    def __init__(
+        self,
+        enum_cls: type[Enum],
+        synonyms: Mapping[str, str] | None = None,
+        labels: Mapping[str, str] | None = None,
+    ) -> None:
+        self.enum_cls = enum_cls
+        self._exact: dict[str, str] = {}
+        for member in enum_cls:
+            label = (labels or {}).get(member.value, member.value)
+            for alias in (member.value, label, member.name):
+                self._add(alias, member.value)
+        for alias, value in (synonyms or {}).items():
+            self._add(alias, value)
+        # Fuzzy matching compares space-free keys ("sliceoflife")
+        self._trigram_index: dict[str, list[str]] = {}
+        for key in self._exact:
+            if " " not in key:
+                for gram in _trigrams(key):
+                    self._trigram_index.setdefault(gram, []).append(key)
+        self._ranges = {
+            member.value: bounds
+            for member in enum_cls
+            if (bounds := _parse_range(member.value)) is not None
+        }
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    def _add(self, alias: str, value: str) -> None:
+        key = _canonical(alias)
+        self._exact[key] = value
+        self._exact[key.replace(" ", "")] = value
+
+    def _lookup(self, key: str) -> str | None:
+        return self._exact.get(key) or self._exact.get(key.replace(" ", ""))
+
+    def _resolve(self, text: str) -> EnumMatch | None:
+        key = _canonical(text)
+        if (value := self._lookup(key)) is not None:
+            return EnumMatch(value, _EXACT)
+        stripped = " ".join(w for w in key.split() if w not in _FILLER)
+        if stripped and (value := self._lookup(stripped)) is not None:
+            return EnumMatch(value, _FILLER_STRIPPED)
+        if _NEGATIONS.intersection(key.split()):
+            return None
+        if self._ranges and (match := self._resolve_range(key)) is not None:
+            return match
+        return self._resolve_fuzzy((stripped or key).replace(" ", ""))
+
+    def _resolve_range(self, key: str) -> EnumMatch | None:
+        numbers = [int(n) for n in _INT.findall(key)]
+        if not numbers or not all(_MIN_AGE <= n <= _MAX_AGE for n in numbers):
+            return None
+        lo, hi = min(numbers), max(numbers)
+        words = set(key.split())
+        if len(numbers) == 1 and words & {"under", "below", "less", "younger"}:
+            hi, lo = lo - 1, 0
+        elif len(numbers) == 1 and ("+" in key or words & {"plus", "over", "above", "older"}):
+            hi = float("inf")
+        for value, (r_lo, r_hi) in self._ranges.items():
+            if (lo, hi) == (r_lo, r_hi):
+                return EnumMatch(value, _EXACT)
+        for value, (r_lo, r_hi) in self._ranges.items():
+            if r_lo <= lo and hi <= r_hi:
+                return EnumMatch(value, _RANGE_CONTAINED)
+        return None
+
+    def _resolve_fuzzy(self, key: str) -> EnumMatch | None:
+        if len(key) < _MIN_FUZZY_KEY_LENGTH:
+            return None
+        grams = _trigrams(key)
+        counts: dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                counts[candidate] = counts.get(candidate, 0) + 1
+        min_shared = _MIN_TRIGRAM_OVERLAP * len(grams)
+        best: EnumMatch | None = None
+        for candidate in sorted(counts, key=counts.__getitem__, reverse=True)[:5]:
+            if counts[candidate] < min_shared:
+                break
+            score = _similarity(key, candidate)
+            if score >= _MIN_FUZZY_SIMILARITY and (best is None or score > best.confidence):
+                best = EnumMatch(self._exact[candidate], round(score, 3))
+        return best
+
+
+def split_list_text(text: str) -> list[str]:
+    """Split 'nuts, dairy and eggs' into its items."""
+    return [item for item in _LIST_SPLIT.split(text) if item]
+
+
+def normalize_label(value: str, values_by_label: Mapping[str, str]) -> str:
+    """Convert a human-readable label back to a raw value.
+
+    Looks the label up in ``values_by_label`` (lowercased label → value),
+    then falls back to lowercasing and replacing spaces/hyphens with
+    underscores.
+    """
+    lower = value.lower()
+    found = values_by_label.get(lower)
+    if found is not None:
+        return found
+    return lower.replace("-", "_").replace(" ", "_")
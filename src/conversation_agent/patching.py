@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Any, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from .normalization import EnumIndex, normalize_label, split_list_text
+
+if TYPE_CHECKING:
+    from .flow import FlowState
+
+# Fuzzy enum matches below this confidence are left for validation to reject
+MIN_ENUM_CONFIDENCE = 0.8
+
+
+def _find_enum(annotation: Any) -> type[Enum] | None:
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return annotation
+    for arg in get_args(annotation):
+        found = _find_enum(arg)
+        if found is not None:
+            return found
+    return None
+
+
+def _is_list(annotation: Any) -> bool:
+    if get_origin(annotation) is list:
+        return True
+    return any(_is_list(arg) for arg in get_args(annotation))
+
+
+def _enum_normalizer(index: EnumIndex, is_list: bool) -> Callable[[object], object]:
+    """Map free-text answers onto raw values of one enum via its normalization index."""
+
+    def normalize_one(value: object) -> object:
+        if not isinstance(value, str):
+            return value
+        match = index.resolve(value)
+        if match is None or match.confidence < MIN_ENUM_CONFIDENCE:
+            return value
+        return match.value
+
+    def normalize(value: object) -> object:
+        if is_list and isinstance(value, str):
+            value = split_list_text(value)
+        if isinstance(value, list):
+            return [normalize_one(v) for v in value]
+        return normalize_one(value)
+
+    return normalize
+
+
+def _text_normalizer(values_by_label: Mapping[str, str]) -> Callable[[object], object]:
+    def normalize(value: object) -> object:
+        if isinstance(value, list):
+            return [
+                normalize_label(v, values_by_label) if isinstance(v, str) else v
+                for v in value
+            ]
+        if isinstance(value, str):
+            return normalize_label(value, values_by_label)
+        return value
+
+    return normalize
+
+
+@dataclass(frozen=True)
+class FieldValidator:
+    name: str
+    step: Enum
+    adapter: TypeAdapter
+    # Enum fields are normalized before their single validation pass; other
+    # fields are validated as-is and only normalized on failure.
+    enum_normalize: Callable[[object], object] | None
+    text_normalize: Callable[[object], object]
+
+    def validate(self, value: object) -> object:
+        if self.enum_normalize is not None:
+            return self.adapter.validate_python(self.enum_normalize(value))
+        try:
+            return self.adapter.validate_python(value)
+        except ValidationError:
+            if not isinstance(value, (str, list)):
+                raise
+            return self.adapter.validate_python(self.text_normalize(value))
+
+
+@dataclass
+class PatchResult:
+    updates: dict[Enum, dict[str, object]] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+
+
+def _error_message(exc: ValidationError) -> str:
+    return "; ".join(err["msg"] for err in exc.errors())
+
+
+class PatchEngine:
+    """Validates field-name → value patches one field at a time.
+
+    Built once from the step answer models: every field gets its own
+    TypeAdapter and, for enum-typed fields, a fuzzy normalization index. Only
+    the touched fields are validated, and each invalid field is reported on
+    its own without rejecting the rest of the patch.
+    """
+
+    def __init__(
+        self,
+        answers_map: Mapping[Enum, type[BaseModel]],
+        enum_indexes: Mapping[type[Enum], EnumIndex] | None = None,
+        values_by_label: Mapping[str, str] | None = None,
+    ) -> None:
+        enum_indexes = enum_indexes or {}
+        text_normalize = _text_normalizer(values_by_label or {})
+        self.fields: dict[str, FieldValidator] = {}
+        for step, model_cls in answers_map.items():
+            for name, info in model_cls.model_fields.items():
+                enum_cls = _find_enum(info.annotation)
+                self.fields[name] = FieldValidator(
+                    name=name,
+                    step=step,
+                    adapter=TypeAdapter(info.annotation),
+                    enum_normalize=(
+                        _enum_normalizer(
+                            enum_indexes.get(enum_cls) or EnumIndex(enum_cls),
+                            _is_list(info.annotation),
+                        )
+                        if enum_cls else None
+                    ),
+                    text_normalize=text_normalize,
+                )
+
+    def validate(self, patch: dict, step: Enum | None = None) -> PatchResult:
+        """Validate ``patch``, ignoring unknown fields (and fields outside ``step`` if given)."""
+        result = PatchResult()
+        for key, value in patch.items():
+            validator = self.fields.get(key)
+            if validator is None or (step is not None and validator.step != step):
+                continue
+            try:
+                validated = validator.validate(value)
+            except ValidationError as e:
+                result.errors[key] = _error_message(e)
+                continue
+            result.updates.setdefault(validator.step, {})[key] = validated
+        return result
+
+    def apply(self, state: FlowState, patch: dict, step: Enum | None = None) -> PatchResult:
+        """Validate ``patch`` and write the valid fields into ``state`` in place."""
+        result = self.validate(patch, step)
+        for owner, updates in result.updates.items():
+            answers = state._answers_for_step(owner)
+            for name, value in updates.items():
+                setattr(answers, name, value)
+        return result
+
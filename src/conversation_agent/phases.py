@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from pydantic import BaseModel
+
+from .metrics import REGISTRY
+
+# Most phases are CPU-bound and take microseconds; model requests take seconds
+_PHASE_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+PHASE_SECONDS = REGISTRY.histogram(
+    "conversation_agent_phase_seconds",
+    "Time spent in each phase of serving a request.",
+    ("phase",),
+    buckets=_PHASE_BUCKETS,
+)
+
+# Server-Timing entry → phases summed into it. Tool time includes the RAG
+# search made by the rag_search tool.
+_SERVER_TIMING_GROUPS = {
+    "model": ("model_request",),
+    "tool": ("update_state", "rag_search"),
+    "rag": ("rag_search",),
+    "serialize": ("serialization",),
+}
+
+
+class TraceEvent(BaseModel):
+    phase: str
+    start_ms: float  # Since the request started
+    duration_ms: float
+
+
+class RequestTrace(BaseModel):
+    total_ms: float
+    model_requests: int
+    retries: int
+    events: list[TraceEvent]
+
+
+class RequestTimer:
+    """Phase timings of one request, for its Server-Timing header and debug trace."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.events: list[tuple[str, float, float]] = []  # (phase, start, seconds)
+        self.counts: dict[str, int] = {}
+
+    def total(self, *phases: str) -> float:
+        return sum(seconds for name, _, seconds in self.events if name in phases)
+
+    def count(self, name: str) -> int:
+        return self.counts.get(name, 0)
+
+    def server_timing(self) -> str:
+        """A ``Server-Timing`` header value; durations are in milliseconds."""
+        entries = [
+            f"{name};dur={self.total(*phases) * 1000:.3f}"
+            for name, phases in _SERVER_TIMING_GROUPS.items()
+        ]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.3f}")
+        entries.append(f'model-requests;desc="{self.count("model_request")}"')
+        entries.append(f'retries;desc="{self.count("retry")}"')
+        return ", ".join(entries)
+
+    def trace(self) -> RequestTrace:
+        return RequestTrace(
+            total_ms=round((time.perf_counter() - self.start) * 1000, 3),
+            model_requests=self.count("model_request"),
+            retries=self.count("retry"),
+            # Events are recorded as they end; list them as they began
+            events=[
+                TraceEvent(
+                    phase=name,
+                    start_ms=round((start - self.start) * 1000, 3),
+                    duration_ms=round(seconds * 1000, 3),
+                )
+                for name, start, seconds in sorted(self.events, key=lambda e: e[1])
+            ],
+        )
+
+
+_current_timer: ContextVar[RequestTimer | None] = ContextVar("request_timer", default=None)
+# The innermost phase running in this context; read by the sampling profiler
+current_phase: ContextVar[str | None] = ContextVar("current_phase", default=None)
+
+
+@contextmanager
+def request_timer() -> Iterator[RequestTimer]:
+    """Collect the phases run in this context (and tasks it spawns) into a timer."""
+    timer = RequestTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+def observe(name: str, seconds: float, start: float | None = None) -> None:
+    """Record ``seconds`` spent in phase ``name``, which began at ``start``."""
+    PHASE_SECONDS.observe(seconds, phase=name)
+    timer = _current_timer.get()
+    if timer is not None:
+        if start is None:
+            start = time.perf_counter() - seconds
+        timer.events.append((name, start, seconds))
+        timer.counts[name] = timer.counts.get(name, 0) + 1
+
+
+def tally(name: str) -> None:
+    """Count an occurrence of ``name`` (e.g. a retry) against the current request."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.counts[name] = timer.counts.get(name, 0) + 1
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as phase ``name``, whether or not it raises."""
+    start = time.perf_counter()
+    token = current_phase.set(name)
+    try:
+        yield
+    finally:
+        current_phase.reset(token)
+        observe(name, time.perf_counter() - start, start)
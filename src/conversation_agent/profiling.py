@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import FrameType
+
+from pydantic import BaseModel, Field, model_validator
+
+from .phases import current_phase
+
+# (filename, first line, function name): the key pstats uses for a function
+FuncKey = tuple[str, int, str]
+
+_NO_PHASE = "(no phase)"
+
+# Name of the endpoint, while a sampled request is being served
+_profiled_route: ContextVar[str | None] = ContextVar("profiled_route", default=None)
+
+
+class ProfileRequest(BaseModel):
+    """Which upcoming requests to profile: the next ``requests``, a ``fraction``, or both."""
+
+    requests: int | None = Field(default=None, ge=1)
+    fraction: float | None = Field(default=None, gt=0, le=1)
+    interval: float = Field(default=0.005, ge=0.0005, le=1.0)  # Seconds between samples
+
+    @model_validator(mode="after")
+    def _needs_a_limit(self) -> ProfileRequest:
+        if self.requests is None and self.fraction is None:
+            raise ValueError("Give requests, fraction, or both")
+        return self
+
+
+class ProfileStatus(BaseModel):
+    active: bool
+    requests_profiled: int
+    requests_remaining: int | None
+    fraction: float | None
+    interval: float
+    samples: int
+    samples_by_phase: dict[str, int]
+
+
+def _func_key(frame: FrameType) -> FuncKey:
+    code = frame.f_code
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def _label(key: FuncKey) -> str:
+    filename, line, name = key
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class SamplingProfiler:
+    """Samples the event-loop thread's stack while chosen requests are served.
+
+    A background thread reads the loop thread's current frame every
+    ``interval`` seconds. The sample is kept only when the task running at
+    that moment belongs to a profiled request. It is tagged with the
+    request's endpoint and with the phase the task is in. Interleaved
+    requests on the shared loop are told apart this way, which a
+    deterministic profiler such as cProfile cannot do.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stop: threading.Event | None = None
+        self._thread: threading.Thread | None = None
+        self._config = ProfileRequest(requests=1)
+        self._remaining: int | None = None
+        self._profiled = 0
+        self._in_flight = 0
+        # (route, phase, stack from the outermost frame) → samples, and the
+        # seconds they stand for
+        self._samples: Counter[tuple[str, str, tuple[FuncKey, ...]]] = Counter()
+        self._seconds: Counter[tuple[str, str, tuple[FuncKey, ...]]] = Counter()
+
+    @property
+    def active(self) -> bool:
+        return self._stop is not None
+
+    def start(self, config: ProfileRequest) -> None:
+        """Start a new profile, discarding the previous one; call from the loop thread."""
+        self.stop()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._config = config
+            self._remaining = config.requests
+            self._profiled = 0
+            self._samples.clear()
+            self._seconds.clear()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(loop, threading.get_ident(), config.interval, self._stop),
+            name="sampling-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop sampling; the samples taken so far stay available."""
+        if self._stop is None:
+            return
+        self._stop.set()
+        if wait:
+            self._thread.join()
+        self._stop = self._thread = None
+
+    def _sample(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        thread_id: int,
+        interval: float,
+        stop: threading.Event,
+    ) -> None:
+        # The loop thread holds the GIL while it runs Python code, so samples
+        # come at most every sys.getswitchinterval() (5 ms by default). Each
+        # sample is weighted by the time since the previous one.
+        last = time.perf_counter()
+        while not stop.wait(interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frame = sys._current_frames().get(thread_id)
+            task = asyncio.current_task(loop)
+            if frame is None or task is None:
+                continue  # Loop thread gone, or idle between callbacks
+            context = task.get_context()
+            route = context.get(_profiled_route)
+            if route is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_func_key(frame))
+                frame = frame.f_back
+            stack.reverse()
+            key = (route, context.get(current_phase) or _NO_PHASE, tuple(stack))
+            with self._lock:
+                self._samples[key] += 1
+                self._seconds[key] += elapsed
+
+    def _admit(self) -> bool:
+        with self._lock:
+            if not self.active or self._remaining == 0:
+                return False
+            fraction = self._config.fraction
+            if fraction is not None and random.random() >= fraction:
+                return False
+            if self._remaining is not None:
+                self._remaining -= 1
+            self._profiled += 1
+            self._in_flight += 1
+            return True
+
+    @contextmanager
+    def request(self, route: str) -> Iterator[None]:
+        """Profile the enclosed request if the current profile selects it."""
+        if not self.active or not self._admit():
+            yield
+            return
+        token = _profiled_route.set(route)
+        try:
+            yield
+        finally:
+            _profiled_route.reset(token)
+            with self._lock:
+                self._in_flight -= 1
+                done = self._remaining == 0 and self._in_flight == 0
+            if done:
+                # The last selected request finished; don't hold up its response
+                self.stop(wait=False)
+
+    def status(self) -> ProfileStatus:
+        with self._lock:
+            by_phase: Counter[str] = Counter()
+            for (_, phase_name, _), count in self._samples.items():
+                by_phase[phase_name] += count
+            return ProfileStatus(
+                active=self.active,
+                requests_profiled=self._profiled,
+                requests_remaining=self._remaining,
+                fraction=self._config.fraction,
+                interval=self._config.interval,
+                samples=sum(by_phase.values()),
+                samples_by_phase=dict(by_phase),
+            )
+
+    def _selected(
+        self, phase: str | None
+    ) -> list[tuple[str, str, tuple[FuncKey, ...], int, float]]:
+        with self._lock:
+            return [
+                (route, phase_name, stack, count, self._seconds[route, phase_name, stack])
+                for (route, phase_name, stack), count in self._samples.items()
+                if phase is None or phase_name == phase
+            ]
+
+    def collapsed(self, phase: str | None = None) -> str:
+        """Folded stacks, rooted at the endpoint and phase, for flamegraph tools."""
+        lines = [
+            ";".join([route, f"phase:{phase_name}", *map(_label, stack)]) + f" {count}"
+            for route, phase_name, stack, count, _ in self._selected(phase)
+        ]
+        return "\n".join(sorted(lines)) + ("\n" if lines else "")
+
+    def pstats(self, phase: str | None = None) -> bytes:
+        """The samples as a marshalled stats table, loadable with ``pstats.Stats``.
+
+        Call counts are sample counts and times are the wall time the samples
+        stand for; the call graph is the one seen in the samples.
+        """
+        calls: Counter[FuncKey] = Counter()
+        own: Counter[FuncKey] = Counter()
+        total: Counter[FuncKey] = Counter()
+        edge_calls: Counter[tuple[FuncKey, FuncKey]] = Counter()
+        edge_own: Counter[tuple[FuncKey, FuncKey]] = Counter()
+        edge_total: Counter[tuple[FuncKey, FuncKey]] = Counter()
+        for _, _, stack, count, seconds in self._selected(phase):
+            if not stack:
+                continue
+            own[stack[-1]] += seconds
+            for func in set(stack):  # Recursion counts once
+                calls[func] += count
+                total[func] += seconds
+            for edge in set(zip(stack, stack[1:])):
+                edge_calls[edge] += count
+                edge_total[edge] += seconds
+            if len(stack) > 1:
+                edge_own[stack[-2], stack[-1]] += seconds
+
+        callers: dict[FuncKey, dict[FuncKey, tuple[int, int, float, float]]] = {}
+        for (caller, callee), n in edge_calls.items():
+            callers.setdefault(callee, {})[caller] = (
+                n, n, edge_own[caller, callee], edge_total[caller, callee],
+            )
+        stats = {
+            func: (n, n, own[func], total[func], callers.get(func, {}))
+            for func, n in calls.items()
+        }
+        return marshal.dumps(stats)
+
+
+profiler = SamplingProfiler()
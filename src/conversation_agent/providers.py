@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from functools import cache
+
+from pydantic_ai import Embedder
+from pydantic_ai.models import Model
+
+from .config import settings
+from .traffic import (
+    RecordingEmbeddingModel,
+    RecordingModel,
+    ReplayEmbeddingModel,
+    ReplayModel,
+    TrafficRecorder,
+    TrafficReplay,
+)
+
+
+@cache
+def _recorder() -> TrafficRecorder:
+    return TrafficRecorder(settings.record_file)
+
+
+@cache
+def _replay() -> TrafficReplay:
+    return TrafficReplay(settings.replay_file, latency_scale=settings.replay_latency)
+
+
+def chat_model(name: str) -> Model | str:
+    """The model to run ``name`` with: as-is, or recorded or replayed per settings."""
+    if settings.replay_file:
+        return ReplayModel(f"replay:{name}", _replay())
+    if settings.record_file:
+        return RecordingModel(name, _recorder())
+    return name
+
+
+def embedder(name: str) -> Embedder:
+    """An embedder for ``name``, recorded or replayed per settings."""
+    if settings.replay_file:
+        return Embedder(ReplayEmbeddingModel(f"replay:{name}", _replay()))
+    if settings.record_file:
+        return Embedder(RecordingEmbeddingModel(name, _recorder()))
+    return Embedder(name)
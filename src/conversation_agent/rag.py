@@ -1,20 +1,49 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import os
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 from pydantic_ai import Embedder
 
+from . import scoring
+from .admission import AdmissionController
 from .models import RagSource
+from .phases import phase
+from .tracing import tracer
 
 
 class VectorStore:
-    def __init__(self, embedder: Embedder) -> None:
+    """Cosine-similarity search over an embedded corpus.
+
+    With an ``executor``, corpora of more than ``inline_max_docs`` documents
+    are scored off the event loop. A process pool reads the matrix from a
+    memory-mapped file that all workers share.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        admission: AdmissionController | None = None,
+        executor: Executor | None = None,
+        inline_max_docs: int = 0,
+    ) -> None:
         self._embedder = embedder
+        self._admission = admission
+        self._executor = executor
+        self._inline_max_docs = inline_max_docs
         self._titles: list[str] = []
         self._contents: list[str] = []
         self._matrix: np.ndarray | None = None  # (n_docs, dim), L2-normalized
+        # The matrix saved for process-pool workers, and the file holding it
+        self._shared: tuple[np.ndarray, str] | None = None
+        self._shared_lock = asyncio.Lock()
 
     async def load_corpus(self, path: str | Path) -> None:
         path = Path(path)
@@ -31,22 +60,58 @@ class VectorStore:
         norms = np.where(norms == 0, 1, norms)
         self._matrix = matrix / norms
 
+    async def _score(self, q_vec: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        matrix = self._matrix
+        if self._executor is None or len(matrix) <= self._inline_max_docs:
+            return scoring.top_k(matrix, q_vec, k)
+        if isinstance(self._executor, ProcessPoolExecutor):
+            job = partial(scoring.top_k_mapped, await self._shared_path(matrix), q_vec, k)
+        else:
+            job = partial(scoring.top_k, matrix, q_vec, k)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+
+    async def _shared_path(self, matrix: np.ndarray) -> str:
+        """The file process-pool workers map ``matrix`` from, written on first use."""
+        async with self._shared_lock:
+            if self._shared is None or self._shared[0] is not matrix:
+                path = await asyncio.to_thread(scoring.save_matrix, matrix)
+                self.close()
+                self._shared = (matrix, path)
+                # Evicted stores are not closed explicitly; remove the file with them
+                self._finalizer = weakref.finalize(self, _remove, path)
+            return self._shared[1]
+
+    def close(self) -> None:
+        """Remove the file shared with process-pool workers, if any."""
+        if self._shared is not None:
+            self._finalizer()
+            self._shared = None
+
     async def search(self, query: str, top_k: int = 3) -> list[RagSource]:
+        with tracer.span(
+            "vector_store.search", {"rag.corpus_size": len(self._contents)}
+        ) as span:
+            sources = await self._search(query, top_k)
+            span.set_attribute("rag.results", len(sources))
+            return sources
+
+    async def _search(self, query: str, top_k: int) -> list[RagSource]:
         if self._matrix is None or len(self._contents) == 0:
             return []
 
-        result = await self._embedder.embed_query(query)
-        q_vec = np.array(result.embeddings[0], dtype=np.float32)
-        q_norm = np.linalg.norm(q_vec)
-        if q_norm > 0:
-            q_vec = q_vec / q_norm
-
-        scores = self._matrix @ q_vec  # cosine similarities
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        async with self._admission.slot() if self._admission else nullcontext():
+            with tracer.span("embed_query"), phase("rag_embed"):
+                result = await self._embedder.embed_query(query)
+        with phase("rag_score"):
+            q_vec = np.array(result.embeddings[0], dtype=np.float32)
+            q_norm = np.linalg.norm(q_vec)
+            if q_norm > 0:
+                q_vec = q_vec / q_norm
+            top_indices, top_scores = await self._score(q_vec, top_k)
 
         sources: list[RagSource] = []
-        for idx in top_indices:
-            score = float(scores[idx])
+        for idx, score in zip(top_indices, top_scores):
+            score = float(score)
             if score < 0.3:
                 continue
             sources.append(
@@ -57,3 +122,10 @@ class VectorStore:
                 )
             )
         return sources
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .phases import phase
+
+
+class ModelJSONResponse(JSONResponse):
+    """JSON response rendered straight from a pydantic model by pydantic-core.
+
+    Returning it from an endpoint skips FastAPI's response_model pass, which
+    re-validates the model we just built and then encodes it a second time.
+    Keep ``response_model=`` on the route so the OpenAPI schema stays intact.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with phase("serialization"):
+            if isinstance(content, BaseModel):
+                return content.__pydantic_serializer__.to_json(content)
+            return super().render(content)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+EXECUTOR_KINDS = ("inline", "thread", "process")
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Indices of the ``k`` rows most similar to ``query``, best first, and their scores."""
+    scores = matrix @ query  # Cosine similarities: rows and query are L2-normalized
+    indices = np.argsort(scores)[::-1][:k]
+    return indices, scores[indices]
+
+
+@lru_cache(maxsize=8)
+def _mapped(path: str) -> np.ndarray:
+    return np.load(path, mmap_mode="r")
+
+
+def top_k_mapped(path: str, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """``top_k`` over a matrix saved with ``save_matrix``; runs in pool workers.
+
+    Workers map the file once and keep it mapped. Every process then reads
+    the same page-cache pages instead of holding its own copy of the corpus.
+    This module imports nothing but NumPy, so workers start quickly.
+    """
+    return top_k(_mapped(path), query, k)
+
+
+def save_matrix(matrix: np.ndarray) -> str:
+    """Write ``matrix`` to a temporary ``.npy`` file for ``top_k_mapped``."""
+    fd, path = tempfile.mkstemp(prefix="corpus-", suffix=".npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, matrix)
+    return path
+
+
+def make_executor(kind: str, workers: int) -> Executor | None:
+    """An executor for scoring, or None to score on the event loop."""
+    if kind == "inline":
+        return None
+    if kind == "thread":
+        # NumPy releases the GIL in the matrix product, so threads run it in parallel
+        return ThreadPoolExecutor(workers, thread_name_prefix="rag-score")
+    if kind == "process":
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("forkserver"))
+    raise ValueError(f"Unknown scoring executor {kind!r}; expected one of {EXECUTOR_KINDS}")
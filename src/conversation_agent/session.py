@@ -5,22 +5,42 @@ from dataclasses import dataclass, field
 
 from pydantic_ai.messages import ModelMessage
 
-from .models import AssistantState
+from .config import settings
+from .flow import CompiledFlow, FlowState
+from .metrics import REGISTRY
+from .models import DEFAULT_FLOW, AssistantState
+from .versioning import StateVersions
 
 
 @dataclass
 class Session:
-    state: AssistantState = field(default_factory=AssistantState)
+    # The state model of the session's flow (AssistantState for the default)
+    state: FlowState = field(default_factory=AssistantState)
     history: list[ModelMessage] = field(default_factory=list)
+    versions: StateVersions = field(
+        default_factory=lambda: StateVersions(settings.state_versions_kept)
+    )
 
 
 _store: dict[str, Session] = {}
 
+_SESSIONS = REGISTRY.gauge(
+    "conversation_agent_sessions",
+    "Sessions currently held in memory.",
+)
+_SESSIONS_CREATED = REGISTRY.counter(
+    "conversation_agent_sessions_created_total",
+    "Sessions created, by flow.",
+    ("flow",),
+)
 
-def create_session() -> tuple[str, Session]:
+
+def create_session(flow: CompiledFlow = DEFAULT_FLOW) -> tuple[str, Session]:
     session_id = uuid.uuid4().hex[:12]
-    session = Session()
+    session = Session(state=flow.state_model())
     _store[session_id] = session
+    _SESSIONS.set(len(_store))
+    _SESSIONS_CREATED.inc(flow=flow.id)
     return session_id, session
 
 
@@ -28,7 +48,10 @@ def get_session(session_id: str) -> Session | None:
     return _store.get(session_id)
 
 
-def get_or_create_session(session_id: str | None) -> tuple[str, Session]:
+def get_or_create_session(
+    session_id: str | None, flow: CompiledFlow = DEFAULT_FLOW
+) -> tuple[str, Session]:
+    """The existing session, or a new one in ``flow``."""
     if session_id and session_id in _store:
         return session_id, _store[session_id]
-    return create_session()
+    return create_session(flow)
@@ -0,0 +1,254 @@
+"""A local stand-in for the OpenAI chat-completions and embeddings API.
+
+Answers without any network access, after a configurable latency, and
+fails on demand: a share of requests can be rate-limited (429 with
+Retry-After), fail with a 500, or stall long enough to trip client
+timeouts. Point the app at it with the OpenAI client's own setting:
+
+    uv run python -m conversation_agent.stub_server --port 8100 --latency 0.5 --jitter 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uv run uvicorn conversation_agent.app:app
+
+Chat replies are synthesised from the request's tool schemas: the output
+tool (pydantic-ai's ``final_result``) is called with the smallest
+arguments its schema accepts, with ``mode`` set to ``answer`` so typed
+answers pass the output validator, and overridden by ``output``. With
+``call_tools``, the other tools are called first, once per user turn, so
+tool round trips go over the wire too.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+OUTPUT_TOOL_PREFIX = "final_result"
+
+# Used where the output schema has these fields. The first enum value of
+# this app's mode is flow_question, which the output validator rejects
+# after a typed answer unless update_state changed the state; a plain
+# answer always passes.
+_DEFAULT_OUTPUT = {"mode": "answer"}
+
+
+@dataclass(frozen=True)
+class StubConfig:
+    latency: float = 0.0  # Mean seconds before a chat completion answers
+    jitter: float = 0.0  # Standard deviation of that latency
+    embed_latency: float = 0.0
+    error_rate: float = 0.0  # Share of requests answered with a 500
+    rate_limit_rate: float = 0.0  # Share of requests answered with a 429
+    retry_after: float = 1.0
+    stall_rate: float = 0.0  # Share of requests held for stall_time first
+    stall_time: float = 60.0
+    call_tools: bool = False
+    # Merged over the synthesised output tool arguments, e.g. {"message": "Hi"}
+    output: dict[str, Any] | None = None
+    dimensions: int = 1536  # Embedding size when the request names none
+    seed: int | None = None
+
+
+def _error(status: int, type_: str, message: str, headers: dict[str, str] | None = None):
+    return JSONResponse(
+        {"error": {"message": message, "type": type_, "param": None, "code": type_}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def _example(schema: dict[str, Any], defs: dict[str, Any]) -> Any:
+    """The smallest value that validates against a (pydantic-generated) JSON schema."""
+    if "$ref" in schema:
+        return _example(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return _example(options[0], defs)
+    match schema.get("type"):
+        case "object":
+            props = schema.get("properties", {})
+            return {name: _example(props[name], defs) for name in schema.get("required", [])}
+        case "array":
+            return [_example(schema.get("items", {}), defs)
+                    for _ in range(schema.get("minItems", 0))]
+        case "string":
+            return "stub"[: schema.get("maxLength", 4)].ljust(schema.get("minLength", 0), "x")
+        case "integer" | "number":
+            return schema.get("minimum", 0)
+        case "boolean":
+            return False
+        case "null":
+            return None
+    return None
+
+
+def _tool_call(tool: dict[str, Any], overrides: dict[str, Any] | None = None) -> dict[str, Any]:
+    function = tool["function"]
+    parameters = function.get("parameters") or {}
+    args = _example(parameters, parameters.get("$defs", {}))
+    if overrides:
+        args.update(overrides)
+    return {
+        "id": f"call_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": function["name"], "arguments": json.dumps(args)},
+    }
+
+
+def _reply(body: dict[str, Any], config: StubConfig) -> dict[str, Any]:
+    """The assistant message answering a chat-completions request."""
+    tools = [t for t in body.get("tools") or [] if t.get("type") == "function"]
+    if not tools:
+        return {"role": "assistant", "content": "This is a stub reply."}
+    output = [t for t in tools if t["function"]["name"].startswith(OUTPUT_TOOL_PREFIX)]
+    others = [t for t in tools if t not in output]
+    messages = body.get("messages") or []
+    answering_user = bool(messages) and messages[-1].get("role") == "user"
+    if config.call_tools and others and answering_user:
+        calls = [_tool_call(t) for t in others]
+    elif output:
+        properties = output[0]["function"].get("parameters", {}).get("properties", {})
+        defaults = {k: v for k, v in _DEFAULT_OUTPUT.items() if k in properties}
+        calls = [_tool_call(output[0], {**defaults, **(config.output or {})})]
+    else:
+        calls = [_tool_call(others[0])]
+    return {"role": "assistant", "content": None, "tool_calls": calls}
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _embedding(text: str, dimensions: int) -> np.ndarray:
+    """A unit vector derived from the text, identical across runs."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(config: StubConfig = StubConfig()) -> FastAPI:
+    stub = FastAPI(title="OpenAI stub")
+    rng = random.Random(config.seed)
+    stub.state.requests = 0
+
+    async def misbehave() -> JSONResponse | None:
+        """Roll for a stall, rate limit or server error before answering."""
+        stub.state.requests += 1
+        if rng.random() < config.stall_rate:
+            await asyncio.sleep(config.stall_time)
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            return _error(
+                429, "rate_limit_exceeded", "Rate limit reached (stub).",
+                {"Retry-After": f"{config.retry_after:g}"},
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            return _error(500, "server_error", "The server had an error (stub).")
+        return None
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        if failure := await misbehave():
+            return failure
+        body = await request.json()
+        if body.get("stream"):
+            return _error(400, "invalid_request_error", "Streaming is not supported by the stub.")
+        await asyncio.sleep(max(0.0, rng.gauss(config.latency, config.jitter)))
+        message = _reply(body, config)
+        prompt_tokens = _tokens(json.dumps(body.get("messages", [])))
+        completion_tokens = _tokens(json.dumps(message))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @stub.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        if failure := await misbehave():
+            return failure
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or config.dimensions
+        await asyncio.sleep(config.embed_latency)
+        data = []
+        for i, text in enumerate(inputs):
+            vector = _embedding(str(text), dimensions)
+            encoded = (
+                base64.b64encode(vector.tobytes()).decode()
+                if body.get("encoding_format") == "base64" else vector.tolist()
+            )
+            data.append({"object": "embedding", "index": i, "embedding": encoded})
+        tokens = sum(_tokens(str(text)) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    return stub
+
+
+def main(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="mean seconds before a chat completion answers")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="standard deviation of the chat latency")
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="Retry-After sent with 429s, in seconds")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="share of requests held for --stall-time before answering")
+    parser.add_argument("--stall-time", type=float, default=60.0)
+    parser.add_argument("--call-tools", action="store_true",
+                        help="call the non-output tools before answering each user turn")
+    parser.add_argument("--output", type=json.loads,
+                        help='JSON merged over the output tool arguments, e.g. \'{"message": "Hi"}\'')
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    config = StubConfig(**{
+        k: v for k, v in vars(args).items() if k not in ("host", "port")
+    })
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
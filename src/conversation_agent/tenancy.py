@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import re
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from pydantic_ai import Agent
+
+from .agent import AgentDeps
+from .flow import CompiledFlow, load_flow
+from .metrics import REGISTRY
+from .models import AssistantResponse
+from .rag import VectorStore
+
+_FLOW_ID = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+
+_LOADED = REGISTRY.gauge(
+    "conversation_agent_flows_loaded",
+    "Flows whose agent and vector store are currently loaded.",
+)
+_EVICTIONS = REGISTRY.counter(
+    "conversation_agent_flow_evictions_total",
+    "Loaded flows evicted to stay within the configured limit.",
+)
+
+
+class UnknownFlow(LookupError):
+    """No flow definition exists for the requested flow id."""
+
+
+@dataclass(frozen=True)
+class FlowRuntime:
+    flow: CompiledFlow
+    agent: Agent[AgentDeps, AssistantResponse]
+    vector_store: VectorStore
+
+
+class FlowRegistry:
+    """Serves several onboarding flows from one process.
+
+    Definitions are read from ``<flows_dir>/<flow_id>.json`` and compiled on
+    first use. Compiled flows are small and are kept for good: live sessions
+    hold states built from their models. The heavy parts of a flow (its
+    agent and embedded RAG corpus) are built by ``build`` on first use, and
+    at most ``max_loaded`` of them stay loaded, least recently used evicted
+    first. Concurrent requests for a cold flow share a single build.
+    """
+
+    def __init__(
+        self,
+        flows_dir: Path,
+        build: Callable[[CompiledFlow], Awaitable[FlowRuntime]],
+        max_loaded: int,
+        preloaded: tuple[CompiledFlow, ...] = (),
+    ) -> None:
+        self.flows_dir = flows_dir
+        self.max_loaded = max_loaded
+        self._build = build
+        self._flows: dict[str, CompiledFlow] = {f.id: f for f in preloaded}
+        self._runtimes: OrderedDict[str, asyncio.Future[FlowRuntime]] = OrderedDict()
+
+    @property
+    def loaded(self) -> list[str]:
+        """Ids of flows with a finished runtime, least recently used first."""
+        return [
+            k for k, fut in self._runtimes.items()
+            if fut.done() and not fut.cancelled() and fut.exception() is None
+        ]
+
+    def flow(self, flow_id: str) -> CompiledFlow:
+        """The compiled flow for ``flow_id``, compiling it on first use."""
+        flow = self._flows.get(flow_id)
+        if flow is not None:
+            return flow
+        path = self.flows_dir / f"{flow_id}.json"
+        if not _FLOW_ID.fullmatch(flow_id) or not path.is_file():
+            raise UnknownFlow(f"Unknown flow '{flow_id}'")
+        flow = load_flow(path)
+        if flow.id != flow_id:
+            raise ValueError(f"{path.name} defines flow '{flow.id}'")
+        self._flows[flow_id] = flow
+        return flow
+
+    async def runtime(self, flow_id: str) -> FlowRuntime:
+        """The loaded runtime for ``flow_id``, building it on first use."""
+        while True:
+            fut = self._runtimes.get(flow_id)
+            if fut is None:
+                break
+            self._runtimes.move_to_end(flow_id)
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise  # We were cancelled ourselves
+            # The build we waited on was abandoned; start our own
+
+        flow = self.flow(flow_id)
+        fut = asyncio.get_running_loop().create_future()
+        self._runtimes[flow_id] = fut
+        try:
+            runtime = await self._build(flow)
+        except BaseException as exc:
+            if self._runtimes.get(flow_id) is fut:
+                del self._runtimes[flow_id]
+            if isinstance(exc, Exception):
+                fut.set_exception(exc)
+                fut.exception()  # Mark retrieved; waiters see it re-raised
+            else:
+                fut.cancel()
+            raise
+        fut.set_result(runtime)
+        self._evict()
+        return runtime
+
+    def _evict(self) -> None:
+        for flow_id in self.loaded:
+            if len(self._runtimes) <= self.max_loaded:
+                break
+            del self._runtimes[flow_id]
+            _EVICTIONS.inc()
+        _LOADED.set(len(self.loaded))
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Protocol
+
+from .config import settings
+
+AttributeValue = str | bool | int | float
+
+
+class Span:
+    """One timed operation, shaped after an OpenTelemetry span.
+
+    ``to_dict`` follows the OTLP/JSON encoding of a span, so exported spans
+    can be wrapped into an OTLP export request and loaded by OpenTelemetry
+    tooling as-is.
+    """
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id",
+        "start_ns", "end_ns", "attributes", "error",
+    )
+
+    def __init__(self, name: str, parent: Span | None, attributes: dict[str, AttributeValue]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.error: str | None = None
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now, while the span is open)."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: AttributeValue | None) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": k, "value": _any_value(v)} for k, v in self.attributes.items()
+            ],
+            "status": (
+                {"code": "STATUS_CODE_ERROR", "message": self.error}
+                if self.error is not None else {"code": "STATUS_CODE_OK"}
+            ),
+        }
+
+
+def _any_value(value: AttributeValue) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # int64 is a string in OTLP/JSON
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _NoopSpan:
+    """Stands in for a span while no exporter is configured."""
+
+    def set_attribute(self, key: str, value: AttributeValue | None) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list, for tests and offline analysis."""
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def named(self, name: str) -> list[Span]:
+        return [s for s in self.spans if s.name == name]
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class JsonlExporter:
+    """Appends each finished span to a file as one JSON object per line."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = self.path.open("a", buffering=1)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Creates nested spans and hands finished ones to its exporters.
+
+    The current span is tracked in a context variable, so spans opened in
+    tasks spawned by a request (hedged attempts, tool calls) become its
+    children. Without exporters, ``span`` does no work beyond a lookup.
+    """
+
+    def __init__(self) -> None:
+        self.exporters: list[SpanExporter] = []
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.remove(exporter)
+
+    @contextmanager
+    def span(
+        self, name: str, attributes: Mapping[str, AttributeValue | None] | None = None
+    ) -> Iterator[Span | _NoopSpan]:
+        if not self.exporters:
+            yield _NOOP_SPAN
+            return
+        span = Span(
+            name,
+            _current_span.get(),
+            {k: v for k, v in (attributes or {}).items() if v is not None},
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            for exporter in self.exporters:
+                exporter.export(span)
+
+    def current(self) -> Span | _NoopSpan:
+        """The innermost open span, to add attributes learned along the way."""
+        return _current_span.get() or _NOOP_SPAN
+
+
+tracer = Tracer()
+if settings.trace_file:
+    tracer.add_exporter(JsonlExporter(settings.trace_file))
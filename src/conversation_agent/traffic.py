@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import IO, Any
+
+import numpy as np
+from pydantic_ai.embeddings import EmbeddingModel, EmbeddingResult
+from pydantic_ai.embeddings.base import EmbedInputType
+from pydantic_ai.embeddings.settings import EmbeddingSettings
+from pydantic_ai.embeddings.wrapper import WrapperEmbeddingModel
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+# Fields that differ between two runs of the same conversation
+_VOLATILE = frozenset({
+    "timestamp", "tool_call_id", "provider_response_id", "provider_details",
+    "provider_name", "provider_url", "model_name", "run_id", "usage",
+    "finish_reason", "metadata", "id",
+})
+
+
+class ReplayMiss(LookupError):
+    """A replayed run made a request that is not in the recording."""
+
+
+def _strip(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: _strip(v) for k, v in obj.items() if k not in _VOLATILE}
+    if isinstance(obj, list):
+        return [_strip(v) for v in obj]
+    return obj
+
+
+def _digest(payload: Any) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def request_key(messages: list[ModelMessage]) -> str:
+    """Identify a model request by its content, ignoring ids and timestamps."""
+    return _digest(_strip(ModelMessagesTypeAdapter.dump_python(messages, mode="json")))
+
+
+def embed_key(inputs: Sequence[str], input_type: str) -> str:
+    return _digest([input_type, list(inputs)])
+
+
+def _open(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+class TrafficRecorder:
+    """Appends model and embedding exchanges to a JSONL file (gzipped for ``.gz``).
+
+    Embeddings are stored as base64 float32, a quarter the size of JSON floats.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._file = _open(self.path, "a")
+
+    def _write(self, record: dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def record_model(
+        self, messages: list[ModelMessage], response: ModelResponse, latency: float
+    ) -> None:
+        self._write({
+            "type": "model",
+            "key": request_key(messages),
+            "latency": round(latency, 6),
+            "response": ModelMessagesTypeAdapter.dump_python([response], mode="json")[0],
+        })
+
+    def record_embedding(self, result: EmbeddingResult, latency: float) -> None:
+        vectors = np.asarray(result.embeddings, dtype=np.float32)
+        self._write({
+            "type": "embed",
+            "key": embed_key(result.inputs, result.input_type),
+            "latency": round(latency, 6),
+            "shape": list(vectors.shape),
+            "vectors": base64.b64encode(vectors.tobytes()).decode(),
+        })
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class TrafficReplay:
+    """Serves recorded exchanges by request content.
+
+    A request recorded several times (the same greeting in many sessions,
+    say) gets its recordings in turn, starting over when they run out.
+    ``latency_scale`` multiplies the recorded latencies; 0 replays instantly.
+    """
+
+    def __init__(self, path: str | Path, latency_scale: float = 1.0) -> None:
+        self.path = Path(path)
+        self.latency_scale = latency_scale
+        self._records: dict[str, list[dict[str, Any]]] = {}
+        self._cursors: dict[str, int] = {}
+        with _open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    slot = f"{record['type']}:{record['key']}"
+                    self._records.setdefault(slot, []).append(record)
+
+    def _next(self, kind: str, key: str) -> dict[str, Any]:
+        slot = f"{kind}:{key}"
+        records = self._records.get(slot)
+        if not records:
+            raise ReplayMiss(f"No recorded {kind} exchange for request {key} in {self.path}")
+        i = self._cursors.get(slot, 0)
+        self._cursors[slot] = i + 1
+        return records[i % len(records)]
+
+    async def _delay(self, record: dict[str, Any]) -> None:
+        if self.latency_scale > 0:
+            await asyncio.sleep(record["latency"] * self.latency_scale)
+
+    async def model_response(self, messages: list[ModelMessage]) -> ModelResponse:
+        record = self._next("model", request_key(messages))
+        await self._delay(record)
+        return ModelMessagesTypeAdapter.validate_python([record["response"]])[0]
+
+    async def embeddings(self, inputs: Sequence[str], input_type: str) -> list[list[float]]:
+        record = self._next("embed", embed_key(inputs, input_type))
+        await self._delay(record)
+        vectors = np.frombuffer(base64.b64decode(record["vectors"]), dtype=np.float32)
+        return vectors.reshape(record["shape"]).tolist()
+
+
+class RecordingModel(WrapperModel):
+    """Passes requests through to the wrapped model and records each exchange."""
+
+    def __init__(self, wrapped: Model | str, recorder: TrafficRecorder) -> None:
+        super().__init__(wrapped)
+        self.recorder = recorder
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        start = time.perf_counter()
+        response = await super().request(messages, model_settings, model_request_parameters)
+        self.recorder.record_model(messages, response, time.perf_counter() - start)
+        return response
+
+
+class ReplayModel(Model):
+    """Answers model requests from a recording instead of a provider."""
+
+    def __init__(self, name: str, replay: TrafficReplay) -> None:
+        super().__init__()
+        self._name = name
+        self.replay = replay
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        return await self.replay.model_response(messages)
+
+    @property
+    def model_name(self) -> str:
+        return self._name
+
+    @property
+    def system(self) -> str:
+        return "replay"
+
+
+class RecordingEmbeddingModel(WrapperEmbeddingModel):
+    """Passes embedding calls through to the wrapped model and records them."""
+
+    def __init__(self, wrapped: EmbeddingModel | str, recorder: TrafficRecorder) -> None:
+        super().__init__(wrapped)
+        self.recorder = recorder
+
+    async def embed(
+        self,
+        inputs: str | Sequence[str],
+        *,
+        input_type: EmbedInputType,
+        settings: EmbeddingSettings | None = None,
+    ) -> EmbeddingResult:
+        start = time.perf_counter()
+        result = await super().embed(inputs, input_type=input_type, settings=settings)
+        self.recorder.record_embedding(result, time.perf_counter() - start)
+        return result
+
+
+class ReplayEmbeddingModel(EmbeddingModel):
+    """Answers embedding calls from a recording instead of a provider."""
+
+    def __init__(self, name: str, replay: TrafficReplay) -> None:
+        super().__init__()
+        self._name = name
+        self.replay = replay
+
+    async def embed(
+        self,
+        inputs: str | Sequence[str],
+        *,
+        input_type: EmbedInputType,
+        settings: EmbeddingSettings | None = None,
+    ) -> EmbeddingResult:
+        inputs, _ = self.prepare_embed(inputs, settings)
+        return EmbeddingResult(
+            await self.replay.embeddings(inputs, input_type),
+            inputs=inputs,
+            input_type=input_type,
+            model_name=self._name,
+            provider_name="replay",
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self._name
+
+    @property
+    def system(self) -> str:
+        return "replay"
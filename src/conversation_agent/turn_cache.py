@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import string
+from enum import Enum
+
+from .flow import CompiledFlow
+from .models import AssistantResponse, AssistantState, FlowStep, QuestionSpec, ResponseMode
+
+
+class TurnKind(str, Enum):
+    GREETING = "greeting"
+    AUTO = "auto"
+
+
+_GREETINGS = frozenset({
+    "", "hi", "hello", "hey", "hiya", "yo", "howdy", "start", "hi there",
+    "hello there", "hey there", "good morning", "good afternoon", "good evening",
+})
+
+_STRIP_CHARS = string.punctuation + string.whitespace
+
+
+def classify_turn(message: str, has_prior_turns: bool, auto: bool) -> TurnKind | None:
+    """Classify a turn whose reply depends only on the state shape, or None."""
+    if not has_prior_turns and message.strip(_STRIP_CHARS).lower() in _GREETINGS:
+        return TurnKind.GREETING
+    if auto and has_prior_turns:
+        return TurnKind.AUTO
+    return None
+
+
+def _render(
+    flow: CompiledFlow, step: FlowStep, missing: tuple[str, ...], kind: TurnKind
+) -> AssistantResponse:
+    field = missing[0]
+    question = flow.fields[field].question
+    if kind == TurnKind.GREETING and step == flow.steps[0]:
+        message = f"{flow.greeting} {question}"
+    elif kind == TurnKind.GREETING:
+        message = f"Welcome back! Let's continue with the {step.value} step. {question}"
+    else:
+        message = f"Thanks for updating your details! Next up in the {step.value} step: {question}"
+    return AssistantResponse(
+        message=message,
+        mode=ResponseMode.FLOW_QUESTION,
+        next_question=QuestionSpec(field_name=field, question_text=question),
+    )
+
+
+def fallback_response(state: AssistantState) -> AssistantResponse:
+    """Template reply for a turn the model couldn't answer in time."""
+    missing = state.compute_missing_fields()
+    if not missing:
+        return AssistantResponse(
+            message="Sorry, that took longer than expected. Your profile is complete!",
+            mode=ResponseMode.DONE,
+        )
+    field = missing[0]
+    question = state.flow.fields[field].question
+    return AssistantResponse(
+        message=f"Sorry, that took longer than expected. Let's keep going: {question}",
+        mode=ResponseMode.FLOW_QUESTION,
+        next_question=QuestionSpec(field_name=field, question_text=question),
+    )
+
+
+class TurnCache:
+    """Serves greeting and auto-trigger turns without an LLM call.
+
+    Replies are rendered from templates keyed on (flow, current step, missing
+    fields, turn kind), so every session with the same state shape gets the
+    same reply.
+    Nothing user-specific (e.g. display_name) ever ends up in a cached entry.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[
+            tuple[str, FlowStep, tuple[str, ...], TurnKind], AssistantResponse
+        ] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, state: AssistantState, kind: TurnKind) -> AssistantResponse | None:
+        """Return a fresh copy of the cached reply, or None if the turn needs the LLM."""
+        step = state.current_step
+        if step == FlowStep.DONE:
+            return None  # The final summary is personal — leave it to the model
+        missing = tuple(state.compute_missing_fields())
+        if not missing:
+            return None
+        key = (state.flow.id, step, missing, kind)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self._entries[key] = _render(state.flow, step, missing, kind)
+        else:
+            self.hits += 1
+        return entry.model_copy(deep=True)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import copy
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .flow import FlowState
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def json_diff(old: Any, new: Any, path: str = "") -> list[dict[str, Any]]:
+    """RFC 6902 operations that turn ``old`` into ``new``.
+
+    Objects are diffed key by key; lists and scalars are replaced whole,
+    since state lists are short and edited as a unit.
+    """
+    if old == new:
+        return []
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return [{"op": "replace", "path": path, "value": new}]
+    ops: list[dict[str, Any]] = []
+    for key, value in new.items():
+        child = f"{path}/{_escape(key)}"
+        if key not in old:
+            ops.append({"op": "add", "path": child, "value": value})
+        else:
+            ops.extend(json_diff(old[key], value, child))
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+    return ops
+
+
+def apply_json_patch(doc: Any, ops: list[dict[str, Any]]) -> Any:
+    """Apply operations produced by :func:`json_diff` to a copy of ``doc``."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        if op["path"] == "":
+            doc = copy.deepcopy(op["value"])
+            continue
+        *parents, last = (_unescape(t) for t in op["path"].split("/")[1:])
+        target = doc
+        for token in parents:
+            target = target[token]
+        if op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = copy.deepcopy(op["value"])
+    return doc
+
+
+class StateVersions:
+    """Numbered snapshots of one session's state, for delta responses.
+
+    Each time a changed state is observed the version is bumped and its JSON
+    form remembered. The last ``keep`` versions are retained, so a client
+    that is at most that many versions behind gets a JSON-Patch delta; older
+    or unknown versions fall back to the full state.
+
+    Changes are detected by the state's ``revision``, which its models bump
+    on every assignment, so observing an unchanged state costs one compare;
+    the state is only dumped after it was written to.
+    """
+
+    def __init__(self, keep: int = 8) -> None:
+        self.keep = keep
+        self.version = 0
+        self._revision: int | None = None
+        self._snapshots: OrderedDict[int, dict[str, Any]] = OrderedDict()
+
+    def observe(self, state: FlowState) -> int:
+        """Record ``state`` as a new version if it changed; return the current version."""
+        revision = state.revision
+        if revision == self._revision:
+            return self.version
+        self._revision = revision
+        dumped = state.model_dump(mode="json")
+        # Assignments that wrote back the same values do not make a new version
+        if self._snapshots and self._snapshots[self.version] == dumped:
+            return self.version
+        self.version += 1
+        self._snapshots[self.version] = dumped
+        while len(self._snapshots) > self.keep:
+            self._snapshots.popitem(last=False)
+        return self.version
+
+    def delta(self, since: int) -> list[dict[str, Any]] | None:
+        """Operations from version ``since`` to the current one, or None if unknown."""
+        old = self._snapshots.get(since)
+        if old is None:
+            return None
+        return json_diff(old, self._snapshots[self.version])
@@ -0,0 +1,219 @@
+"""Tests for admission control around agent.run and embed_query."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent.admission import AdmissionController, AdmissionRejected, Priority
+from conversation_agent.agent import agent
+from conversation_agent.config import Settings
+
+from .conftest import make_output_only_fn
+
+
+async def _hold(controller: AdmissionController, release: asyncio.Event) -> None:
+    async with controller.slot():
+        await release.wait()
+
+
+# ── AdmissionController ───────────────────────────────────────────────
+
+
+async def test_admits_up_to_max_concurrency():
+    controller = AdmissionController("test", max_concurrency=2, max_queue=1, queue_timeout=1)
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(_hold(controller, release)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert controller.in_flight == 2
+    assert controller.queue_depth == 0
+    release.set()
+    await asyncio.gather(*tasks)
+    assert controller.in_flight == 0
+
+
+async def test_queued_caller_gets_slot_on_release():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=1)
+    release = asyncio.Event()
+    first = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    assert controller.queue_depth == 1
+    release.set()
+    await asyncio.gather(first, second)
+    assert controller.in_flight == 0
+    assert controller.queue_depth == 0
+
+
+async def test_full_queue_rejected_with_429():
+    controller = AdmissionController(
+        "test", max_concurrency=1, max_queue=0, queue_timeout=1, retry_after=3
+    )
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire()
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.retry_after == 3
+    release.set()
+    await holder
+
+
+async def test_queue_timeout_rejected_with_503():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=0.01)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire()
+    assert exc_info.value.status_code == 503
+    assert controller.queue_depth == 0
+    release.set()
+    await holder
+    assert controller.in_flight == 0
+
+
+# ── Priority scheduling ───────────────────────────────────────────────
+
+
+async def _acquire_and_record(controller, order, label, priority, key=None):
+    async with controller.slot(priority, key=key):
+        order.append(label)
+
+
+async def test_interactive_served_before_auto():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+
+    order: list[str] = []
+    auto = asyncio.create_task(_acquire_and_record(controller, order, "auto", Priority.AUTO, "a"))
+    await asyncio.sleep(0)
+    typed = asyncio.create_task(
+        _acquire_and_record(controller, order, "typed", Priority.INTERACTIVE, "b")
+    )
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, auto, typed)
+    assert order == ["typed", "auto"]
+
+
+async def test_newer_request_supersedes_queued_auto_for_same_session():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+
+    order: list[str] = []
+    stale = asyncio.create_task(
+        _acquire_and_record(controller, order, "stale", Priority.AUTO, "s1")
+    )
+    await asyncio.sleep(0)
+    fresh = asyncio.create_task(
+        _acquire_and_record(controller, order, "fresh", Priority.AUTO, "s1")
+    )
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await stale
+    assert exc_info.value.status_code == 409
+    assert exc_info.value.retry_after is None
+
+    release.set()
+    await asyncio.gather(holder, fresh)
+    assert order == ["fresh"]
+    assert controller.in_flight == 0
+
+
+async def test_full_queue_evicts_auto_for_interactive():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+
+    order: list[str] = []
+    auto = asyncio.create_task(_acquire_and_record(controller, order, "auto", Priority.AUTO, "a"))
+    await asyncio.sleep(0)
+    typed = asyncio.create_task(
+        _acquire_and_record(controller, order, "typed", Priority.INTERACTIVE, "b")
+    )
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await auto
+    assert exc_info.value.status_code == 503
+
+    release.set()
+    await asyncio.gather(holder, typed)
+    assert order == ["typed"]
+
+
+async def test_full_queue_rejects_auto_without_evicting():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire(Priority.AUTO, key="x")
+    assert exc_info.value.status_code == 429
+
+    release.set()
+    await asyncio.gather(holder, queued)
+
+
+async def test_auto_waiters_use_shorter_timeout():
+    controller = AdmissionController(
+        "test", max_concurrency=1, max_queue=2, queue_timeout=5, auto_queue_timeout=0.01
+    )
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, release))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire(Priority.AUTO)
+    assert exc_info.value.status_code == 503
+    release.set()
+    await holder
+
+
+def test_settings_from_env():
+    s = Settings.from_env({"AGENT_MAX_CONCURRENT_RUNS": "3", "AGENT_RUN_QUEUE_TIMEOUT": "0.5"})
+    assert s.max_concurrent_runs == 3
+    assert s.run_queue_timeout == 0.5
+    assert s.max_queued_runs == Settings().max_queued_runs
+
+
+# ── /chat integration ─────────────────────────────────────────────────
+
+
+async def test_chat_returns_429_with_retry_after(client, monkeypatch):
+    controller = AdmissionController(
+        "model", max_concurrency=0, max_queue=0, queue_timeout=1, retry_after=2
+    )
+    monkeypatch.setattr(app_module, "_run_admission", controller)
+
+    fn = make_output_only_fn({"message": "Hi", "mode": "guardrail"})
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat", json={"message": "what is 2+2"})
+
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == "2"
+    assert "total;dur=" in resp.headers["server-timing"]
+
+
+async def test_metrics_exports_admission_stats(client):
+    fn = make_output_only_fn({"message": "Hi", "mode": "guardrail"})
+    with agent.override(model=FunctionModel(fn)):
+        await client.post("/chat", json={"message": "what is 2+2"})
+
+    resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'conversation_agent_admission_queue_depth{pool="model"}' in resp.text
+    assert 'conversation_agent_admission_wait_seconds_count{pool="model"}' in resp.text
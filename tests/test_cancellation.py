@@ -0,0 +1,111 @@
+"""Tests for cancelling agent runs when the client disconnects."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent import session as session_module
+from conversation_agent.agent import agent
+from conversation_agent.app import ChatRequest, chat
+from conversation_agent.cancellation import (
+    ClientDisconnected,
+    RunCostTracker,
+    cancel_on_disconnect,
+)
+from conversation_agent.models import AssistantState
+
+from .conftest import MockVectorStore, create_session
+
+
+class FakeRequest:
+    """Stands in for starlette's Request; disconnects after ``after`` polls."""
+
+    def __init__(self, after: int) -> None:
+        self.after = after
+        self.polls = 0
+        self.state = SimpleNamespace()
+
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return self.polls > self.after
+
+
+# ── cancel_on_disconnect ──────────────────────────────────────────────
+
+
+async def test_completes_when_client_stays():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    assert await cancel_on_disconnect(FakeRequest(after=100), work(), 0.005) == "done"
+
+
+async def test_cancels_work_on_disconnect():
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(ClientDisconnected):
+        await cancel_on_disconnect(FakeRequest(after=1), work(), 0.005)
+    assert cancelled.is_set()
+
+
+def test_run_cost_tracker_estimate():
+    costs = RunCostTracker(alpha=0.5)
+    assert costs.estimate_remaining(1.0) == 0.0
+    costs.record(tokens=1000, seconds=4.0)
+    assert costs.estimate_remaining(1.0) == pytest.approx(750)
+    assert costs.estimate_remaining(10.0) == 0.0
+    costs.record(tokens=2000, seconds=4.0)
+    assert costs.tokens == pytest.approx(1500)
+
+
+# ── chat() ────────────────────────────────────────────────────────────
+
+
+async def test_disconnect_leaves_session_untouched(monkeypatch):
+    monkeypatch.setattr(app_module, "_vector_store", MockVectorStore())
+    monkeypatch.setattr(
+        app_module, "settings", replace(app_module.settings, disconnect_poll_interval=0.005)
+    )
+    sid = create_session(AssistantState())
+    session_module._store[sid].history.extend([
+        ModelRequest.user_text_prompt("hi"),
+        ModelResponse(parts=[TextPart(content="Welcome! What should I call you?")]),
+    ])
+    history_before = list(session_module._store[sid].history)
+
+    async def fn(messages, agent_info):
+        if any(isinstance(p, ToolReturnPart) for p in messages[-1].parts):
+            # update_state already ran on the working copy; stall the output
+            await asyncio.sleep(10)
+        return ModelResponse(parts=[
+            ToolCallPart(tool_name="update_state", args={"patch": {"display_name": "Alex"}})
+        ])
+
+    with agent.override(model=FunctionModel(fn)):
+        with pytest.raises(ClientDisconnected):
+            await chat(ChatRequest(message="I'm Alex", session_id=sid), FakeRequest(after=2))
+
+    session = session_module._store[sid]
+    assert session.state.profile.display_name is None
+    assert session.history == history_before
+    assert app_module._run_admission.in_flight == 0
@@ -34,11 +34,26 @@ async def test_new_session_created(client):
         }
     )
     with agent.override(model=FunctionModel(fn)):
-        resp = await client.post("/chat", json={"message": "hi"})
+        resp = await client.post("/chat", json={"message": "Let's get started"})
 
     assert resp.status_code == 200
     data = resp.json()
     assert "session_id" in data
+    assert data["response"]["message"] == "Welcome!"
+    assert data["state"]["current_step"] == "profile"
+
+
+async def test_new_session_greeting_is_served_from_cache(client):
+    def fail(messages, agent_info):
+        raise AssertionError("a first greeting should not reach the model")
+
+    with agent.override(model=FunctionModel(fail)):
+        resp = await client.post("/chat", json={"message": "hi", "auto": True})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["response"]["mode"] == "flow_question"
+    assert data["response"]["next_question"]["field_name"] == "display_name"
     assert data["state"]["current_step"] == "profile"
 
 
@@ -96,11 +111,12 @@ async def test_unknown_session_id_creates_new(client):
     )
     with agent.override(model=FunctionModel(fn)):
         resp = await client.post(
-            "/chat", json={"message": "hi", "session_id": "bogus123"}
+            "/chat", json={"message": "Let's get started", "session_id": "bogus123"}
         )
 
     data = resp.json()
     assert data["session_id"] != "bogus123"
+    assert data["response"]["message"] == "Welcome!"
     assert data["state"]["current_step"] == "profile"
 
 
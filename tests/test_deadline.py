@@ -0,0 +1,163 @@
+"""Tests for per-request deadlines and the timeout fallback."""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent import session as session_module
+from conversation_agent.agent import AgentDeps, agent, create_agent, rag_search, run_agent
+from conversation_agent.app import _request_deadline
+from conversation_agent.config import settings
+from conversation_agent.deadline import Deadline
+from conversation_agent.models import AgeRange, AssistantState, ProfileAnswers
+
+from .conftest import _output_response, create_session, make_output_only_fn
+
+
+class SlowVectorStore:
+    async def search(self, query: str, top_k: int = 3):
+        await asyncio.sleep(10)
+        return []
+
+
+def test_deadline_remaining_and_expired():
+    d = Deadline.after(60)
+    assert 59 < d.remaining() <= 60
+    assert not d.expired
+    past = Deadline.after(-1)
+    assert past.remaining() == 0.0
+    assert past.expired
+
+
+def test_request_deadline_header_capped():
+    assert _request_deadline(None).remaining() <= settings.request_timeout
+    assert _request_deadline(0.5).remaining() <= 0.5
+    assert _request_deadline(10_000).remaining() <= settings.max_request_timeout
+
+
+async def test_rag_search_returns_timeout_notice():
+    deps = AgentDeps(
+        state=AssistantState(),
+        vector_store=SlowVectorStore(),
+        deadline=Deadline.after(0.01),
+    )
+    result = await rag_search(SimpleNamespace(deps=deps), "what is keto?")
+    assert "did not respond in time" in result
+
+
+async def test_each_model_request_gets_the_remaining_time():
+    timeouts = []
+
+    async def fn(messages, agent_info):
+        timeouts.append(agent_info.model_settings["timeout"])
+        if len(timeouts) == 1:
+            await asyncio.sleep(0.05)
+            return ModelResponse(parts=[
+                ToolCallPart(tool_name="update_state", args={"patch": {"display_name": "Alex"}})
+            ])
+        return _output_response({"message": "Hi Alex!", "mode": "flow_question"}, agent_info)
+
+    deps = AgentDeps(
+        state=AssistantState(), vector_store=SlowVectorStore(), deadline=Deadline.after(5)
+    )
+    await run_agent(create_agent(FunctionModel(fn)), "I'm Alex", deps=deps, message_history=[])
+
+    assert len(timeouts) == 2
+    assert timeouts[0] <= 5
+    assert timeouts[1] <= timeouts[0] - 0.05
+
+
+async def test_chat_deadline_returns_fallback_question(client):
+    sid = create_session(AssistantState(profile=ProfileAnswers(display_name="Hugo")))
+    session_module._store[sid].history.append(
+        ModelRequest.user_text_prompt("hi")
+    )
+
+    async def slow_fn(messages, agent_info):
+        await asyncio.sleep(10)
+        return make_output_only_fn({"message": "late", "mode": "guardrail"})(
+            messages, agent_info
+        )
+
+    with agent.override(model=FunctionModel(slow_fn)):
+        resp = await client.post(
+            "/chat",
+            json={"message": "I'm 30", "session_id": sid},
+            headers={"X-Request-Timeout": "0.05"},
+        )
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["response"]["mode"] == "flow_question"
+    nq = data["response"]["next_question"]
+    assert nq["field_name"] == "age_range"
+    assert nq["options"] == [e.value for e in AgeRange]
+    assert data["response"]["message"].endswith(nq["question_text"])
+
+    session = session_module._store[sid]
+    assert session.state.profile.age_range is None
+    assert len(session.history) == 3
+
+
+async def test_turn_after_timed_out_first_turn_gets_the_system_prompt(client):
+    async def slow_fn(messages, agent_info):
+        await asyncio.sleep(10)
+
+    with agent.override(model=FunctionModel(slow_fn)):
+        first = (await client.post(
+            "/chat", json={"message": "I'm Hugo"}, headers={"X-Request-Timeout": "0.05"}
+        )).json()
+    assert first["response"]["mode"] == "flow_question"
+
+    requests = []
+
+    def fn(messages, agent_info):
+        requests.append(messages)
+        return make_output_only_fn({"message": "Sure!", "mode": "answer"})(messages, agent_info)
+
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post(
+            "/chat", json={"message": "What is this app?", "session_id": first["session_id"]}
+        )
+
+    assert resp.status_code == 200
+    system, user = requests[0][0].parts
+    assert isinstance(system, SystemPromptPart)
+    assert "Current step: profile" in system.content
+    assert isinstance(user, UserPromptPart) and user.content == "I'm Hugo"
+
+
+async def test_chat_model_requests_get_the_time_left(client, monkeypatch):
+    timeouts = []
+
+    async def fn(messages, agent_info):
+        timeouts.append(agent_info.model_settings["timeout"])
+        if len(timeouts) == 1:
+            await asyncio.sleep(0.3)
+            return ModelResponse(parts=[
+                ToolCallPart(tool_name="update_state", args={"patch": {"display_name": "Alex"}})
+            ])
+        return _output_response({"message": "Hi Alex!", "mode": "flow_question"}, agent_info)
+
+    # A real agent rather than agent.override, which would replace the deadline wrapper
+    monkeypatch.setattr(app_module, "agent", create_agent(FunctionModel(fn)))
+    resp = await client.post(
+        "/chat", json={"message": "I'm Alex"}, headers={"X-Request-Timeout": "2"}
+    )
+
+    assert resp.status_code == 200
+    assert resp.json()["state"]["profile"]["display_name"] == "Alex"
+    assert len(timeouts) == 2
+    assert timeouts[0] <= 2
+    # The round trip after the tool call gets what is left, not the full budget
+    assert timeouts[1] <= 2 - 0.3
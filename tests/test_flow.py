@@ -0,0 +1,140 @@
+"""Tests for flow definitions and their compiled lookup tables."""
+from __future__ import annotations
+
+import copy
+
+import pytest
+from pydantic import ValidationError
+
+from conversation_agent.flow import FlowDef, compile_flow, load_flow
+from conversation_agent.models import (
+    DEFAULT_FLOW,
+    AgeRange,
+    AssistantState,
+    FlowStep,
+    ProfileAnswers,
+)
+from conversation_agent.patching import PatchEngine
+
+SMALL_FLOW = {
+    "id": "pets",
+    "subject": "pet profile",
+    "greeting": "Hello! Let's talk about your pets.",
+    "enums": {
+        "Species": {
+            "members": {"CAT": "cat", "DOG": "dog", "GUINEA_PIG": "guinea_pig"},
+            "labels": {"guinea_pig": "Guinea Pig"},
+            "synonyms": {"kitten": "cat", "puppy": "dog"},
+        },
+    },
+    "steps": [
+        {
+            "id": "pet",
+            "title": "Pet",
+            "model": "PetAnswers",
+            "fields": [
+                {"name": "pet_name", "question": "What is your pet called?",
+                 "prompt": "a free-text string"},
+                {"name": "species", "type": "enum", "enum": "Species", "multi": True,
+                 "question": "What kind of pets do you have?"},
+            ],
+        },
+        {
+            "id": "care",
+            "title": "Care",
+            "model": "CareAnswers",
+            "fields": [
+                {"name": "indoor", "type": "bool", "options": ["yes", "no"],
+                 "question": "Do they live indoors?", "prompt": "Yes or No"},
+            ],
+        },
+    ],
+}
+
+
+@pytest.fixture
+def pets():
+    return compile_flow(FlowDef.model_validate(SMALL_FLOW))
+
+
+def test_compiles_state_model(pets):
+    state = pets.state_model()
+    Step = pets.step_enum
+    assert state.current_step == Step.PET
+    assert state.compute_missing_fields() == ["pet_name", "species"]
+    assert type(state.care).__name__ == "CareAnswers"
+    assert state.flow is pets
+
+
+def test_advances_through_steps(pets):
+    Step = pets.step_enum
+    state = pets.state_model()
+    state.pet.pet_name = "Miso"
+    state.pet.species = ["cat"]
+    state.advance_step()
+    assert state.current_step == Step.CARE
+    state.care.indoor = True
+    state.advance_step()
+    assert state.current_step == Step.DONE
+    assert pets.done == Step.DONE
+
+
+def test_field_tables(pets):
+    spec = pets.fields["species"]
+    assert spec.step == pets.step_enum.PET
+    assert spec.options == ("cat", "dog", "guinea_pig")
+    assert spec.option_labels == ("Cat", "Dog", "Guinea Pig")
+    assert spec.multi_select
+    assert pets.fields["indoor"].option_labels == ("Yes", "No")
+    assert not pets.fields["pet_name"].multi_select
+    assert pets.field_to_step["indoor"] == pets.step_enum.CARE
+
+
+def test_prompt_fragments(pets):
+    assert pets.intro_prompt.endswith("The steps are: Pet → Care.")
+    assert "2-step pet profile setup" in pets.intro_prompt
+    assert pets.step_prompts[pets.step_enum.PET] == (
+        "Valid values for current step fields:\n"
+        "  - pet_name: a free-text string\n"
+        "  - species: a list from: Cat, Dog, Guinea Pig "
+        "(raw values for update_state: cat, dog, guinea_pig)"
+    )
+
+
+def test_tables_are_read_only(pets):
+    with pytest.raises(TypeError):
+        pets.fields["extra"] = pets.fields["species"]
+
+
+def test_patch_engine_uses_flow_synonyms(pets):
+    engine = PatchEngine(pets.answer_models, pets.enum_indexes)
+    result = engine.validate({"species": "kitten and puppy", "indoor": "yes"})
+    assert result.errors == {}
+    assert result.updates[pets.step_enum.PET]["species"] == ["cat", "dog"]
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda d: d["steps"].clear(), "at least one step"),
+    (lambda d: d["steps"][0].update(id="done"), "invalid step id"),
+    (lambda d: d["steps"][1]["fields"].append(d["steps"][0]["fields"][0]), "defined twice"),
+    (lambda d: d["steps"][0]["fields"][1].update(enum="Breed"), "unknown enum"),
+    (lambda d: d["enums"]["Species"]["synonyms"].update(fish="fish"), "unknown values"),
+])
+def test_invalid_definitions_are_rejected(change, message):
+    definition = copy.deepcopy(SMALL_FLOW)
+    change(definition)
+    with pytest.raises(ValidationError, match=message):
+        FlowDef.model_validate(definition)
+
+
+def test_default_flow_matches_models():
+    assert DEFAULT_FLOW.state_model is AssistantState
+    assert DEFAULT_FLOW.answer_models[FlowStep.PROFILE] is ProfileAnswers
+    assert DEFAULT_FLOW.fields["age_range"].enum is AgeRange
+    assert DEFAULT_FLOW.steps == (FlowStep.PROFILE, FlowStep.FOOD, FlowStep.ANIME)
+
+
+def test_load_flow(tmp_path):
+    path = tmp_path / "pets.json"
+    path.write_text(FlowDef.model_validate(SMALL_FLOW).model_dump_json())
+    assert load_flow(path).id == "pets"
@@ -0,0 +1,205 @@
+"""Tests for hedged agent.run attempts."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent import session as session_module
+from conversation_agent.admission import AdmissionController
+from conversation_agent.agent import agent
+from conversation_agent.app import _commit_state
+from conversation_agent.hedging import Hedger, LatencyTracker
+from conversation_agent.models import AssistantState, ProfileAnswers
+from conversation_agent.session import Session
+
+from .conftest import _output_response
+
+
+# ── LatencyTracker / Hedger ───────────────────────────────────────────
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker()
+    for i in range(1, 101):
+        tracker.record(i / 100)
+    assert tracker.percentile(95) == pytest.approx(0.95)
+    assert tracker.percentile(50) == pytest.approx(0.5)
+
+
+def test_hedger_uses_initial_delay_until_warm():
+    hedger = Hedger(percentile=90, min_delay=0.01, initial_delay=3.0, min_samples=5)
+    assert hedger.delay() == 3.0
+    for _ in range(5):
+        hedger.tracker.record(0.2)
+    assert hedger.delay() == pytest.approx(0.2)
+
+
+async def test_fast_attempt_is_not_hedged():
+    hedger = Hedger(percentile=95, min_delay=0, initial_delay=1.0)
+    calls = []
+
+    async def attempt(n):
+        calls.append(n)
+        return n
+
+    assert await hedger.run(attempt) == 0
+    assert calls == [0]
+
+
+async def test_slow_attempt_hedged_and_loser_cancelled():
+    hedger = Hedger(percentile=95, min_delay=0, initial_delay=0.01)
+    cancelled = asyncio.Event()
+
+    async def attempt(n):
+        if n == 0:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return n
+
+    assert await hedger.run(attempt) == 1
+    assert cancelled.is_set()
+
+
+async def test_cancelled_original_attempt_is_recorded():
+    hedger = Hedger(percentile=95, min_delay=0, initial_delay=0.05)
+
+    async def attempt(n):
+        await asyncio.sleep(10 if n == 0 else 0.05)
+        return n
+
+    assert await hedger.run(attempt) == 1
+    # The hedge's own latency, and the original's time until it lost
+    assert len(hedger.tracker) == 2
+    assert hedger.tracker.percentile(100) >= 0.1
+
+
+async def test_failed_attempt_falls_back_to_other():
+    hedger = Hedger(percentile=95, min_delay=0, initial_delay=0.01)
+
+    async def attempt(n):
+        if n == 0:
+            await asyncio.sleep(0.05)
+            return "slow"
+        raise RuntimeError("provider error")
+
+    assert await hedger.run(attempt) == "slow"
+
+
+async def test_all_attempts_failing_raises():
+    hedger = Hedger(percentile=95, min_delay=0, initial_delay=0.01)
+
+    async def attempt(n):
+        await asyncio.sleep(0.02)
+        raise RuntimeError(f"fail {n}")
+
+    with pytest.raises(RuntimeError, match="fail 0"):
+        await hedger.run(attempt)
+
+
+async def test_hedge_takes_its_own_admission_slot():
+    hedger = Hedger(percentile=95, min_delay=0, initial_delay=0.01)
+    admission = AdmissionController("test", max_concurrency=2, max_queue=0, queue_timeout=1)
+    in_flight = {}
+
+    async def attempt(n):
+        in_flight[n] = admission.in_flight
+        if n == 0:
+            await asyncio.sleep(10)
+        return n
+
+    admit = lambda: admission.release if admission.try_acquire() else None
+    async with admission.slot():
+        assert await hedger.run(attempt, admit) == 1
+        await asyncio.sleep(0)  # Let the hedge's done callback run
+        assert in_flight == {0: 1, 1: 2}
+        assert admission.in_flight == 1
+    assert admission.in_flight == 0
+
+
+async def test_hedge_skipped_when_no_slot_is_free():
+    hedger = Hedger(percentile=95, min_delay=0, initial_delay=0.01)
+    admission = AdmissionController("test", max_concurrency=1, max_queue=0, queue_timeout=1)
+    calls = []
+
+    async def attempt(n):
+        calls.append(n)
+        await asyncio.sleep(0.05)
+        return n
+
+    admit = lambda: admission.release if admission.try_acquire() else None
+    async with admission.slot():
+        assert await hedger.run(attempt, admit) == 0
+    assert calls == [0]
+    assert admission.in_flight == 0
+
+
+# ── _commit_state ─────────────────────────────────────────────────────
+
+
+def test_commit_state_merges_concurrent_edit():
+    session = Session()
+    base = session.state.model_copy(deep=True)
+    working = base.model_copy(deep=True)
+    working.profile = ProfileAnswers(display_name="Hugo")
+
+    # A form edit lands while the run is in flight
+    session.state.profile = ProfileAnswers(country="Portugal")
+
+    _commit_state(session, base, working)
+    assert session.state.profile.display_name == "Hugo"
+    assert session.state.profile.country == "Portugal"
+
+
+# ── /chat integration ─────────────────────────────────────────────────
+
+
+async def test_hedged_chat_applies_update_state_once(client, monkeypatch):
+    monkeypatch.setattr(
+        app_module, "_hedger", Hedger(percentile=95, min_delay=0, initial_delay=0.01)
+    )
+    sid = "hedged"
+    session_module._store[sid] = Session(state=AssistantState())
+    session_module._store[sid].history.append(
+        ModelRequest(parts=[UserPromptPart(content="hi")])
+    )
+    calls = 0
+
+    async def fn(messages, agent_info):
+        nonlocal calls
+        calls += 1
+        if not any(isinstance(p, ToolReturnPart) for p in messages[-1].parts):
+            # First model request of an attempt; the original attempt stalls
+            if calls == 1:
+                await asyncio.sleep(10)
+            return ModelResponse(parts=[
+                ToolCallPart(tool_name="update_state", args={"patch": {"display_name": "Alex"}})
+            ])
+        return _output_response({"message": "Hi Alex!", "mode": "flow_question"}, agent_info)
+
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat", json={"message": "I'm Alex", "session_id": sid})
+
+    assert resp.status_code == 200
+    assert calls == 3  # stalled original + hedge's tool call and output
+    assert resp.json()["state"]["profile"]["display_name"] == "Alex"
+    session = session_module._store[sid]
+    # Only the winning attempt's messages are committed to history
+    tool_calls = [
+        p for m in session.history for p in m.parts
+        if isinstance(p, ToolCallPart) and p.tool_name == "update_state"
+    ]
+    assert len(tool_calls) == 1
+
@@ -0,0 +1,192 @@
+"""Tests for Idempotency-Key handling on /chat and /state."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import session as session_module
+from conversation_agent.agent import agent
+from conversation_agent.idempotency import IdempotencyConflict, IdempotencyStore
+from conversation_agent.models import AssistantState
+
+from .conftest import create_session, make_output_only_fn
+
+
+# ── IdempotencyStore ──────────────────────────────────────────────────
+
+
+async def test_concurrent_retry_waits_for_first_result():
+    store = IdempotencyStore(ttl=60, max_entries=10)
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(
+        store.run("chat", "k", "body", fn), store.run("chat", "k", "body", fn)
+    )
+    assert results == ["result", "result"]
+    assert calls == 1
+
+
+async def test_finished_result_replayed_until_ttl():
+    store = IdempotencyStore(ttl=0.01, max_entries=10)
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await store.run("chat", "k", "body", fn) == 1
+    assert await store.run("chat", "k", "body", fn) == 1
+    await asyncio.sleep(0.02)
+    assert await store.run("chat", "k", "body", fn) == 2
+
+
+async def test_failed_request_is_not_stored():
+    store = IdempotencyStore(ttl=60, max_entries=10)
+    attempts = 0
+
+    async def fn():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        await store.run("chat", "k", "body", fn)
+    assert await store.run("chat", "k", "body", fn) == "ok"
+
+
+async def test_waiter_reruns_when_first_request_fails():
+    store = IdempotencyStore(ttl=60, max_entries=10)
+    attempts = 0
+
+    async def fn():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        if attempts == 1:
+            raise RuntimeError("client went away")
+        return "ok"
+
+    first, second = await asyncio.gather(
+        store.run("chat", "k", "body", fn),
+        store.run("chat", "k", "body", fn),
+        return_exceptions=True,
+    )
+    assert isinstance(first, RuntimeError)
+    assert second == "ok"
+
+
+async def test_key_reuse_with_different_body_conflicts():
+    store = IdempotencyStore(ttl=60, max_entries=10)
+
+    async def fn():
+        return "ok"
+
+    await store.run("chat", "k", "body-a", fn)
+    with pytest.raises(IdempotencyConflict):
+        await store.run("chat", "k", "body-b", fn)
+
+
+async def test_max_entries_evicts_oldest():
+    store = IdempotencyStore(ttl=60, max_entries=2)
+
+    async def fn():
+        return "ok"
+
+    for key in ("a", "b", "c"):
+        await store.run("chat", key, "body", fn)
+    assert len(store) == 2
+
+
+async def test_running_requests_are_not_evicted():
+    store = IdempotencyStore(ttl=60, max_entries=1)
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    running = asyncio.create_task(store.run("chat", "slow", "body", slow))
+    await asyncio.sleep(0)
+    for key in ("a", "b"):
+        await store.run("chat", key, "body", fast)
+    # One finished result is kept next to the request still running
+    assert len(store) == 2
+    release.set()
+    assert await running == "slow"
+    assert len(store) == 1
+    assert await store.run("chat", "slow", "body", fast) == "slow"
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────
+
+
+async def test_chat_retry_runs_agent_once(client):
+    calls = 0
+    output_fn = make_output_only_fn({"message": "Only onboarding, sorry.", "mode": "guardrail"})
+
+    def fn(messages, agent_info):
+        nonlocal calls
+        calls += 1
+        return output_fn(messages, agent_info)
+
+    sid = create_session(AssistantState())
+    body = {"message": "what's the weather?", "session_id": sid}
+    headers = {"Idempotency-Key": "retry-1"}
+    with agent.override(model=FunctionModel(fn)):
+        r1 = await client.post("/chat", json=body, headers=headers)
+        history_len = len(session_module._store[sid].history)
+        r2 = await client.post("/chat", json=body, headers=headers)
+
+    assert r1.json() == r2.json()
+    assert calls == 1
+    assert len(session_module._store[sid].history) == history_len
+
+
+async def test_state_retry_does_not_duplicate_history(client):
+    sid = create_session(AssistantState())
+    body = {"session_id": sid, "updates": {"display_name": "Hugo"}}
+    headers = {"Idempotency-Key": "form-1"}
+
+    r1 = await client.patch("/state", json=body, headers=headers)
+    r2 = await client.patch("/state", json=body, headers=headers)
+
+    assert r1.json() == r2.json()
+    assert len(session_module._store[sid].history) == 2
+
+
+async def test_replayed_response_is_a_snapshot(client):
+    sid = create_session(AssistantState())
+    headers = {"Idempotency-Key": "form-2"}
+    body = {"session_id": sid, "updates": {"display_name": "Hugo"}}
+
+    await client.patch("/state", json=body, headers=headers)
+    await client.patch("/state", json={"session_id": sid, "updates": {"country": "PT"}})
+    replay = await client.patch("/state", json=body, headers=headers)
+
+    assert replay.json()["state"]["profile"]["country"] is None
+
+
+async def test_key_reuse_with_different_body_returns_422(client):
+    sid = create_session(AssistantState())
+    headers = {"Idempotency-Key": "form-3"}
+    await client.patch(
+        "/state", json={"session_id": sid, "updates": {"display_name": "A"}}, headers=headers
+    )
+    resp = await client.patch(
+        "/state", json={"session_id": sid, "updates": {"display_name": "B"}}, headers=headers
+    )
+    assert resp.status_code == 422
@@ -0,0 +1,45 @@
+"""Tests for event-loop lag monitoring and blocking-call detection."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from conversation_agent.loop_monitor import LOOP_BLOCKS, LOOP_LAG, LoopMonitor
+from conversation_agent.phases import phase
+
+
+def _block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def test_blocking_call_is_reported_with_its_stack(caplog):
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    blocks = LOOP_BLOCKS.value(phase="rag_score")
+    lag_samples = LOOP_LAG.count()
+    monitor.start()
+    try:
+        await asyncio.sleep(0.03)
+        with caplog.at_level(logging.WARNING, logger="conversation_agent.loop_monitor"):
+            with phase("rag_score"):
+                _block_the_loop(0.25)
+            await asyncio.sleep(0.03)
+    finally:
+        await monitor.stop()
+
+    assert LOOP_BLOCKS.value(phase="rag_score") == blocks + 1
+    assert LOOP_LAG.count() > lag_samples
+    [record] = caplog.records
+    assert "phase rag_score" in record.getMessage()
+    assert "_block_the_loop" in record.getMessage()
+
+
+async def test_healthy_loop_reports_nothing(caplog):
+    monitor = LoopMonitor(interval=0.01, threshold=0.1)
+    with caplog.at_level(logging.WARNING, logger="conversation_agent.loop_monitor"):
+        monitor.start()
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+        await monitor.stop()
+
+    assert caplog.records == []
@@ -0,0 +1,54 @@
+"""Unit tests for the Prometheus metrics registry."""
+from __future__ import annotations
+
+import pytest
+
+from conversation_agent.metrics import Registry
+
+
+def test_counter_render():
+    registry = Registry()
+    c = registry.counter("requests_total", "Requests.", ("endpoint",))
+    c.inc(endpoint="/chat")
+    c.inc(2, endpoint="/chat")
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{endpoint="/chat"} 3' in text
+
+
+def test_gauge_set_and_dec():
+    registry = Registry()
+    g = registry.gauge("depth", "Depth.")
+    g.set(5)
+    g.dec()
+    assert g.value() == 4
+    assert "depth 4" in registry.render()
+
+
+def test_histogram_cumulative_buckets():
+    registry = Registry()
+    h = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    h.observe(0.05)
+    h.observe(0.5)
+    h.observe(5.0)
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+    assert h.total() == pytest.approx(5.55)
+
+
+def test_register_same_name_returns_existing():
+    registry = Registry()
+    a = registry.counter("x_total", "X.")
+    assert registry.counter("x_total", "X.") is a
+    with pytest.raises(ValueError):
+        registry.gauge("x_total", "X.")
+
+
+def test_wrong_labels_rejected():
+    registry = Registry()
+    c = registry.counter("y_total", "Y.", ("pool",))
+    with pytest.raises(ValueError):
+        c.inc(other="a")
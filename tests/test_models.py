@@ -134,3 +134,59 @@ def test_advance_step_noop_when_done():
     state = AssistantState(current_step=FlowStep.DONE)
     state.advance_step()
     assert state.current_step == FlowStep.DONE
+
+
+# ── Incremental missing-field tracking ────────────────────────────────
+
+
+def test_missing_mask_tracks_assignments():
+    answers = ProfileAnswers()
+    assert answers.missing_fields == ("display_name", "age_range", "country")
+    answers.display_name = "Hugo"
+    assert answers.missing_fields == ("age_range", "country")
+    answers.display_name = None
+    assert answers.missing_fields == ("display_name", "age_range", "country")
+
+
+def test_missing_mask_survives_copy_and_validation():
+    answers = FoodAnswers(diet=DietType.VEGAN)
+    assert answers.model_copy(deep=True).missing_fields == ("allergies", "spice_ok")
+    restored = FoodAnswers.model_validate(answers.model_dump())
+    assert restored.missing_fields == ("allergies", "spice_ok")
+
+
+def test_missing_mask_follows_model_copy_updates():
+    answers = ProfileAnswers()
+    updated = answers.model_copy(update={"display_name": "Hugo", "country": "Portugal"})
+    assert updated.missing_fields == ("age_range",)
+    cleared = updated.model_copy(update={"country": None}, deep=True)
+    assert cleared.missing_fields == ("age_range", "country")
+    # The original is untouched
+    assert answers.missing_fields == ("display_name", "age_range", "country")
+
+
+def test_in_place_field_assignment_updates_state():
+    state = AssistantState()
+    state.profile.display_name = "Hugo"
+    state.profile.age_range = AgeRange.AGE_25_34
+    assert state.compute_missing_fields() == ["country"]
+    assert state.profile_status.missing_fields == ["country"]
+    assert state.profile_status.is_complete is False
+
+
+def test_step_status_only_rewritten_on_change():
+    state = AssistantState()
+    state.compute_missing_fields()
+    first = state.profile_status.missing_fields
+    state.compute_missing_fields()
+    assert state.profile_status.missing_fields is first
+
+
+def test_replaced_step_status_is_resynced():
+    from conversation_agent.models import StepStatus
+
+    state = AssistantState()
+    state.compute_missing_fields()
+    state.profile_status = StepStatus()
+    state.compute_missing_fields()
+    assert state.profile_status.missing_fields == ["display_name", "age_range", "country"]
@@ -0,0 +1,121 @@
+"""Unit tests for the fuzzy enum normalization index."""
+from __future__ import annotations
+
+from conversation_agent.models import (
+    DEFAULT_FLOW,
+    AgeRange,
+    Allergen,
+    AnimeGenre,
+    DietType,
+    FlowStep,
+    SubDubPref,
+)
+from conversation_agent.normalization import EnumIndex, split_list_text
+
+patch_engine = DEFAULT_FLOW.patch_engine
+
+
+def resolve_enum(enum_cls, text):
+    return DEFAULT_FLOW.enum_indexes[enum_cls].resolve(text)
+
+
+def test_exact_values_labels_and_names():
+    assert resolve_enum(AnimeGenre, "slice_of_life").value == "slice_of_life"
+    assert resolve_enum(AnimeGenre, "Slice of Life").value == "slice_of_life"
+    assert resolve_enum(AnimeGenre, "SLICE_OF_LIFE").confidence == 1.0
+    assert resolve_enum(AnimeGenre, "scifi").value == "sci_fi"
+
+
+def test_synonyms():
+    assert resolve_enum(SubDubPref, "subtitles").value == "sub"
+    assert resolve_enum(DietType, "plant-based").value == "vegan"
+    assert resolve_enum(Allergen, "peanuts").value == "nuts"
+
+
+def test_filler_words_are_ignored():
+    match = resolve_enum(AnimeGenre, "slice-of-life anime")
+    assert match.value == "slice_of_life"
+    assert match.confidence == 0.95
+
+
+def test_typos_resolve_with_lower_confidence():
+    match = resolve_enum(DietType, "vegitarian")
+    assert match.value == "vegetarian"
+    assert 0.8 <= match.confidence < 1.0
+
+
+def test_age_ranges():
+    assert resolve_enum(AgeRange, "25 to 34").value == AgeRange.AGE_25_34.value
+    assert resolve_enum(AgeRange, "under 18").value == AgeRange.UNDER_18.value
+    assert resolve_enum(AgeRange, "50+").value == AgeRange.AGE_45_PLUS.value
+    match = resolve_enum(AgeRange, "I'm 30")
+    assert match.value == AgeRange.AGE_25_34.value
+    assert match.confidence == 0.9
+
+
+def test_unrelated_text_does_not_match():
+    assert resolve_enum(DietType, "pizza") is None
+    assert resolve_enum(AnimeGenre, "") is None
+
+
+def test_negated_answers_do_not_match_what_they_negate():
+    assert resolve_enum(SubDubPref, "neither") is None
+    assert resolve_enum(DietType, "not vegan") is None
+    # Negations that are synonyms still resolve
+    assert resolve_enum(SubDubPref, "no preference").value == SubDubPref.BOTH
+    assert resolve_enum(Allergen, "no allergies").value == Allergen.NONE
+
+
+def test_short_words_one_edit_away_do_not_match():
+    assert resolve_enum(Allergen, "mother") is None
+    assert resolve_enum(DietType, "pegan") is None
+    assert resolve_enum(DietType, "vega") is None
+
+
+def test_numbers_that_are_not_ages_do_not_match():
+    for text in ("1990", "born in 1990", "100", "2"):
+        assert resolve_enum(AgeRange, text) is None, text
+
+
+def test_results_are_memoized():
+    index = EnumIndex(SubDubPref)
+    index.resolve("dubbed please")
+    index.resolve("dubbed please")
+    assert index.resolve.cache_info().hits == 1
+
+
+def test_split_list_text():
+    assert split_list_text("nuts, dairy and eggs") == ["nuts", "dairy", "eggs"]
+    assert split_list_text("gluten") == ["gluten"]
+
+
+def test_patch_engine_uses_fuzzy_matches():
+    result = patch_engine.validate({
+        "diet": "vegitarian",
+        "allergies": "peanuts and milk",
+        "favorite_genres": ["shounen", "romcom"],
+    })
+    assert result.errors == {}
+    assert result.updates[FlowStep.FOOD]["diet"] == DietType.VEGETARIAN
+    assert result.updates[FlowStep.FOOD]["allergies"] == [Allergen.NUTS, Allergen.DAIRY]
+    assert result.updates[FlowStep.ANIME]["favorite_genres"] == [
+        AnimeGenre.SHONEN, AnimeGenre.ROMANCE,
+    ]
+
+
+def test_patch_engine_rejects_low_confidence_matches():
+    result = patch_engine.validate({"diet": "pizza"})
+    assert "diet" in result.errors
+    assert result.updates == {}
+
+
+def test_patch_engine_rejects_short_near_misses():
+    result = patch_engine.validate({"diet": "pegan", "allergies": "mother"})
+    assert set(result.errors) == {"diet", "allergies"}
+    assert result.updates == {}
+
+
+def test_patch_engine_rejects_negations_and_implausible_ages():
+    result = patch_engine.validate({"sub_or_dub": "neither", "age_range": "1990"})
+    assert set(result.errors) == {"sub_or_dub", "age_range"}
+    assert result.updates == {}
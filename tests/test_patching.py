@@ -0,0 +1,79 @@
+"""Unit tests for the shared per-field patch engine."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from conversation_agent.agent import AgentDeps, update_state
+from conversation_agent.models import (
+    DEFAULT_FLOW,
+    AgeRange,
+    Allergen,
+    AnimeGenre,
+    AssistantState,
+    FlowStep,
+    ProfileAnswers,
+)
+
+patch_engine = DEFAULT_FLOW.patch_engine
+
+
+def test_validate_routes_fields_to_steps():
+    result = patch_engine.validate({"display_name": "Hugo", "diet": "vegan"})
+    assert result.updates[FlowStep.PROFILE] == {"display_name": "Hugo"}
+    assert result.updates[FlowStep.FOOD]["diet"].value == "vegan"
+    assert result.errors == {}
+
+
+def test_validate_normalizes_enum_labels():
+    result = patch_engine.validate({
+        "age_range": "25-34",
+        "favorite_genres": ["Slice of Life", "Sci-Fi"],
+        "allergies": ["Dairy"],
+    })
+    assert result.updates[FlowStep.PROFILE]["age_range"] == AgeRange.AGE_25_34
+    assert result.updates[FlowStep.ANIME]["favorite_genres"] == [
+        AnimeGenre.SLICE_OF_LIFE, AnimeGenre.SCI_FI,
+    ]
+    assert result.updates[FlowStep.FOOD]["allergies"] == [Allergen.DAIRY]
+
+
+def test_free_text_fields_are_not_normalized():
+    result = patch_engine.validate({"country": "New Zealand", "top_3_anime": ["Mob Psycho 100"]})
+    assert result.updates[FlowStep.PROFILE]["country"] == "New Zealand"
+    assert result.updates[FlowStep.ANIME]["top_3_anime"] == ["Mob Psycho 100"]
+
+
+def test_invalid_field_reported_without_rejecting_others():
+    state = AssistantState()
+    result = patch_engine.apply(state, {"display_name": "Hugo", "age_range": "ancient"})
+    assert set(result.errors) == {"age_range"}
+    assert state.profile.display_name == "Hugo"
+    assert state.profile.age_range is None
+
+
+def test_apply_keeps_existing_answers():
+    state = AssistantState(profile=ProfileAnswers(display_name="Hugo"))
+    patch_engine.apply(state, {"country": "Portugal"})
+    assert state.profile.display_name == "Hugo"
+    assert state.profile.country == "Portugal"
+
+
+def test_step_restriction_ignores_other_steps():
+    result = patch_engine.validate({"display_name": "Hugo", "diet": "vegan"}, step=FlowStep.FOOD)
+    assert FlowStep.PROFILE not in result.updates
+
+
+async def test_update_state_reports_per_field_errors():
+    deps = AgentDeps(state=AssistantState(), vector_store=None)
+    reply = await update_state(
+        SimpleNamespace(deps=deps), {"display_name": "Hugo", "age_range": "ancient"}
+    )
+    assert deps.state.profile.display_name == "Hugo"
+    assert "age_range" in reply
+    assert "Rejected" in reply
+
+
+async def test_update_state_all_invalid_is_validation_error():
+    deps = AgentDeps(state=AssistantState(), vector_store=None)
+    reply = await update_state(SimpleNamespace(deps=deps), {"age_range": "ancient"})
+    assert reply.startswith("Validation error")
@@ -0,0 +1,194 @@
+"""Tests for per-phase latency histograms and the /metrics counters."""
+from __future__ import annotations
+
+import json
+
+import pytest
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import ModelResponse
+from pydantic_ai.models.function import FunctionModel
+from pydantic_ai.usage import RequestUsage
+
+from conversation_agent.agent import agent
+from conversation_agent.metrics import REGISTRY
+from conversation_agent.phases import PHASE_SECONDS, phase
+from conversation_agent.rag import VectorStore
+
+from .conftest import _output_response, make_chat_fn, make_output_only_fn
+from .test_rag import FakeEmbedder
+
+
+def _counter(name: str, **labels: str) -> float:
+    return REGISTRY._metrics[name].value(**labels)
+
+
+def test_phase_records_even_when_block_raises():
+    before = PHASE_SECONDS.count(phase="test_block")
+    with pytest.raises(RuntimeError):
+        with phase("test_block"):
+            raise RuntimeError("boom")
+    assert PHASE_SECONDS.count(phase="test_block") == before + 1
+
+
+async def test_chat_records_each_phase(client):
+    fn = make_chat_fn(
+        tool_calls=[
+            ("update_state", {"patch": {"display_name": "Alex"}}),
+            ("rag_search", {"query": "what is this?"}),
+        ],
+        output={"message": "Hi Alex!", "mode": "flow_question"},
+    )
+    phases = (
+        "session_lookup", "prompt_build", "model_request", "update_state",
+        "rag_search", "output_validation", "next_question", "serialization",
+    )
+    before = {p: PHASE_SECONDS.count(phase=p) for p in phases}
+
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat", json={"message": "I'm Alex"})
+
+    assert resp.status_code == 200
+    after = {p: PHASE_SECONDS.count(phase=p) for p in phases}
+    # Two model round trips: the tool calls, then the final output
+    assert after["model_request"] - before["model_request"] == 2
+    for p in phases:
+        assert after[p] > before[p], p
+
+
+async def test_chat_counts_tokens_and_sessions(client):
+    def fn(messages, info):
+        response = _output_response({"message": "Welcome!", "mode": "flow_question"}, info)
+        return ModelResponse(
+            parts=response.parts, usage=RequestUsage(input_tokens=120, output_tokens=30)
+        )
+
+    tokens_in = _counter("conversation_agent_tokens_total", kind="input")
+    tokens_out = _counter("conversation_agent_tokens_total", kind="output")
+    created = _counter("conversation_agent_sessions_created_total", flow="onboarding")
+
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat", json={"message": "I'm Alex"})
+
+    assert resp.status_code == 200
+    assert _counter("conversation_agent_tokens_total", kind="input") == tokens_in + 120
+    assert _counter("conversation_agent_tokens_total", kind="output") == tokens_out + 30
+    assert _counter("conversation_agent_sessions_created_total", flow="onboarding") == created + 1
+
+
+async def test_output_retry_is_counted(client):
+    fn = make_output_only_fn({"message": "And your age?", "mode": "flow_question"})
+    with agent.override(model=FunctionModel(fn)):
+        sid = (await client.post("/chat", json={"message": "hi"})).json()["session_id"]
+
+    retries = _counter("conversation_agent_output_retries_total")
+    with agent.override(model=FunctionModel(fn)):
+        # An answer without an update_state call is sent back until retries run out
+        with pytest.raises(UnexpectedModelBehavior):
+            await client.post("/chat", json={"session_id": sid, "message": "Alex"})
+
+    assert _counter("conversation_agent_output_retries_total") == retries + 3
+
+
+async def test_vector_search_splits_embed_and_score(tmp_path):
+    corpus = tmp_path / "corpus.json"
+    corpus.write_text(json.dumps([{"title": "A", "content": "alpha"}]))
+    store = VectorStore(FakeEmbedder())
+    await store.load_corpus(corpus)
+    embed = PHASE_SECONDS.count(phase="rag_embed")
+    score = PHASE_SECONDS.count(phase="rag_score")
+
+    await store.search("alpha")
+
+    assert PHASE_SECONDS.count(phase="rag_embed") == embed + 1
+    assert PHASE_SECONDS.count(phase="rag_score") == score + 1
+
+
+async def test_metrics_endpoint_exposes_phases(client):
+    fn = make_output_only_fn({"message": "Welcome!", "mode": "flow_question"})
+    with agent.override(model=FunctionModel(fn)):
+        await client.post("/chat", json={"message": "I'm Alex"})
+
+    text = (await client.get("/metrics")).text
+    assert "# TYPE conversation_agent_phase_seconds histogram" in text
+    assert 'conversation_agent_phase_seconds_count{phase="model_request"}' in text
+    assert 'conversation_agent_tokens_total{kind="input"}' in text
+    assert "conversation_agent_sessions " in text
+
+
+# ── Server-Timing and debug traces ────────────────────────────────────
+
+
+def _server_timing(header: str) -> dict[str, str]:
+    entries = {}
+    for entry in header.split(","):
+        name, _, param = entry.strip().partition(";")
+        entries[name] = param.split("=", 1)[1].strip('"')
+    return entries
+
+
+async def test_chat_server_timing_header(client):
+    fn = make_chat_fn(
+        tool_calls=[("rag_search", {"query": "what is this?"})],
+        output={"message": "It's an app.", "mode": "answer"},
+    )
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat", json={"message": "what is this?"})
+
+    timing = _server_timing(resp.headers["Server-Timing"])
+    assert set(timing) == {
+        "model", "tool", "rag", "serialize", "total", "model-requests", "retries",
+    }
+    assert timing["model-requests"] == "2"
+    assert timing["retries"] == "0"
+    assert float(timing["total"]) >= float(timing["model"]) > 0
+    assert float(timing["tool"]) >= float(timing["rag"]) > 0
+    assert resp.json()["trace"] is None
+
+
+async def test_chat_debug_trace(client):
+    fn = make_chat_fn(
+        tool_calls=[("update_state", {"patch": {"display_name": "Alex"}})],
+        output={"message": "Hi Alex!", "mode": "flow_question"},
+    )
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat?debug=true", json={"message": "I'm Alex"})
+
+    trace = resp.json()["trace"]
+    assert trace["model_requests"] == 2
+    assert trace["retries"] == 0
+    phases = [e["phase"] for e in trace["events"]]
+    assert phases.count("model_request") == 2
+    assert "update_state" in phases
+    starts = [e["start_ms"] for e in trace["events"]]
+    assert starts == sorted(starts)
+    assert all(0 <= s <= trace["total_ms"] for s in starts)
+
+
+async def test_state_endpoints_carry_server_timing(client):
+    fn = make_output_only_fn({"message": "Welcome!", "mode": "flow_question"})
+    with agent.override(model=FunctionModel(fn)):
+        sid = (await client.post("/chat", json={"message": "hi"})).json()["session_id"]
+
+    patched = await client.patch(
+        "/state?debug=true", json={"session_id": sid, "updates": {"display_name": "Alex"}}
+    )
+    assert "serialize;dur=" in patched.headers["Server-Timing"]
+    assert [e["phase"] for e in patched.json()["trace"]["events"]][0] == "session_lookup"
+
+    fetched = await client.get(f"/state/{sid}")
+    assert 'model-requests;desc="0"' in fetched.headers["Server-Timing"]
+    unchanged = await client.get(
+        f"/state/{sid}", headers={"If-None-Match": fetched.headers["ETag"]}
+    )
+    assert unchanged.status_code == 304
+    assert "total;dur=" in unchanged.headers["Server-Timing"]
+
+
+async def test_error_responses_carry_server_timing(client):
+    missing = await client.get("/state/nope")
+    assert missing.status_code == 404
+    assert "total;dur=" in missing.headers["Server-Timing"]
+
+    unknown_flow = await client.post("/chat", json={"message": "hi", "flow_id": "nope"})
+    assert unknown_flow.status_code == 404
+    assert "total;dur=" in unknown_flow.headers["Server-Timing"]
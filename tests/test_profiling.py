@@ -0,0 +1,102 @@
+"""Tests for the sampling profiler and its admin endpoints."""
+from __future__ import annotations
+
+import marshal
+import pstats
+import time
+from dataclasses import replace
+
+import pytest
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent.agent import agent
+from conversation_agent.profiling import profiler
+
+from .conftest import _output_response
+
+TOKEN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, admin_token="secret"))
+    yield
+    profiler.stop()
+
+
+def _busy_model(seconds: float) -> FunctionModel:
+    """A model that keeps the event loop busy, so there is something to sample."""
+
+    async def fn(messages, info):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+        return _output_response({"message": "Welcome!", "mode": "flow_question"}, info)
+
+    return FunctionModel(fn)
+
+
+async def test_admin_endpoints_need_the_token(client, monkeypatch):
+    assert (await client.get("/admin/profile")).status_code == 403
+    assert (await client.get("/admin/profile", headers={"X-Admin-Token": "nope"})).status_code == 403
+
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, admin_token=""))
+    assert (await client.get("/admin/profile", headers=TOKEN)).status_code == 404
+
+
+async def test_profile_needs_a_limit(client):
+    resp = await client.post("/admin/profile", json={"interval": 0.01}, headers=TOKEN)
+    assert resp.status_code == 422
+
+
+async def test_profiles_next_requests_by_phase(client):
+    resp = await client.post(
+        "/admin/profile", json={"requests": 1, "interval": 0.001}, headers=TOKEN
+    )
+    assert resp.json()["active"] is True
+
+    with agent.override(model=_busy_model(0.1)):
+        await client.post("/chat", json={"message": "I'm Alex"})
+        # Past the limit: served, but not profiled
+        await client.post("/chat", json={"message": "I'm Sam"})
+
+    status = (await client.get("/admin/profile", headers=TOKEN)).json()
+    assert status["active"] is False
+    assert status["requests_profiled"] == 1
+    assert status["requests_remaining"] == 0
+    assert status["samples_by_phase"]["model_request"] > 5
+
+    collapsed = (await client.get("/admin/profile/collapsed?phase=model_request", headers=TOKEN)).text
+    lines = collapsed.splitlines()
+    assert lines and all(line.startswith("chat;phase:model_request;") for line in lines)
+    assert any("fn (test_profiling.py:" in line for line in lines)
+
+
+async def test_pstats_download_loads(client, tmp_path):
+    await client.post("/admin/profile", json={"requests": 1, "interval": 0.001}, headers=TOKEN)
+    with agent.override(model=_busy_model(0.05)):
+        await client.post("/chat", json={"message": "I'm Alex"})
+
+    resp = await client.get("/admin/profile/pstats", headers=TOKEN)
+    assert resp.headers["content-disposition"] == 'attachment; filename="profile.pstats"'
+    path = tmp_path / "profile.pstats"
+    path.write_bytes(resp.content)
+
+    stats = pstats.Stats(str(path))
+    busy = [key for key in stats.stats if key[2] == "fn" and key[0].endswith("test_profiling.py")]
+    assert busy
+    cc, nc, tt, ct, callers = stats.stats[busy[0]]
+    assert tt > 0 and ct >= tt and callers
+
+
+async def test_fraction_skips_unselected_requests(client, monkeypatch):
+    monkeypatch.setattr("conversation_agent.profiling.random.random", lambda: 0.9)
+    await client.post("/admin/profile", json={"fraction": 0.5}, headers=TOKEN)
+    with agent.override(model=_busy_model(0.0)):
+        await client.post("/chat", json={"message": "I'm Alex"})
+
+    status = (await client.get("/admin/profile", headers=TOKEN)).json()
+    assert status["active"] is True
+    assert status["requests_profiled"] == 0
+    assert marshal.loads((await client.get("/admin/profile/pstats", headers=TOKEN)).content) == {}
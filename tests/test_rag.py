@@ -1,11 +1,21 @@
 """Unit tests for the VectorStore (RAG search)."""
 from __future__ import annotations
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from types import SimpleNamespace
+
 import numpy as np
 import pytest
 
-from conversation_agent.models import RagSource
+from conversation_agent import app as app_module
+from conversation_agent.admission import AdmissionController, AdmissionRejected
+from conversation_agent.agent import AgentDeps, rag_search
+from conversation_agent.models import AssistantState, RagSource
 from conversation_agent.rag import VectorStore
+from conversation_agent.scoring import make_executor
 
 
 class FakeEmbedder:
@@ -132,3 +142,119 @@ async def test_load_corpus_normalizes_vectors(embedder, tmp_path):
     assert store._matrix is not None
     norms = np.linalg.norm(store._matrix, axis=1)
     np.testing.assert_allclose(norms, 1.0, atol=1e-6)
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(1)
+        self.jobs = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.jobs += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+async def _store_with(corpus_size: int, tmp_path, **kwargs) -> VectorStore:
+    import json
+
+    corpus = tmp_path / "corpus.json"
+    corpus.write_text(json.dumps([
+        {"title": f"Doc {i}", "content": f"Content {i}"} for i in range(corpus_size)
+    ]))
+    store = VectorStore(FakeEmbedder(dim=4), **kwargs)
+    await store.load_corpus(corpus)
+    return store
+
+
+async def test_small_corpus_is_scored_inline(tmp_path):
+    with _CountingExecutor() as executor:
+        store = await _store_with(3, tmp_path, executor=executor, inline_max_docs=3)
+        results = await store.search("alpha")
+
+    assert results[0].title == "Doc 0"
+    assert executor.jobs == 0
+
+
+async def test_large_corpus_is_scored_in_executor(tmp_path):
+    inline = await _store_with(8, tmp_path)
+    with _CountingExecutor() as executor:
+        store = await _store_with(8, tmp_path, executor=executor, inline_max_docs=3)
+        results = await store.search("alpha", top_k=3)
+
+    assert executor.jobs == 1
+    assert results == await inline.search("alpha", top_k=3)
+
+
+async def test_process_pool_scores_from_shared_file(tmp_path):
+    inline = await _store_with(8, tmp_path)
+    executor = make_executor("process", 1)
+    try:
+        store = await _store_with(8, tmp_path, executor=executor)
+        results = await store.search("alpha", top_k=3)
+        path = store._shared[1]
+        assert os.path.exists(path)
+        # Same matrix: the file is reused
+        await store.search("alpha")
+        assert store._shared[1] == path
+    finally:
+        executor.shutdown()
+
+    assert results == await inline.search("alpha", top_k=3)
+    store.close()
+    assert not os.path.exists(path)
+
+
+async def test_lifespan_closes_store_and_shuts_down_executor(monkeypatch):
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, rag_executor="thread"))
+    monkeypatch.setattr(app_module, "_vector_store", None)
+    monkeypatch.setattr(app_module, "_score_executor", None)
+
+    async def load_corpus(self, path):
+        pass
+
+    closed = []
+    monkeypatch.setattr(VectorStore, "load_corpus", load_corpus)
+    monkeypatch.setattr(VectorStore, "close", lambda self: closed.append(self))
+
+    async with app_module.lifespan(app_module.app):
+        store = app_module._vector_store
+        executor = app_module._score_executor
+        assert store._executor is executor
+
+    assert closed == [store]
+    with pytest.raises(RuntimeError, match="shutdown"):
+        executor.submit(int)
+
+
+def test_make_executor_rejects_unknown_kind():
+    assert make_executor("inline", 4) is None
+    with pytest.raises(ValueError, match="Unknown scoring executor"):
+        make_executor("gpu", 4)
+
+
+async def test_embed_query_waits_for_an_admission_slot(tmp_path):
+    admission = AdmissionController("embed", max_concurrency=1, max_queue=1, queue_timeout=1)
+    store = await _store_with(3, tmp_path, admission=admission)
+
+    async with admission.slot():
+        search = asyncio.create_task(store.search("alpha"))
+        await asyncio.sleep(0.01)
+        assert not search.done()
+        assert admission.queue_depth == 1
+    results = await search
+
+    assert results[0].title == "Doc 0"
+    assert admission.in_flight == 0
+
+
+async def test_rag_search_returns_busy_notice_when_rejected(tmp_path):
+    admission = AdmissionController("embed", max_concurrency=1, max_queue=0, queue_timeout=1)
+    store = await _store_with(3, tmp_path, admission=admission)
+    deps = AgentDeps(state=AssistantState(), vector_store=store)
+
+    async with admission.slot():
+        with pytest.raises(AdmissionRejected):
+            await store.search("alpha")
+        result = await rag_search(SimpleNamespace(deps=deps), "what is keto?")
+
+    assert "knowledge base is busy" in result
@@ -0,0 +1,30 @@
+"""Tests for the pydantic-core response rendering path."""
+from __future__ import annotations
+
+import json
+
+from conversation_agent.models import AssistantState
+from conversation_agent.app import StateUpdateResponse
+from conversation_agent.responses import ModelJSONResponse
+
+from .conftest import create_session
+
+
+def test_renders_model_with_pydantic_core():
+    body = StateUpdateResponse(state_version=3, state=AssistantState())
+    resp = ModelJSONResponse(body)
+    assert resp.body == body.model_dump_json().encode()
+    assert resp.media_type == "application/json"
+
+
+def test_renders_plain_content_as_json():
+    assert json.loads(ModelJSONResponse({"a": 1}).body) == {"a": 1}
+
+
+async def test_endpoints_match_response_model(client):
+    sid = create_session(AssistantState())
+    resp = await client.patch("/state", json={"session_id": sid, "updates": {"age_range": "25-34"}})
+    assert resp.headers["content-type"] == "application/json"
+    # The body still round-trips through the declared response_model
+    parsed = StateUpdateResponse.model_validate_json(resp.content)
+    assert parsed.state.profile.age_range == "25_34"
@@ -5,7 +5,9 @@ from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserProm
 from pydantic_ai.models.function import FunctionModel
 
 from conversation_agent.agent import agent
+from conversation_agent.flow import FlowDef, compile_flow
 from conversation_agent.models import (
+    DEFAULT_FLOW,
     AgeRange,
     AssistantState,
     FlowStep,
@@ -129,6 +131,62 @@ async def test_patch_state_with_enum_label(client):
     assert data["state"]["profile"]["age_range"] == "25_34"
 
 
+# ── GET /state/{session_id} ───────────────────────────────────────────
+
+
+async def test_get_state_returns_state_and_etag(client):
+    sid = create_session(AssistantState(profile=ProfileAnswers(display_name="Hugo")))
+
+    resp = await client.get(f"/state/{sid}")
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["state"]["profile"]["display_name"] == "Hugo"
+    assert data["next_question"]["field_name"] == "age_range"
+    assert resp.headers["etag"] == f'"v{data["state_version"]}"'
+
+
+async def test_get_state_not_modified(client):
+    sid = create_session(AssistantState())
+    etag = (await client.get(f"/state/{sid}")).headers["etag"]
+
+    resp = await client.get(f"/state/{sid}", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+
+
+async def test_get_state_not_modified_does_not_serialize_state(client, monkeypatch):
+    sid = create_session(AssistantState())
+    etag = (await client.get(f"/state/{sid}")).headers["etag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("state serialized for a 304")
+
+    monkeypatch.setattr(AssistantState, "model_dump", fail)
+    monkeypatch.setattr(AssistantState, "model_dump_json", fail)
+    resp = await client.get(f"/state/{sid}", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 304
+
+
+async def test_get_state_etag_changes_after_patch(client):
+    sid = create_session(AssistantState())
+    etag = (await client.get(f"/state/{sid}")).headers["etag"]
+    await client.patch("/state", json={"session_id": sid, "updates": {"display_name": "Hugo"}})
+
+    resp = await client.get(f"/state/{sid}", headers={"If-None-Match": f'W/{etag}, "x"'})
+
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+
+
+async def test_get_state_unknown_session(client):
+    resp = await client.get("/state/nope")
+    assert resp.status_code == 404
+
+
 # ── apply_state_updates edge cases ────────────────────────────────────
 
 
@@ -173,16 +231,16 @@ def test_apply_state_updates_invalid_value_skips():
 
 
 def test_display_value_string():
-    assert _display_value("25_34") == "25-34"
+    assert _display_value("25_34", DEFAULT_FLOW) == "25-34"
 
 
 def test_display_value_bool():
-    assert _display_value(True) == "yes"
-    assert _display_value(False) == "no"
+    assert _display_value(True, DEFAULT_FLOW) == "yes"
+    assert _display_value(False, DEFAULT_FLOW) == "no"
 
 
 def test_display_value_list():
-    assert _display_value(["dairy", "nuts"]) == "Dairy, Nuts"
+    assert _display_value(["dairy", "nuts"], DEFAULT_FLOW) == "Dairy, Nuts"
 
 
 # ── _inject_form_history ──────────────────────────────────────────────
@@ -196,23 +254,50 @@ def test_inject_form_history():
     assert "age_range = 25-34" in session.history[0].parts[0].content
 
 
+def test_inject_form_history_uses_the_session_flow_labels():
+    flow = compile_flow(FlowDef.model_validate({
+        "id": "pets",
+        "subject": "pet profile",
+        "greeting": "Hello!",
+        "enums": {"Species": {
+            "members": {"GUINEA_PIG": "guinea_pig", "SCI_FI": "sci_fi"},
+            "labels": {"guinea_pig": "Guinea Pig", "sci_fi": "Space Hamster"},
+        }},
+        "steps": [{"id": "pet", "title": "Pet", "model": "PetAnswers", "fields": [
+            {"name": "species", "type": "enum", "enum": "Species", "multi": True,
+             "question": "What kind of pets do you have?"},
+        ]}],
+    }))
+    session = Session(state=flow.state_model())
+    _inject_form_history(session, {"species": ["guinea_pig", "sci_fi"]})
+    assert "species = Guinea Pig, Space Hamster" in session.history[0].parts[0].content
+
+
 # ── auto flag ─────────────────────────────────────────────────────────
 
 
 async def test_auto_flag_passed_to_agent(client):
-    fn = make_output_only_fn({
-        "message": "Welcome!",
-        "mode": "flow_question",
-        "next_question": {
-            "field_name": "display_name",
-            "question_text": "What's your name?",
-        },
-    })
+    """Auto-triggers that can't be served from the turn cache still reach the agent."""
+    from conversation_agent import session as session_module
+
+    sid = create_session(AssistantState(current_step=FlowStep.DONE))
+    session_module._store[sid].history.append(
+        ModelRequest(parts=[UserPromptPart(content="hi")])
+    )
+    calls = []
+
+    def fn(messages, agent_info):
+        calls.append(True)
+        return make_output_only_fn({"message": "Welcome!", "mode": "done"})(
+            messages, agent_info
+        )
+
     with agent.override(model=FunctionModel(fn)):
         resp = await client.post(
-            "/chat", json={"message": "hi", "auto": True}
+            "/chat", json={"message": "hi", "auto": True, "session_id": sid}
         )
 
     assert resp.status_code == 200
     data = resp.json()
     assert data["response"]["message"] == "Welcome!"
+    assert calls
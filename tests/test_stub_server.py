@@ -0,0 +1,91 @@
+"""Tests for the local OpenAI-compatible stub server."""
+from __future__ import annotations
+
+import httpx
+import numpy as np
+import pytest
+from pydantic_ai import Embedder
+from pydantic_ai.embeddings.openai import OpenAIEmbeddingModel
+from pydantic_ai.models.openai import OpenAIChatModel
+from pydantic_ai.providers.openai import OpenAIProvider
+
+from conversation_agent.agent import agent
+from conversation_agent.stub_server import StubConfig, _example, create_app
+
+
+def _http(stub) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub")
+
+
+def _provider(stub) -> OpenAIProvider:
+    return OpenAIProvider(base_url="http://stub/v1", api_key="test", http_client=_http(stub))
+
+
+def test_example_satisfies_schema():
+    schema = {
+        "type": "object",
+        "properties": {
+            "mode": {"$ref": "#/$defs/Mode"},
+            "items": {"type": "array", "items": {"type": "integer"}, "minItems": 2},
+            "note": {"anyOf": [{"type": "null"}, {"type": "string"}]},
+            "optional": {"type": "string"},
+        },
+        "required": ["mode", "items", "note"],
+        "$defs": {"Mode": {"enum": ["a", "b"]}},
+    }
+    assert _example(schema, schema["$defs"]) == {"mode": "a", "items": [0, 0], "note": "stub"}
+
+
+async def test_chat_over_http(client):
+    stub = create_app(StubConfig(call_tools=True, output={"message": "Hello from the stub"}))
+    model = OpenAIChatModel("gpt-4o-mini", provider=_provider(stub))
+
+    with agent.override(model=model):
+        resp = await client.post("/chat", json={"message": "what is this app?"})
+
+    assert resp.status_code == 200
+    assert resp.json()["response"]["message"] == "Hello from the stub"
+    # Tool calls, then the output tool after the results came back
+    assert stub.state.requests == 2
+
+
+@pytest.mark.parametrize("call_tools", [False, True])
+async def test_typed_answers_after_the_first_turn(client, call_tools):
+    stub = create_app(StubConfig(call_tools=call_tools))
+    model = OpenAIChatModel("gpt-4o-mini", provider=_provider(stub))
+
+    with agent.override(model=model):
+        first = await client.post("/chat", json={"message": "hi"})
+        sid = first.json()["session_id"]
+        answer = await client.post("/chat", json={"session_id": sid, "message": "I'm Alex"})
+        again = await client.post("/chat", json={"session_id": sid, "message": "25 to 34"})
+
+    assert first.status_code == answer.status_code == again.status_code == 200
+    assert answer.json()["response"]["mode"] == "answer"
+
+
+async def test_embeddings_are_deterministic():
+    stub = create_app(StubConfig(dimensions=64))
+    embedder = Embedder(OpenAIEmbeddingModel("text-embedding-3-small", provider=_provider(stub)))
+
+    first = await embedder.embed_query("anime")
+    again = await embedder.embed_query("anime")
+    other = await embedder.embed_query("food")
+
+    assert len(first.embeddings[0]) == 64
+    assert first.embeddings == again.embeddings
+    assert first.embeddings != other.embeddings
+    assert np.linalg.norm(first.embeddings[0]) == pytest.approx(1.0, abs=1e-5)
+
+
+async def test_rate_limit_and_error_responses():
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+    async with _http(create_app(StubConfig(rate_limit_rate=1.0, retry_after=3))) as http:
+        limited = await http.post("/v1/chat/completions", json=body)
+    async with _http(create_app(StubConfig(error_rate=1.0))) as http:
+        failed = await http.post("/v1/embeddings", json={"model": "m", "input": "x"})
+
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "3"
+    assert limited.json()["error"]["type"] == "rate_limit_exceeded"
+    assert failed.status_code == 500
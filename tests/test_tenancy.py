@@ -0,0 +1,140 @@
+"""Tests for multi-flow routing and the lazily loaded flow registry."""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent.agent import create_agent
+from conversation_agent.models import DEFAULT_FLOW
+from conversation_agent.session import get_session
+from conversation_agent.tenancy import FlowRegistry, FlowRuntime, UnknownFlow
+
+from .conftest import MockVectorStore, make_chat_fn
+from .test_flow import SMALL_FLOW
+
+
+@pytest.fixture
+def flows_dir(tmp_path):
+    for flow_id in ("pets", "plants"):
+        definition = {**SMALL_FLOW, "id": flow_id}
+        (tmp_path / f"{flow_id}.json").write_text(json.dumps(definition))
+    return tmp_path
+
+
+def make_registry(flows_dir, max_loaded=4, builds=None, delay=0.0):
+    async def build(flow):
+        if builds is not None:
+            builds.append(flow.id)
+        await asyncio.sleep(delay)
+        return FlowRuntime(flow, create_agent("test"), MockVectorStore())
+
+    return FlowRegistry(flows_dir, build, max_loaded, preloaded=(DEFAULT_FLOW,))
+
+
+def test_flows_are_compiled_once(flows_dir):
+    registry = make_registry(flows_dir)
+    assert registry.flow("pets") is registry.flow("pets")
+    assert registry.flow("onboarding") is DEFAULT_FLOW
+
+
+@pytest.mark.parametrize("flow_id", ["missing", "../pets", "Pets"])
+def test_unknown_flows(flows_dir, flow_id):
+    with pytest.raises(UnknownFlow):
+        make_registry(flows_dir).flow(flow_id)
+
+
+async def test_concurrent_requests_share_one_build(flows_dir):
+    builds = []
+    registry = make_registry(flows_dir, builds=builds, delay=0.01)
+    first, second = await asyncio.gather(registry.runtime("pets"), registry.runtime("pets"))
+    assert first is second
+    assert builds == ["pets"]
+
+
+async def test_least_recently_used_flow_is_evicted(flows_dir):
+    builds = []
+    registry = make_registry(flows_dir, max_loaded=1, builds=builds)
+    await registry.runtime("pets")
+    await registry.runtime("plants")
+    assert registry.loaded == ["plants"]
+    await registry.runtime("pets")
+    assert builds == ["pets", "plants", "pets"]
+
+
+async def test_failed_builds_are_not_cached(flows_dir):
+    attempts = 0
+
+    async def build(flow):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("embedding API down")
+        return FlowRuntime(flow, create_agent("test"), MockVectorStore())
+
+    registry = FlowRegistry(flows_dir, build, max_loaded=4)
+    with pytest.raises(RuntimeError):
+        await registry.runtime("pets")
+    assert (await registry.runtime("pets")).flow.id == "pets"
+
+
+# ── /chat and /state routing ──────────────────────────────────────────
+
+
+@pytest.fixture
+def pets_app(flows_dir, monkeypatch):
+    registry = make_registry(flows_dir)
+    monkeypatch.setattr(app_module, "_flows", registry)
+    return registry
+
+
+async def test_new_session_uses_requested_flow(client, pets_app):
+    resp = await client.post("/chat", json={"message": "hi", "flow_id": "pets"})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["response"]["message"].startswith("Hello! Let's talk about your pets.")
+    assert data["response"]["next_question"]["field_name"] == "pet_name"
+    assert data["state"]["current_step"] == "pet"
+    # Greetings are answered from templates; nothing had to be loaded
+    assert pets_app.loaded == []
+
+
+async def test_agent_run_uses_the_flow_runtime(client, pets_app):
+    sid = (await client.post("/chat", json={"message": "hi", "flow_id": "pets"})).json()["session_id"]
+    runtime = await pets_app.runtime("pets")
+    chat_fn = make_chat_fn(
+        tool_calls=[("update_state", {"patch": {"pet_name": "Miso", "species": ["kitten"]}})],
+        output={"message": "Do they live indoors?", "mode": "flow_question"},
+    )
+
+    with runtime.agent.override(model=FunctionModel(chat_fn)):
+        resp = await client.post("/chat", json={"message": "Miso, a cat", "session_id": sid})
+
+    data = resp.json()
+    assert data["state"]["pet"] == {"pet_name": "Miso", "species": ["cat"]}
+    assert data["state"]["current_step"] == "care"
+    assert data["response"]["next_question"]["options"] == ["yes", "no"]
+
+
+async def test_patch_state_routes_by_session_flow(client, pets_app):
+    sid = (await client.post("/chat", json={"message": "hi", "flow_id": "pets"})).json()["session_id"]
+
+    resp = await client.patch("/state", json={"session_id": sid, "updates": {"species": "puppy"}})
+
+    assert resp.json()["state"]["pet"]["species"] == ["dog"]
+    assert get_session(sid).state.flow.id == "pets"
+
+
+async def test_unknown_flow_is_404(client, pets_app):
+    resp = await client.post("/chat", json={"message": "hi", "flow_id": "nope"})
+    assert resp.status_code == 404
+
+
+async def test_flow_mismatch_is_409(client, pets_app):
+    sid = (await client.post("/chat", json={"message": "hi"})).json()["session_id"]
+    resp = await client.post("/chat", json={"message": "hi", "session_id": sid, "flow_id": "pets"})
+    assert resp.status_code == 409
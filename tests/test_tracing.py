@@ -0,0 +1,137 @@
+"""Tests for tracing spans and their exporters."""
+from __future__ import annotations
+
+import json
+
+import pytest
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import app as app_module
+from conversation_agent.agent import agent
+from conversation_agent.rag import VectorStore
+from conversation_agent.tracing import InMemoryExporter, JsonlExporter, Tracer, tracer
+
+from .conftest import make_chat_fn
+from .test_rag import FakeEmbedder
+
+
+@pytest.fixture
+def spans():
+    exporter = InMemoryExporter()
+    tracer.add_exporter(exporter)
+    yield exporter
+    tracer.remove_exporter(exporter)
+
+
+# ── Tracer ────────────────────────────────────────────────────────────
+
+
+def test_nested_spans_share_trace_and_link_parent():
+    t = Tracer()
+    exporter = InMemoryExporter()
+    t.add_exporter(exporter)
+
+    with t.span("outer", {"session.id": "abc"}) as outer:
+        with t.span("inner") as inner:
+            inner.set_attribute("n", 3)
+
+    assert [s.name for s in exporter.spans] == ["inner", "outer"]
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_span_id == outer.span_id
+    assert outer.parent_span_id is None
+    assert outer.attributes == {"session.id": "abc"}
+    assert inner.end_ns >= inner.start_ns
+
+
+def test_span_records_error_and_reraises():
+    t = Tracer()
+    exporter = InMemoryExporter()
+    t.add_exporter(exporter)
+
+    with pytest.raises(ValueError):
+        with t.span("failing"):
+            raise ValueError("bad input")
+
+    assert exporter.spans[0].to_dict()["status"] == {
+        "code": "STATUS_CODE_ERROR", "message": "ValueError: bad input",
+    }
+
+
+def test_no_exporters_is_a_noop():
+    t = Tracer()
+    with t.span("ignored", {"a": 1}) as span:
+        span.set_attribute("b", 2)
+        assert t.current() is span
+
+
+def test_jsonl_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    t = Tracer()
+    exporter = JsonlExporter(path)
+    t.add_exporter(exporter)
+
+    with t.span("root", {"conversation.step": "food", "tokens": 12, "ok": True}):
+        with t.span("child"):
+            pass
+    exporter.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [d["name"] for d in lines] == ["child", "root"]
+    child, root = lines
+    assert child["parentSpanId"] == root["spanId"]
+    assert root["parentSpanId"] == ""
+    assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+    assert root["attributes"] == [
+        {"key": "conversation.step", "value": {"stringValue": "food"}},
+        {"key": "tokens", "value": {"intValue": "12"}},
+        {"key": "ok", "value": {"boolValue": True}},
+    ]
+
+
+# ── /chat spans ───────────────────────────────────────────────────────
+
+
+async def test_chat_emits_span_tree(client, spans, tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus.json"
+    corpus.write_text(json.dumps([{"title": "A", "content": "alpha"}]))
+    store = VectorStore(FakeEmbedder())
+    await store.load_corpus(corpus)
+    monkeypatch.setattr(app_module, "_vector_store", store)
+
+    fn = make_chat_fn(
+        tool_calls=[
+            ("update_state", {"patch": {"display_name": "Alex"}}),
+            ("rag_search", {"query": "what is this?"}),
+        ],
+        output={"message": "Hi Alex!", "mode": "flow_question"},
+    )
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat", json={"message": "I'm Alex"})
+    sid = resp.json()["session_id"]
+
+    (chat,) = spans.named("chat")
+    (run,) = spans.named("agent.run")
+    requests = spans.named("model_request")
+    (update,) = spans.named("update_state")
+    (rag,) = spans.named("rag_search")
+    (search,) = spans.named("vector_store.search")
+    (embed,) = spans.named("embed_query")
+
+    assert {s.trace_id for s in spans.spans} == {chat.trace_id}
+    assert run.parent_span_id == chat.span_id
+    assert len(requests) == 2
+    assert all(r.parent_span_id == run.span_id for r in requests)
+    assert search.parent_span_id == rag.span_id
+    assert embed.parent_span_id == search.span_id
+
+    assert chat.attributes["session.id"] == sid
+    assert chat.attributes["conversation.step"] == "profile"
+    assert run.attributes["session.id"] == sid
+    assert run.attributes["conversation.step"] == "profile"
+    assert "gen_ai.usage.input_tokens" in run.attributes
+    assert "gen_ai.usage.output_tokens" in requests[0].attributes
+    assert update.attributes == {
+        "conversation.step": "profile", "update_state.fields": 1, "update_state.rejected": 0,
+    }
+    assert search.attributes["rag.results"] == 1
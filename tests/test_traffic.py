@@ -0,0 +1,91 @@
+"""Tests for recording and replaying model and embedding traffic."""
+from __future__ import annotations
+
+import time
+
+import pytest
+from pydantic_ai import Embedder
+from pydantic_ai.embeddings.test import TestEmbeddingModel
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent.agent import agent
+from conversation_agent.traffic import (
+    RecordingEmbeddingModel,
+    RecordingModel,
+    ReplayEmbeddingModel,
+    ReplayMiss,
+    ReplayModel,
+    TrafficRecorder,
+    TrafficReplay,
+    embed_key,
+)
+
+from .conftest import make_chat_fn
+
+
+def _fn():
+    return make_chat_fn(
+        tool_calls=[("update_state", {"patch": {"display_name": "Alex"}})],
+        output={"message": "Hi Alex!", "mode": "flow_question"},
+    )
+
+
+@pytest.mark.parametrize("name", ["traffic.jsonl", "traffic.jsonl.gz"])
+async def test_replayed_chat_matches_recording(client, tmp_path, name):
+    path = tmp_path / name
+    recorder = TrafficRecorder(path)
+    with agent.override(model=RecordingModel(FunctionModel(_fn()), recorder)):
+        recorded = await client.post("/chat", json={"message": "I'm Alex"})
+    recorder.close()
+
+    replay = TrafficReplay(path, latency_scale=0)
+    with agent.override(model=ReplayModel("replay:test", replay)):
+        replayed = await client.post("/chat", json={"message": "I'm Alex"})
+
+    assert replayed.status_code == 200
+    assert replayed.json()["response"] == recorded.json()["response"]
+    assert replayed.json()["state"] == recorded.json()["state"]
+
+
+async def test_replay_miss_raises(client, tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(path)
+    with agent.override(model=RecordingModel(FunctionModel(_fn()), recorder)):
+        await client.post("/chat", json={"message": "I'm Alex"})
+    recorder.close()
+
+    replay = TrafficReplay(path, latency_scale=0)
+    with agent.override(model=ReplayModel("replay:test", replay)):
+        with pytest.raises(ReplayMiss):
+            await client.post("/chat", json={"message": "I'm Sam"})
+
+
+async def test_replay_scales_recorded_latency(tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    # vectors: [[1.0, 2.0]] as base64 float32
+    key = embed_key(["q"], "query")
+    path.write_text(
+        f'{{"type":"embed","key":"{key}","latency":0.2,"shape":[1,2],"vectors":"AACAPwAAAEA="}}\n'
+    )
+    replay = TrafficReplay(path, latency_scale=0.25)
+
+    start = time.perf_counter()
+    vectors = await replay.embeddings(["q"], "query")
+
+    assert vectors == [[1.0, 2.0]]
+    assert 0.05 <= time.perf_counter() - start < 0.2
+
+
+async def test_embeddings_round_trip(tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(path)
+    recording = Embedder(RecordingEmbeddingModel(TestEmbeddingModel(dimensions=4), recorder))
+    recorded = await recording.embed_query("what is this?")
+    recorder.close()
+
+    replaying = Embedder(ReplayEmbeddingModel("replay:test", TrafficReplay(path, latency_scale=0)))
+    replayed = await replaying.embed_query("what is this?")
+
+    assert replayed.embeddings == recorded.embeddings
+    with pytest.raises(ReplayMiss):
+        await replaying.embed_query("something else")
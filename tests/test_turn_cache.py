@@ -0,0 +1,146 @@
+"""Tests for greeting / auto-trigger turns served from the turn cache."""
+from __future__ import annotations
+
+from pydantic_ai.messages import ModelRequest, ModelResponse, SystemPromptPart, UserPromptPart
+from pydantic_ai.models.function import FunctionModel
+
+from conversation_agent import session as session_module
+from conversation_agent.agent import agent
+from conversation_agent.models import (
+    AgeRange,
+    AssistantState,
+    FlowStep,
+    ProfileAnswers,
+    ResponseMode,
+)
+from conversation_agent.turn_cache import TurnCache, TurnKind, classify_turn
+
+from .conftest import create_session, make_output_only_fn
+
+
+def _failing_fn(messages, agent_info):
+    raise AssertionError("agent.run should not be called for cached turns")
+
+
+# ── classify_turn ─────────────────────────────────────────────────────
+
+
+def test_classify_first_greeting():
+    assert classify_turn("Hi!", has_prior_turns=False, auto=False) == TurnKind.GREETING
+    assert classify_turn("", has_prior_turns=False, auto=True) == TurnKind.GREETING
+
+
+def test_classify_first_message_with_info_is_not_cached():
+    assert classify_turn("I'm Hugo", has_prior_turns=False, auto=False) is None
+
+
+def test_classify_auto_with_history():
+    assert classify_turn("I've updated my details in the form.", True, True) == TurnKind.AUTO
+
+
+def test_classify_typed_message_with_history():
+    assert classify_turn("hi", has_prior_turns=True, auto=False) is None
+
+
+# ── TurnCache ─────────────────────────────────────────────────────────
+
+
+def test_lookup_keyed_on_state_shape():
+    cache = TurnCache()
+    a = cache.lookup(AssistantState(profile=ProfileAnswers(display_name="Alice")), TurnKind.AUTO)
+    b = cache.lookup(AssistantState(profile=ProfileAnswers(display_name="Bob")), TurnKind.AUTO)
+    assert a == b
+    assert a.next_question.field_name == "age_range"
+    assert "Alice" not in a.message
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lookup_returns_independent_copies():
+    cache = TurnCache()
+    a = cache.lookup(AssistantState(), TurnKind.GREETING)
+    a.message = "mutated"
+    b = cache.lookup(AssistantState(), TurnKind.GREETING)
+    assert b.message != "mutated"
+
+
+def test_lookup_done_step_not_cached():
+    cache = TurnCache()
+    assert cache.lookup(AssistantState(current_step=FlowStep.DONE), TurnKind.AUTO) is None
+
+
+# ── /chat integration ─────────────────────────────────────────────────
+
+
+async def test_first_greeting_skips_agent(client):
+    with agent.override(model=FunctionModel(_failing_fn)):
+        resp = await client.post("/chat", json={"message": "hi", "auto": True})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["response"]["mode"] == ResponseMode.FLOW_QUESTION.value
+    assert data["response"]["next_question"]["field_name"] == "display_name"
+
+    session = session_module._store[data["session_id"]]
+    assert len(session.history) == 2
+    assert isinstance(session.history[0], ModelRequest)
+    system, user = session.history[0].parts
+    assert isinstance(system, SystemPromptPart)
+    assert user.content == "hi"
+    assert isinstance(session.history[1], ModelResponse)
+    assert session.history[1].parts[0].content == data["response"]["message"]
+
+
+async def test_auto_trigger_after_form_skips_agent(client):
+    sid = create_session(AssistantState(
+        profile=ProfileAnswers(display_name="Hugo", age_range=AgeRange.AGE_25_34),
+    ))
+    session_module._store[sid].history.append(
+        ModelRequest.user_text_prompt("hi")
+    )
+
+    with agent.override(model=FunctionModel(_failing_fn)):
+        resp = await client.post(
+            "/chat",
+            json={
+                "message": "I've updated my details in the form.",
+                "session_id": sid,
+                "auto": True,
+            },
+        )
+
+    nq = resp.json()["response"]["next_question"]
+    assert nq["field_name"] == "country"
+
+
+async def test_first_message_with_answer_uses_agent(client):
+    fn = make_output_only_fn({
+        "message": "Nice to meet you, Hugo!",
+        "mode": "flow_question",
+        "state_patch": {"display_name": "Hugo"},
+    })
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post("/chat", json={"message": "I'm Hugo"})
+
+    assert resp.json()["response"]["message"] == "Nice to meet you, Hugo!"
+
+
+async def test_turn_after_cached_greeting_gets_the_system_prompt(client):
+    first = (await client.post("/chat", json={"message": "hi", "auto": True})).json()
+    requests = []
+
+    def fn(messages, agent_info):
+        requests.append(messages)
+        return make_output_only_fn({"message": "Sure!", "mode": "answer"})(messages, agent_info)
+
+    with agent.override(model=FunctionModel(fn)):
+        resp = await client.post(
+            "/chat", json={"message": "What is this app?", "session_id": first["session_id"]}
+        )
+
+    assert resp.status_code == 200
+    parts = requests[0][0].parts
+    assert isinstance(parts[0], SystemPromptPart)
+    assert isinstance(parts[1], UserPromptPart)
+    # Re-rendered for the current state, not left as the cached turn saw it
+    assert "Current step: profile" in parts[0].content
+    assert "Missing fields: display_name, age_range, country" in parts[0].content
@@ -0,0 +1,121 @@
+"""Tests for versioned state snapshots and delta responses."""
+from __future__ import annotations
+
+from conversation_agent.models import AssistantState, ProfileAnswers
+from conversation_agent.session import get_session
+from conversation_agent.versioning import StateVersions, apply_json_patch, json_diff
+
+from .conftest import create_session
+
+
+def test_json_diff_roundtrip():
+    old = {"a": {"b": 1, "c": [1, 2]}, "d": "x", "e/f": 1}
+    new = {"a": {"b": 2, "c": [1, 2, 3]}, "g": None, "e/f": 2}
+    ops = json_diff(old, new)
+    assert {"op": "replace", "path": "/a/b", "value": 2} in ops
+    assert {"op": "remove", "path": "/d"} in ops
+    assert {"op": "replace", "path": "/e~1f", "value": 2} in ops
+    assert apply_json_patch(old, ops) == new
+
+
+def test_json_diff_of_equal_documents_is_empty():
+    assert json_diff({"a": [1]}, {"a": [1]}) == []
+
+
+def test_versions_bump_only_on_change():
+    state = AssistantState()
+    versions = StateVersions()
+    assert versions.observe(state) == 1
+    assert versions.observe(state) == 1
+    state.profile.display_name = "Hugo"
+    assert versions.observe(state) == 2
+    assert versions.delta(1) == [
+        {"op": "replace", "path": "/profile/display_name", "value": "Hugo"},
+    ]
+    assert versions.delta(2) == []
+
+
+def test_unchanged_state_is_not_dumped_again(monkeypatch):
+    state = AssistantState()
+    versions = StateVersions()
+    versions.observe(state)
+    dumps = 0
+    original = AssistantState.model_dump
+
+    def counting_dump(self, **kwargs):
+        nonlocal dumps
+        dumps += 1
+        return original(self, **kwargs)
+
+    monkeypatch.setattr(AssistantState, "model_dump", counting_dump)
+    for _ in range(3):
+        assert versions.observe(state) == 1
+    assert dumps == 0
+
+    # Writing back the same value is checked once, without a new version
+    state.profile.display_name = None
+    assert versions.observe(state) == 1
+    assert dumps == 1
+
+
+def test_versions_bump_on_step_advance_and_replaced_answers():
+    state = AssistantState()
+    versions = StateVersions()
+    versions.observe(state)
+    state.profile = ProfileAnswers(display_name="Hugo")
+    assert versions.observe(state) == 2
+    state.current_step = state.flow.steps[1]
+    assert versions.observe(state) == 3
+    copied = state.model_copy(update={"current_step": state.flow.steps[0]})
+    assert versions.observe(copied) == 4
+
+
+def test_old_versions_are_forgotten():
+    state = AssistantState()
+    versions = StateVersions(keep=2)
+    for name in ("a", "b", "c"):
+        state.profile.display_name = name
+        versions.observe(state)
+    assert versions.version == 3
+    assert versions.delta(1) is None
+    assert versions.delta(2) is not None
+
+
+async def test_patch_state_returns_delta_from_known_version(client):
+    sid = create_session(AssistantState())
+    first = (await client.patch("/state", json={"session_id": sid, "updates": {}})).json()
+    assert first["state_delta"] is None
+
+    resp = await client.patch("/state", json={
+        "session_id": sid,
+        "updates": {"display_name": "Hugo"},
+        "state_version": first["state_version"],
+    })
+    data = resp.json()
+    assert data["state"] is None
+    assert data["state_version"] == first["state_version"] + 1
+    assert apply_json_patch(first["state"], data["state_delta"]) == (
+        get_session(sid).state.model_dump(mode="json")
+    )
+
+
+async def test_unknown_version_falls_back_to_full_state(client):
+    sid = create_session(AssistantState(profile=ProfileAnswers(display_name="Hugo")))
+    resp = await client.patch(
+        "/state", json={"session_id": sid, "updates": {}, "state_version": 99},
+    )
+    data = resp.json()
+    assert data["state_delta"] is None
+    assert data["state"]["profile"]["display_name"] == "Hugo"
+
+
+async def test_chat_greeting_returns_empty_delta(client):
+    sid = create_session(AssistantState())
+    first = (await client.patch("/state", json={"session_id": sid, "updates": {}})).json()
+    resp = await client.post("/chat", json={
+        "session_id": sid, "message": "hi", "state_version": first["state_version"],
+    })
+    data = resp.json()
+    assert data["state"] is None
+    assert data["state_delta"] == []
+    assert data["state_version"] == first["state_version"]